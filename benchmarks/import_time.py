@@ -0,0 +1,107 @@
+# !/usr/bin/env python
+# ----------------------------------------------------------------
+# import_time.py
+#
+# Checks that importing qwiic_rfid stays cheap: no I2C driver probing
+# and none of the heavier standard modules until they are needed.
+# ----------------------------------------------------------------
+#
+# Written by SparkFun Electronics, October 2026
+#
+# This python library supports the SparkFun Electronics qwiic 
+# sensor/board ecosystem on a Raspberry Pi (and compatible) single
+# board computers.
+#
+# More information on qwiic is at https://www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SParkFun. Buy a board!
+# https://www.sparkfun.com/products/15191
+# 
+# ================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+# Imports qwiic_rfid in fresh interpreters with -X importtime, prints the
+# import cost, and exits with status 1 if a module that should be deferred was
+# imported. Run it after changing imports:
+#
+#   python import_time.py
+#
+# The reported time is the best of several runs, each with a warm bytecode
+# cache, and includes every module qwiic_rfid pulls in. It depends on the
+# machine, so it only fails the run when a budget is given with --budget-ms,
+# for comparing against a figure measured on the same machine. The deferred
+# module check is repeated by tests/test_import.py.
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported by import qwiic_rfid alone
+DEFERRED = ("qwiic_i2c", "asyncio", "concurrent.futures", "csv", "mmap", "multiprocessing",
+    "selectors", "socket", "argparse", "numpy")
+
+# Runs one import and returns {module: cumulative microseconds}
+def import_times(module="qwiic_rfid"):
+    env = dict(os.environ)
+    here = os.path.dirname(os.path.abspath(__file__))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(here), env.get("PYTHONPATH")]))
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cost of importing qwiic_rfid")
+    parser.add_argument("--runs", type=int, default=5, help="imports to take the best of (default 5)")
+    parser.add_argument("--budget-ms", type=float,
+        help="also fail if the import takes longer than this many milliseconds")
+    args = parser.parse_args(argv)
+
+    import_times()    # Writes the bytecode cache
+    runs = [import_times() for _ in range(args.runs)]
+    best_us = min(run["qwiic_rfid"] for run in runs)
+
+    failed = False
+    if args.budget_ms is None:
+        print("import qwiic_rfid: %.2f ms" % (best_us / 1000.0))
+    else:
+        print("import qwiic_rfid: %.2f ms (budget %.2f ms)" % (best_us / 1000.0, args.budget_ms))
+        failed = best_us / 1000.0 > args.budget_ms
+
+    imported = set(runs[0])
+    for name in DEFERRED:
+        if name in imported:
+            print("imported at load time: %s" % name)
+            failed = True
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
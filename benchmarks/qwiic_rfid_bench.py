@@ -0,0 +1,263 @@
+# !/usr/bin/env python
+# ----------------------------------------------------------------
+# qwiic_rfid_bench.py
+#
+# Benchmarks for the qwiic_rfid decode and drain paths, run against
+# simulated readers so no hardware is needed.
+# ----------------------------------------------------------------
+#
+# Written by SparkFun Electronics, October 2026
+#
+# This python library supports the SparkFun Electronics qwiic 
+# sensor/board ecosystem on a Raspberry Pi (and compatible) single
+# board computers.
+#
+# More information on qwiic is at https://www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SParkFun. Buy a board!
+# https://www.sparkfun.com/products/15191
+# 
+# ================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+# Runs each benchmark and prints the results as one JSON object, so runs can be
+# saved and compared when the decode or drain code changes:
+#
+#   python qwiic_rfid_bench.py --output results.json
+#
+# decode          cost of one _read_tag_time() call, bus excluded
+# batch_decode    cost of decode_records() on a full drain's worth of raw
+#                 records, with and without NumPy
+# drain           cost of get_all_tags() + get_all_prec_times() on a full and
+#                 an empty reader, the most memory one drain has in use at
+#                 once, and the memory blocks drains leave allocated
+# multi_reader    cost of one ReaderBus drain across several readers
+# end_to_end      tags per second delivered, and tags lost to a full reader
+#                 buffer, when polling a busy simulated reader at different
+#                 intervals
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+# Run from a checkout, so use the qwiic_rfid beside this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qwiic_rfid
+
+# A transport that answers every read from a fixed list of records, then with
+# blank records until refilled. It does as little as possible so that the
+# library's own cost is what gets measured.
+class FixedTransport(qwiic_rfid.RFIDTransport):
+
+    BLANK = [0] * 10
+
+    def __init__(self, address=0x13):
+        self.address = address
+        self.records = []
+        self.next_record = 0
+
+    def fill(self, count):
+        self.records = [list(bytes([1, 2, 3, 4, 5, i % 256]) + (1000 + i).to_bytes(4, "big"))
+            for i in range(count)]
+        self.next_record = 0
+
+    def readBlock(self, address, commandCode, nBytes):
+        if self.next_record < len(self.records):
+            self.next_record += 1
+            return self.records[self.next_record - 1]
+        return self.BLANK
+
+    def writeByte(self, address, commandCode, value):
+        pass
+
+    def isDeviceConnected(self, devAddress):
+        return devAddress == self.address
+
+# Times func over iterations calls and returns nanoseconds per call
+def time_per_call(func, iterations):
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+def bench_decode(iterations):
+    transport = FixedTransport()
+    transport.fill(1)
+    transport.records = transport.records * iterations
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=transport)
+
+    return {"ns_per_call": time_per_call(reader._read_tag_time, iterations)}
+
+def bench_batch_decode(iterations):
+    transport = FixedTransport()
+    transport.fill(qwiic_rfid.QwiicRFID.MAX_TAG_STORAGE)
+    raw = bytes(b for record in transport.records for b in record)
+
+    results = {"records": len(transport.records),
+        "ns_per_batch": time_per_call(lambda: qwiic_rfid.decode_records(raw, use_numpy=False), iterations)}
+    try:
+        results["numpy_ns_per_batch"] = time_per_call(
+            lambda: qwiic_rfid.decode_records(raw, use_numpy=True), iterations)
+    except ImportError:
+        results["numpy_ns_per_batch"] = None
+    return results
+
+def bench_drain(iterations):
+    transport = FixedTransport()
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=transport)
+    tags = [None] * reader.MAX_TAG_STORAGE
+    times = [None] * reader.MAX_TAG_STORAGE
+
+    def full_drain():
+        transport.fill(reader.MAX_TAG_STORAGE)
+        reader.get_all_tags(tags)
+        reader.get_all_prec_times(times)
+
+    def empty_drain():
+        reader.get_all_tags(tags)
+        reader.get_all_prec_times(times)
+
+    results = {
+        "full_ns_per_drain": time_per_call(full_drain, iterations),
+        "empty_ns_per_drain": time_per_call(empty_drain, iterations),
+    }
+
+    # Memory used while draining. The test records are built before tracing
+    # starts so only the library's allocations are counted. The peak is taken
+    # afresh for each drain, above what was in use when it began. Blocks freed
+    # within a drain can't be counted, so the snapshots give the blocks each
+    # drain leaves allocated. tracemalloc.reset_peak() is new in Python 3.9,
+    # so on 3.8 the peaks are left out.
+    drains = min(iterations, 1000)
+    batches = []
+    for _ in range(drains):
+        transport.fill(reader.MAX_TAG_STORAGE)
+        batches.append(transport.records)
+
+    per_drain_peak = hasattr(tracemalloc, "reset_peak")
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peaks = []
+    for records in batches:
+        transport.records = records
+        transport.next_record = 0
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        if per_drain_peak:
+            tracemalloc.reset_peak()
+        reader.get_all_tags(tags)
+        reader.get_all_prec_times(times)
+        if per_drain_peak:
+            peaks.append(tracemalloc.get_traced_memory()[1] - start_bytes)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Leave out the blocks tracemalloc and this function allocate themselves
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    changes = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    results["peak_bytes_per_drain"] = max(peaks) if peaks else None
+    results["mean_peak_bytes_per_drain"] = sum(peaks) / drains if peaks else None
+    results["retained_blocks_per_drain"] = sum(change.count_diff for change in changes) / drains
+    results["retained_bytes_per_drain"] = sum(change.size_diff for change in changes) / drains
+    return results
+
+def bench_multi_reader(iterations, num_readers):
+    transports = [FixedTransport(0x20 + i) for i in range(num_readers)]
+
+    class Bus(qwiic_rfid.RFIDTransport):
+        def readBlock(self, address, commandCode, nBytes):
+            return transports[address - 0x20].readBlock(address, commandCode, nBytes)
+
+    bus = qwiic_rfid.ReaderBus(Bus())
+    for transport in transports:
+        bus.add_reader(address=transport.address)
+
+    def drain():
+        for transport in transports:
+            transport.fill(5)
+        bus.drain_records()
+
+    return {"readers": num_readers, "tags_per_reader": 5,
+        "ns_per_drain": time_per_call(drain, iterations)}
+
+def bench_end_to_end(duration, rate, latency, intervals):
+    results = []
+    for interval in intervals:
+        sim = qwiic_rfid.SimulatedRFIDReader(rate=rate, latency=latency, seed=1)
+        reader = qwiic_rfid.QwiicRFID(i2c_driver=sim)
+
+        poller = reader.start_polling(interval, max_interval=interval)
+        time.sleep(duration)
+        reader.stop_polling()
+
+        stats = sim.stats()
+        results.append({
+            "poll_interval": interval,
+            "tags_per_second": poller.tags_read / duration,
+            "scanned": stats["scanned"],
+            "overwritten": stats["overwritten"],
+            "loss_ratio": stats["overwritten"] / max(stats["scanned"], 1),
+            "transactions": stats["transactions"],
+        })
+    return {"scan_rate": rate, "bus_latency": latency, "duration": duration, "runs": results}
+
+def run_benchmarks(iterations, duration, rate, latency, num_readers):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "decode": bench_decode(iterations),
+        "batch_decode": bench_batch_decode(iterations),
+        "drain": bench_drain(iterations),
+        "multi_reader": bench_multi_reader(iterations, num_readers),
+        "end_to_end": bench_end_to_end(duration, rate, latency, [0.005, 0.02, 0.1, 0.5, 1.0]),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the qwiic_rfid decode and drain paths")
+    parser.add_argument("--iterations", type=int, default=10000,
+        help="calls per micro benchmark (default 10000)")
+    parser.add_argument("--duration", type=float, default=2.0,
+        help="seconds per end to end run (default 2)")
+    parser.add_argument("--rate", type=float, default=50.0,
+        help="simulated scans per second for end to end runs (default 50)")
+    parser.add_argument("--latency", type=float, default=0.0005,
+        help="simulated seconds per I2C transaction (default 0.0005)")
+    parser.add_argument("--readers", type=int, default=4,
+        help="readers in the multi reader benchmark (default 4)")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.iterations, args.duration, args.rate, args.latency, args.readers)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -74,8 +74,8 @@ def run_example():
 
         time.sleep(10)
             
-        my_RFID.get_all_tags(all_tags)
-        my_RFID.get_all_prec_times(all_times)
+        # Fetch the tags and their scan times together
+        my_RFID.get_all_tags(all_tags, all_times)
 
         for i in range(0, my_RFID.MAX_TAG_STORAGE):
             if all_tags[i] == "000000":
@@ -0,0 +1,82 @@
+# !/usr/bin/env python
+# ----------------------------------------------------------------
+# qwiic_rfid_ex4.py
+#
+# Example that polls the RFID reader in the background and prints
+# each tag as soon as it is read.
+# ----------------------------------------------------------------
+#
+# Written by SparkFun Electronics, October 2026
+#
+# This python library supports the SparkFun Electronics qwiic 
+# sensor/board ecosystem on a Raspberry Pi (and compatible) single
+# board computers.
+#
+# More information on qwiic is at https://www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SParkFun. Buy a board!
+# https://www.sparkfun.com/products/15191
+# 
+# ================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+# Example 4
+#
+# This example code demonstrates how to let the library poll the Qwiic RFID reader
+# for you. Instead of sleeping and then reading the whole buffer like example 2,
+# a background thread drains the reader quickly while tags are arriving and slows
+# down when nothing is being scanned, so the 20 tag buffer never fills up. Each
+# tag is handed to a callback function as soon as it is read.
+
+import qwiic_rfid
+import time
+import sys
+
+def print_tag(record):
+    print("\nTag ID: " + record.tag)
+    print("Scanned " + str(record.age) + " seconds ago")
+
+def run_example():
+    
+    print("\nSparkFun Qwiic RFID Example 4\n")
+    my_RFID = qwiic_rfid.QwiicRFID()
+
+    if my_RFID.begin() == False:
+        print("The Qwiic RFID Reader isn't connected to the system. Please check your connection", \
+            file=sys.stderr)
+        return
+
+    print("\nReady to scan some tags!")
+
+    my_RFID.start_polling(callback=print_tag)
+
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        my_RFID.stop_polling()
+
+if __name__ == '__main__':
+    try:
+        run_example()
+    except (KeyboardInterrupt, SystemExit) as exErr:
+        print("\nEnding Example 4")
+        sys.exit(0)
@@ -49,7 +49,24 @@ New to qwiic? Take a look at the entire [SparkFun qwiic ecosystem](https://www.s
 """
 #-----------------------------------------------------------------------------
 
-import qwiic_i2c
+import bisect
+import collections
+import errno
+import math
+import os
+import random
+import struct
+import threading
+import time
+from array import array
+from queue import Full as _QueueFull
+
+# qwiic_i2c and the heavier standard modules (asyncio, concurrent.futures,
+# csv) are imported where they are first needed, so importing this module
+# stays cheap for code that brings its own driver, decodes saved data or runs
+# against the simulator. The scan journal, the tag service, sharing tags
+# between processes and the command line tool live in the qwiic_rfid_journal,
+# qwiic_rfid_server, qwiic_rfid_ipc and qwiic_rfid_cli modules.
 
 # Define the device name and I2C addresses. These are set in teh class definition
 # as class variables, making them available without having to create a class instance.
@@ -66,285 +83,3404 @@ _AVAILABLE_I2C_ADDRESS = [0x13, 0x14]
 
 # QUESTION: what do you do if the i2c address is software configurable?!
 
-# define the class that enxapsulates the device being created. All information associated with this
-# device is enxapsulated by this class. The device class should be the only value exported
-# from this module.
+# Each read from the reader returns 10 bytes: a 6 byte tag ID followed by the
+# big endian 32 bit time in milliseconds since the tag was scanned. An empty
+# reader returns all zeros.
+_RECORD_STRUCT = struct.Struct(">6sI")
+_BLANK_TAG_ID = bytes(6)
 
-class QwiicRFID(object):
-    """!
-    QwiicRFID
+# The same record split into integer fields, so the ID can be stored without
+# creating a bytes object: ID high 16 bits, ID low 32 bits, age.
+_RECORD_INT_STRUCT = struct.Struct(">HII")
 
-    @param address: The I2C address to use for the device.
-                        If not provied, the default address is  used.
-    @param i2c_driver: An existing i2c driver object. If not provided
-                        a driver object is created.
+# The same record with each ID byte on its own, and the decimal string of
+# every byte value, for building the tag strings get_tag() returns
+_RECORD_BYTES_STRUCT = struct.Struct(">6BI")
+_BYTE_STRINGS = tuple(str(n) for n in range(256))
 
-    @return **Object** The RFID device object.
+# The reader reports whole milliseconds, so a scan can be up to this much
+# older than its reported age.
+_AGE_RESOLUTION_NS = 1000000
+
+# RFIDTransport
+#
+# The part of an I2C driver that QwiicRFID uses. Any object with these three
+# methods can be passed as i2c_driver: a qwiic_i2c driver, the simulated
+# readers below, or a wrapper around either. Failed transactions raise
+# OSError, as the qwiic_i2c drivers do.
+#
+# A transport talking to readers whose firmware returns several buffered
+# records from one long read may set max_burst_records to the most records
+# one readBlock() can carry. QwiicRFID.begin() then drains in bursts.
+class RFIDTransport(object):
+    """!
+    RFIDTransport
+
+    Base class describing the transport methods QwiicRFID calls.
     """
-    # Constructor
-    device_name = _DEFAULT_NAME
-    available_addresses = _AVAILABLE_I2C_ADDRESS
+    def readBlock(self, address, commandCode, nBytes):
+        """!
+        Reads a block of bytes from a device
 
-    # Global variables
-    ALTERNATE_ADDR = 0x7C
-    ADDRESS_LOCATION = 0xC7
+        @param address: I2C address of the device
+        @param commandCode: Register to read from
+        @param nBytes: Number of bytes to read
 
-    TAG_AND_TIME_REQUEST = 10
-    MAX_TAG_STORAGE = 20
-    BYTES_IN_BUFFER = 4
+        @return **list** The bytes read, as ints
+        """
+        raise NotImplementedError
 
-    RFID_TAG = None
-    RFID_TIME = None
-    TAG_ARRAY = [None] * MAX_TAG_STORAGE
-    TIME_ARRAY = [None] * MAX_TAG_STORAGE
+    def writeByte(self, address, commandCode, value):
+        """!
+        Writes one byte to a device register
 
-    # Constructor
-    def __init__(self, address=None, i2c_driver=None):
-        
-        # Did the user specify an I2C address?
-        if address in self.available_addresses:
-            self.address = address
-        else:
-            self.address = self.available_addresses[0]
+        @param address: I2C address of the device
+        @param commandCode: Register to write to
+        @param value: The byte to write
+        """
+        raise NotImplementedError
 
-        # Load the I2C driver if one isn't provided
-        if i2c_driver == None:
-            self._i2c = qwiic_i2c.getI2CDriver()
-            if self._i2c == None:
-                print("Unable to load I2C driver for this platform.")
-                return
-        else:
-            self._i2c = i2c_driver
+    def isDeviceConnected(self, devAddress):
+        """!
+        Determine if a device answers at an address
 
-    # ------------------------------------
-    # is_connected()
+        @param devAddress: I2C address to check
+
+        @return **bool** True if a device answered
+        """
+        raise NotImplementedError
+
+# RetryPolicy
+#
+# How QwiicRFID retries a failed I2C transaction. A noisy cable or a reader
+# that is busy can NACK a transaction; rather than failing the caller at
+# once the transaction is tried again up to retries more times, waiting
+# base_delay, then twice that, and so on up to max_delay. Each wait is
+# shortened by a random fraction of up to jitter, so readers on one bus don't
+# retry in step. From the reconnect_after'th retry on, the reader is probed
+# with is_connected() before trying again.
+class RetryPolicy(object):
+    """!
+    RetryPolicy
+
+    @param retries: Extra attempts after the first failure
+    @param base_delay: Seconds to wait before the first retry
+    @param max_delay: Longest wait between retries
+    @param jitter: Fraction, 0 to 1, of each wait that is randomised
+    @param reconnect_after: Retry from which the reader is probed before each attempt
+
+    @return **Object** The retry policy object.
+    """
+    def __init__(self, retries=3, base_delay=0.002, max_delay=0.25, jitter=0.5, reconnect_after=2):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.reconnect_after = reconnect_after
+        self._random = random.Random()
+
+    # ------------------------------------------------
+    # delay(attempt)
     #
-    # Is an actual board connected to our system?
-    def is_connected(self):
+    # Returns the wait before retry number attempt, counting from 0.
+    def delay(self, attempt):
         """!
-        Determine if a Qwiic RFID device is connected to the system.
+        Gets the wait before a retry
 
-        @return **void** True if the device is connected, otherwise False.
+        @param attempt: The retry about to be made, counting from 0
+
+        @return **float** Seconds to wait
         """
-        return self._i2c.isDeviceConnected(self.address)
+        delay = min(self.base_delay * (2 ** attempt), self.max_delay)
+        return delay * (1.0 - self.jitter * self._random.random())
 
-    # -------------------------------------
-    # begin()
-    #
-    # Initialize the system/validate the board.
-    def begin(self):
+# TagRecord
+#
+# One tag read off the Qwiic RFID reader. The raw ID bytes are kept as they
+# came off the bus; the tag string that get_tag() has always returned is
+# derived from them on demand.
+class TagRecord(object):
+    """!
+    TagRecord
+
+    @param tag_id: The raw 6 byte tag ID as bytes
+    @param age_ms: Milliseconds between the scan and the read off the I2C bus
+    @param received_ns: time.monotonic_ns() when the record was read, taken
+                        as the middle of the I2C transaction
+    @param address: I2C address of the reader the tag came from
+    @param error_ns: How far scan_ns may be from the true scan time
+
+    @return **Object** The tag record.
+    """
+    __slots__ = ("tag_id", "age_ms", "received_ns", "address", "error_ns")
+
+    def __init__(self, tag_id, age_ms, received_ns=0, address=None, error_ns=0):
+        self.tag_id = tag_id
+        self.age_ms = age_ms
+        self.received_ns = received_ns
+        self.address = address
+        self.error_ns = error_ns
+
+    @property
+    def tag(self):
         """!
-        Initialize the operation of the Qwiic GPIO
+        The tag in the string form returned by QwiicRFID.get_tag()
 
-        @return **void** Returns true if the initialization was successful, otherwise False.
+        @return **string** Each ID byte in decimal, concatenated
         """
-        return self.is_connected()
+        strings = _BYTE_STRINGS
+        tag_id = self.tag_id
+        return (strings[tag_id[0]] + strings[tag_id[1]] + strings[tag_id[2]] + strings[tag_id[3]] +
+            strings[tag_id[4]] + strings[tag_id[5]])
 
-    # --------------------------------------
-    # get_tag()
-    #
-    # This function gets the RFID tag from the Qwiic RFID Reader. If there is not
-    # a tag then it will return an empty string. When the function is called the tag
-    # is retrieved but saved to a global struct variable set within the _read_tag_time
-    # function. The tag is saved to a local variable, wiped from the global variable, and
-    # local variable is returned. This allows me to get both the tag and the
-    # associated time the tag was scanned at the same time, while keeping the 
-    # function simple.
-    def get_tag(self):
+    @property
+    def tag_int(self):
         """!
-        Gets the current RFID tag
+        The tag ID as an integer
 
-        @return **string** Returns the RFID tag
+        @return **int** The 6 ID bytes read as a big endian number
         """
-        # Call the read command that will fill the global struct variable: rfidData
-        self._read_tag_time()
+        return int.from_bytes(self.tag_id, "big")
 
-        temp_tag = self.RFID_TAG  # Assign the tag to our local variable
-        self.RFID_TAG = None   # Clear the global variable
-        return temp_tag  # Return the local variable
+    @property
+    def age(self):
+        """!
+        The time between the scan and the read off the I2C bus
 
-    # --------------------------------------
-    # get_req_time()
-    # 
-    # This funtion gets the time in seconds of the latest RFID tag was scanned from the Qwiic
-    # RFID reader. If there is no tag then the time that is returned will be zero.
-    # The information is received in the call to get_tag() above.
-    def get_req_time(self):
+        @return **float** Age in seconds
+        """
+        return self.age_ms / 1000.0
+
+    @property
+    def scan_ns(self):
         """!
-        Gets the time when when RFID tag was last scanned
+        When the tag was scanned, on the time.monotonic_ns() clock. The true
+        scan time is within error_ns of this.
 
-        @return **int** Returns time in seconds
+        @return **int** Receive time less the age
         """
-        # Global variable is loaded from get_tag function. 
-        # There is no time without a tag scan.
-        temp_time = self.RFID_TIME   # Assign the time to the local variable
-        self.RFID_TIME = 0   # Clear the global variable
-        return temp_time/1000    # Return the local variable in seconds
+        return self.received_ns - self.age_ms * 1000000
 
-    # --------------------------------------------
-    # get_prec_req_time()
+    @property
+    def scan_time(self):
+        """!
+        When the tag was scanned, as wall clock time
+
+        @return **float** Seconds since the epoch, like time.time()
+        """
+        return (self.scan_ns + time.time_ns() - time.monotonic_ns()) / 1e9
+
+    def __eq__(self, other):
+        if not isinstance(other, TagRecord):
+            return NotImplemented
+        return (self.tag_id, self.age_ms, self.received_ns, self.address, self.error_ns) == \
+            (other.tag_id, other.age_ms, other.received_ns, other.address, other.error_ns)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "TagRecord(tag_id=%r, age_ms=%d, received_ns=%d, address=%r, error_ns=%d)" % \
+            (self.tag_id, self.age_ms, self.received_ns, self.address, self.error_ns)
+
+# ------------------------------------------------
+# _decode_record(buf, offset, received_ns, address, error_ns)
+#
+# Decodes one 10 byte record in a single unpack. Returns None for the blank
+# record the reader sends when its buffer is empty.
+def _decode_record(buf, offset=0, received_ns=0, address=None, error_ns=0):
+    tag_id, age_ms = _RECORD_STRUCT.unpack_from(buf, offset)
+    if tag_id == _BLANK_TAG_ID:
+        return None
+    return TagRecord(tag_id, age_ms, received_ns, address, error_ns)
+
+# ------------------------------------------------
+# decode_records(buf, count, use_numpy)
+#
+# Decodes count back to back 10 byte records from buf in one batched pass and
+# returns them as columns: IDs as integers and ages in milliseconds. Without
+# NumPy the columns are array('Q') and array('L'), filled by struct.iter_unpack.
+# With NumPy they are uint64 and uint32 ndarrays decoded through a structured
+# dtype view of buf, without copying the raw bytes. use_numpy=None uses NumPy
+# if it is installed.
+def decode_records(buf, count=None, use_numpy=None):
+    """!
+    Decodes a block of raw reader records into columns
+
+    @param buf: bytes-like object holding the records
+    @param count: Number of records to decode. Defaults to all of buf.
+    @param use_numpy: True to require NumPy, False to avoid it, None to use it if installed
+
+    @return **tuple** (ids, ages) columns
+    """
+    size = _RECORD_INT_STRUCT.size
+    if count is None:
+        count = len(buf) // size
+    view = memoryview(buf)[:count * size]
+
+    np = _numpy() if use_numpy is not False else None
+    if np is None:
+        if use_numpy:
+            raise ImportError("NumPy is not installed")
+
+        ids = array("Q", bytes(8 * count))
+        ages = array("L", [0]) * count
+        for i, (id_high, id_low, age_ms) in enumerate(_RECORD_INT_STRUCT.iter_unpack(view)):
+            ids[i] = (id_high << 32) | id_low
+            ages[i] = age_ms
+        return ids, ages
+
+    records = np.frombuffer(view, dtype=_numpy_record_dtype(np), count=count)
+    ids = (records["id_high"].astype(np.uint64) << np.uint64(32)) | records["id_low"]
+    return ids, records["age"].astype(np.uint32)
+
+# NumPy is optional. It is imported the first time it is wanted, and None is
+# returned if it is not installed.
+_np = False
+
+def _numpy():
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+def _numpy_record_dtype(np):
+    return np.dtype([("id_high", ">u2"), ("id_low", ">u4"), ("age", ">u4")])
+
+# Sort key putting records in the order their tags were scanned
+def _scan_time(record):
+    return record.scan_ns
+
+# TagRingBuffer
+#
+# A fixed size ring of tag records held in flat arrays: tag IDs as 64 bit
+# integers, ages in milliseconds, monotonic receive times in nanoseconds and
+# the error bound of each record's scan time in nanoseconds.
+# Nothing is allocated once the ring is built, and the stored records can be
+# viewed in place through memoryviews.
+class TagRingBuffer(object):
+    """!
+    TagRingBuffer
+
+    @param capacity: Number of records the ring can hold
+
+    @return **Object** The ring buffer object.
+    """
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self.ids = array("Q", bytes(8 * capacity))
+        self.ages = array("L", [0]) * capacity
+        self.received = array("q", bytes(8 * capacity))
+        self.errors = array("q", bytes(8 * capacity))
+        self._head = 0     # Index of the oldest record
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    # ------------------------------------------------
+    # push(tag_id, age_ms, received_ns, error_ns)
     #
-    # This function gets the precise time in seconds of the latest RFID tag was scanned from the Qwiic 
-    # RFID reader. If there is no tag then the time that is returned will be zero.
-    # The information is received in the call to get_tag() above.
-    def get_prec_req_time(self):
+    # Adds a record at the tail of the ring. When the ring is full the oldest
+    # record is overwritten, just like the reader's own buffer does.
+    def push(self, tag_id, age_ms, received_ns, error_ns=0):
         """!
-        Gets the time when the RFID tag was last scanned
+        Adds a record to the ring
 
-        @return **int** Returns time in seconds
+        @param tag_id: The tag ID as an integer
+        @param age_ms: Milliseconds between the scan and the read
+        @param received_ns: time.monotonic_ns() when the record was read
+        @param error_ns: Error bound of the record's scan time
+
+        @return **bool** True if the oldest record was overwritten
         """
-        # Global variable is loaded from get_tag function. 
-        # There is no time without a tag scan.
-        temp_time = float(self.RFID_TIME)/1000   # Assign the time to the local variable
-        self.RFID_TIME = 0   # Clear the global variable
-        return temp_time # Return the local variable in seconds
-    
-    # ---------------------------------------------
-    # clear_tags()
+        i = self._head + self._count
+        if i >= self.capacity:
+            i -= self.capacity
+
+        self.ids[i] = tag_id
+        self.ages[i] = age_ms
+        self.received[i] = received_ns
+        self.errors[i] = error_ns
+
+        if self._count == self.capacity:
+            self._head = i + 1 if i + 1 < self.capacity else 0
+            return True
+
+        self._count += 1
+        return False
+
+    # ------------------------------------------------
+    # pop(address)
     #
-    # This function clears the buffer from the Qwiic RFID reader by reading them
-    # but not storing them.
-    def clear_tags(self):
+    # Removes the oldest record and returns it as a TagRecord.
+    def pop(self, address=None):
         """!
-        Reads and clears the tags from the buffer
+        Removes the oldest record from the ring
+
+        @param address: Reader address to set on the returned record
+
+        @return **TagRecord** The oldest record, or None if the ring is empty
         """
-        self._read_all_tags_times(self.MAX_TAG_STORAGE)
+        if self._count == 0:
+            return None
 
-    # --------------------------------------------
-    # get_all_tags(tagArray[MAX_TAG_STORAGE])
+        i = self._head
+        record = TagRecord(self.ids[i].to_bytes(6, "big"), self.ages[i], self.received[i],
+            address, self.errors[i])
+
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        self._count -= 1
+        return record
+
+    # ------------------------------------------------
+    # clear()
     #
-    # This function gets all the available tags on the Qwiic RFID reader's buffer.
-    # The buffer on the Qwiic RFID holds 20 tags and their scan time. Not knowing
-    # how many are available until the i2c buffer is read, the parameter is a full
-    # 20 element array.
-    def get_all_tags(self, tag_array):
+    # Forgets every record. The storage itself is kept for reuse.
+    def clear(self):
         """!
-        Gets all the tags in the buffer
+        Empties the ring
+        """
+        self._head = 0
+        self._count = 0
 
-        @param tag_array: list of upto 20 RFID tag numbers
+    # ------------------------------------------------
+    # segments()
+    #
+    # Returns the stored records oldest first as (ids, ages, received, errors) tuples
+    # of memoryviews into the ring's arrays. Records that wrap past the end of
+    # the arrays come back as a second tuple. The views are only valid until
+    # the ring is next written.
+    def segments(self):
+        """!
+        Views the stored records without copying them
+
+        @return **list** Up to two (ids, ages, received, errors) tuples of memoryviews
         """
-        # Load up the global struct variables
-        self._read_all_tags_times(self.MAX_TAG_STORAGE)
+        ids = memoryview(self.ids)
+        ages = memoryview(self.ages)
+        received = memoryview(self.received)
+        errors = memoryview(self.errors)
+        return [(ids[a:b], ages[a:b], received[a:b], errors[a:b]) for a, b in self._spans()]
 
-        for i in range(0, self.MAX_TAG_STORAGE):
-            tag_array[i] = self.TAG_ARRAY[i]  # Load up passed array with tag
-            self.TAG_ARRAY[i] = ""   # Clear global variable
+    # ------------------------------------------------
+    # snapshot()
+    #
+    # Copies the stored records, oldest first, into new arrays that stay
+    # valid after the ring is written again.
+    def snapshot(self):
+        """!
+        Copies the stored records out of the ring
 
-    # ---------------------------------------------
-    # get_all_prec_times(time_array)
-    # 
-    # This function gets all the available precise scan times associated with the scanned RFID tags.
-    # The buffer on the Qwiic RFID holds 20 tags and their scan time. Not knowing
-    # how many are available until the I2C buffer is read, the parameter is a full 20 element
-    # array.
-    # A note on the time: the time is not the time of the day when the tage was scanned
-    # but actually the time between when the tag was scanned and when it was read from the I2C bus.
-    def get_all_prec_times(self, time_array):
-    
+        @return **tuple** (ids, ages, received, errors) arrays, oldest record first
+        """
+        ids = array("Q")
+        ages = array("L")
+        received = array("q")
+        errors = array("q")
+        for a, b in self._spans():
+            ids += self.ids[a:b]
+            ages += self.ages[a:b]
+            received += self.received[a:b]
+            errors += self.errors[a:b]
+        return ids, ages, received, errors
+
+    # ------------------------------------------------
+    # _spans()
+    #
+    # The (start, end) index ranges of the stored records, oldest first.
+    def _spans(self):
+        end = self._head + self._count
+        if end <= self.capacity:
+            return [(self._head, end)] if self._count else []
+        return [(self._head, self.capacity), (0, end - self.capacity)]
+
+# TagDeduplicator
+#
+# Suppresses repeat scans of the same tag. A badge held at a reader fills its
+# buffer with the same ID; any scan within window seconds of the previous scan
+# of that tag is dropped, so a held badge comes through once. Tags are kept in
+# least recently scanned order, and entries leave either once their window has
+# passed or, beyond max_tags, oldest first, so memory is bounded.
+class TagDeduplicator(object):
+    """!
+    TagDeduplicator
+
+    @param window: Seconds within which a repeat scan is suppressed
+    @param max_tags: Most tags remembered at once
+    @param per_reader: If True the same tag on different readers is not a repeat
+
+    @return **Object** The deduplicator object.
+    """
+    def __init__(self, window=2.0, max_tags=1024, per_reader=False):
+        if max_tags < 1:
+            raise ValueError("max_tags must be at least 1")
+
+        self.window_ns = int(window * 1e9)
+        self.max_tags = max_tags
+        self.per_reader = per_reader
+
+        self.hits = 0    # Scans of a tag that was still remembered
+        self.drops = 0    # Scans suppressed as repeats
+        self.evictions = 0    # Tags forgotten early to stay within max_tags
+
+        self._last_scan = collections.OrderedDict()    # key -> last scan_ns
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._last_scan)
+
+    # ------------------------------------------------
+    # accept(record)
+    #
+    # Decides whether a record is a new scan or a repeat to drop.
+    def accept(self, record):
         """!
-        Gets all times in the buffer
+        Checks a record against recent scans
 
-        @param time_array: list of upto 20 times the RFID tag was read from the I2C bus
+        @param record: The TagRecord to check
+
+        @return **bool** True if the record should be kept
         """
-        for i in range(0, self.MAX_TAG_STORAGE):
-            time_array[i] = self.TIME_ARRAY[i]    # Load up passed array with time in seconds
-            time_array[i] = float(time_array[i])/1000
-            self.TIME_ARRAY[i] = 0   # Clear global variable
+        return self._accept(record.tag_int, record.scan_ns, record.address)
 
-    # ----------------------------------------------
-    # change_address(new_address)
+    # ------------------------------------------------
+    # filter(records)
     #
-    # This function changes the I2C address of the Qwiic RFID. The address
-    # is written to the memory location in EEPROM that determines its address.
-    def change_address(self, new_address):
+    # Returns the records that are not repeats, in their original order.
+    def filter(self, records):
         """!
-        Changes the I2C address of the Qwiic RFID reader
+        Removes repeat scans from a list of records
 
-        @param new_address: the new address to set the RFID reader to
-        
-        @return **bool** False if the address is out of range
+        @param records: TagRecords, oldest first
+
+        @return **list** The records kept
         """
-        if new_address < 0x07 or new_address > 0x78:
-            return False
-        
-        self._i2c.writeByte(self.address, self.ADDRESS_LOCATION, new_address)
-        
-        self.address = new_address
+        return [record for record in records if self.accept(record)]
+
+    def _accept(self, tag_id, scan_ns, address=None):
+        key = (address, tag_id) if self.per_reader else tag_id
+        last_scan = self._last_scan
+
+        with self._lock:
+            # Forget tags whose window has passed. Entries are kept in scan
+            # order, so only the front needs checking.
+            expire_ns = scan_ns - self.window_ns
+            while last_scan:
+                oldest_key = next(iter(last_scan))
+                if last_scan[oldest_key] >= expire_ns:
+                    break
+                del last_scan[oldest_key]
+
+            previous = last_scan.pop(key, None)
+            last_scan[key] = scan_ns if previous is None else max(scan_ns, previous)
+
+            if previous is not None:
+                self.hits += 1
+                if scan_ns - previous <= self.window_ns:
+                    self.drops += 1
+                    return False
+                return True
+
+            if len(last_scan) > self.max_tags:
+                last_scan.popitem(last=False)
+                self.evictions += 1
+            return True
 
     # ------------------------------------------------
-    # _read_tag_time()
-    # 
-    # This function handles the I2C transaction to get the RFID tag and 
-    # time from the Qwiic RFID reader. What comes in from the RFID reader is a 
-    # number that was converted from a string to its direct numerical
-    # representation which is then converted back to its original state. The tag
-    # and the time is saves to the global variables.
-    def _read_tag_time(self):
+    # stats()
+    #
+    # Returns the counters and current size as a dict.
+    def stats(self):
         """!
-        Handles the I2C transaction to get the RFID tag and time
+        Gets the deduplicator's counters
+
+        @return **dict** hits, drops, evictions and tags currently remembered
         """
-        _temp_tag_str = ""  
-        _temp_time = 0
+        return {"hits": self.hits, "drops": self.drops, "evictions": self.evictions,
+            "tags": len(self._last_scan)}
 
-        # What is read from the buffer is immediately converted to a string and 
-        # concatenated onto the temporary variable.
-        _temp_tag_list = self._i2c.readBlock(self.address, 0, 10)
-        
-        for i in range(0, 6):
-            _temp_tag_str += str(_temp_tag_list[i])
-        
-        # The tag is copied to the global variable
-        self.RFID_TAG = _temp_tag_str
-        
-        # Bring in the time
-        if self.RFID_TAG == "000000":    # If the tag is blank
+    # ------------------------------------------------
+    # clear()
+    #
+    # Forgets every remembered tag. Counters are kept.
+    def clear(self):
+        """!
+        Forgets all remembered tags
+        """
+        with self._lock:
+            self._last_scan.clear()
 
-            # Time is zero if there is not a tag
-            _temp_time = 0
-        
-        else:
-            _temp_time = int(_temp_tag_list[6]) * 16 ** (6) + int(_temp_tag_list[7]) * 16 ** (4) + int(_temp_tag_list[8]) * 16 ** (2) + int(_temp_tag_list[9])
-            
-        # Time is copied to the global variable
-        self.RFID_TIME = _temp_time   # Time in milliseconds
+# RFIDMetrics
+#
+# Counters and histograms for one reader's I2C traffic, filled in by QwiicRFID
+# when its metrics attribute is set. With metrics left as None the read path
+# only pays for one attribute check per transaction. Readers polled from
+# several threads may share one, so updates are made under a lock.
+class RFIDMetrics(object):
+    """!
+    RFIDMetrics
 
-    # ----------------------------------------------------
-    # _read_all_tags_times(_num_of_reads)
+    @param labels: Dict of labels added to every exported sample, such as
+                    the reader's address
+
+    @return **Object** The metrics object.
+    """
+    # Upper bounds, in nanoseconds, of the transaction latency buckets
+    LATENCY_BUCKETS_NS = (50000, 100000, 250000, 500000, 1000000, 2500000, 5000000, 10000000)
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})
+        self._hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    # ------------------------------------------------
+    # reset()
     #
-    # This function differs from the above by populating an array of 20 elements that
-    # drains the entire available rfid buffer on the Qwiic RFID Reader. Similar to the
-    # function above it handles the I2C transaction to get the RFID tags time from the 
-    # Qwiic RFID Reader. What comes in the form of the RFID reader is a number that was
-    # converted from a string to it's direct numerical representation which is then 
-    # converted back to its' original state.
-    def _read_all_tags_times(self, _num_of_reads):
-        """!
-        Populates an array of 20 RFID tags/times and drains available RFID buffer on the Reader.
-
-        @param _num_of_reads: int number of bytes to read
-        """        
-        for i in range(0, _num_of_reads):
-            _temp_tag_str = ""
-            _temp_time = 0
-        
-            # What is read from the buffer is immediately converted to a string and 
-            # concatenated onto the temporary variable.
-            _temp_tag_list = self._i2c.readBlock(self.address, 0, 10)
-        
-            for j in range(0, 6):
-                _temp_tag_str += str(_temp_tag_list[j])
+    # Zeroes every counter and histogram.
+    def reset(self):
+        """!
+        Clears all metrics
+        """
+        with self._lock:
+            self.reads = 0
+            self.writes = 0
+            self.blank_reads = 0
+            self.read_latency = [0] * (len(self.LATENCY_BUCKETS_NS) + 1)
+            self.write_latency = [0] * (len(self.LATENCY_BUCKETS_NS) + 1)
+            self.read_ns = 0
+            self.write_ns = 0
+            self.decode_ns = 0
+            self.decodes = 0
+            self.drains = 0
+            self.drain_fill = [0] * (QwiicRFID.MAX_TAG_STORAGE + 1)    # Drains by tags read
+            self.overflows = 0
+            self.errors = 0    # Failed transactions, whether or not a retry succeeded
+            self.retries = 0
+            self.reconnects = 0
+
+    def record_read(self, latency_ns, blank):
+        bucket = bisect.bisect_left(self.LATENCY_BUCKETS_NS, latency_ns)
+        with self._lock:
+            self.reads += 1
+            self.read_ns += latency_ns
+            self.read_latency[bucket] += 1
+            if blank:
+                self.blank_reads += 1
+
+    def record_write(self, latency_ns):
+        bucket = bisect.bisect_left(self.LATENCY_BUCKETS_NS, latency_ns)
+        with self._lock:
+            self.writes += 1
+            self.write_ns += latency_ns
+            self.write_latency[bucket] += 1
+
+    def record_decode(self, decode_ns, count=1):
+        with self._lock:
+            self.decodes += count
+            self.decode_ns += decode_ns
+
+    # A drain that read a whole buffer's worth of tags may have found the
+    # reader full, in which case older scans were overwritten.
+    def record_drain(self, num_read):
+        with self._lock:
+            self.drains += 1
+            self.drain_fill[min(num_read, QwiicRFID.MAX_TAG_STORAGE)] += 1
+            if num_read >= QwiicRFID.MAX_TAG_STORAGE:
+                self.overflows += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_reconnect(self):
+        with self._lock:
+            self.reconnects += 1
+
+    # ------------------------------------------------
+    # snapshot()
+    #
+    # Returns the current metrics as a dict of plain values.
+    def snapshot(self):
+        """!
+        Gets the current metrics
+
+        @return **dict** Counters, ratios and histograms
+        """
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            "labels": dict(self.labels),
+            "reads": self.reads,
+            "writes": self.writes,
+            "blank_reads": self.blank_reads,
+            "blank_ratio": self.blank_reads / self.reads if self.reads else 0.0,
+            "read_latency_avg_ns": self.read_ns / self.reads if self.reads else 0.0,
+            "write_latency_avg_ns": self.write_ns / self.writes if self.writes else 0.0,
+            "read_latency_buckets": dict(zip(self.LATENCY_BUCKETS_NS + ("inf",), self.read_latency)),
+            "write_latency_buckets": dict(zip(self.LATENCY_BUCKETS_NS + ("inf",), self.write_latency)),
+            "decode_avg_ns": self.decode_ns / self.decodes if self.decodes else 0.0,
+            "drains": self.drains,
+            "drain_fill": list(self.drain_fill),
+            "overflows": self.overflows,
+            "errors": self.errors,
+            "retries": self.retries,
+            "reconnects": self.reconnects,
+        }
+
+    # ------------------------------------------------
+    # samples()
+    #
+    # Yields every metric as a (name, labels, value) tuple, named and shaped
+    # the way Prometheus expects: counters end in _total and histograms are
+    # cumulative _bucket samples with an le label, plus _sum and _count. The
+    # built in samples are all taken under the lock, so they agree with each
+    # other; hooks are called after it is released.
+    def samples(self):
+        """!
+        Gets the metrics as Prometheus style samples
+
+        @return **iterator** (name, labels dict, value) tuples
+        """
+        with self._lock:
+            samples = list(self._samples())
+        for sample in samples:
+            yield sample
+
+        for hook in self._hooks:
+            for sample in hook(self):
+                yield sample
+
+    def _samples(self):
+        labels = self.labels
+        yield "qwiic_rfid_reads_total", labels, self.reads
+        yield "qwiic_rfid_writes_total", labels, self.writes
+        yield "qwiic_rfid_blank_reads_total", labels, self.blank_reads
+        yield "qwiic_rfid_drains_total", labels, self.drains
+        yield "qwiic_rfid_overflows_total", labels, self.overflows
+        yield "qwiic_rfid_errors_total", labels, self.errors
+        yield "qwiic_rfid_retries_total", labels, self.retries
+        yield "qwiic_rfid_reconnects_total", labels, self.reconnects
+        yield "qwiic_rfid_decode_seconds_total", labels, self.decode_ns / 1e9
+
+        for name, counts, total_ns in (("qwiic_rfid_read_latency_seconds", self.read_latency, self.read_ns),
+                ("qwiic_rfid_write_latency_seconds", self.write_latency, self.write_ns)):
+            cumulative = 0
+            for bound, count in zip(self.LATENCY_BUCKETS_NS + (None,), counts):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound / 1e9)
+                yield name + "_bucket", dict(labels, le=le), cumulative
+            yield name + "_sum", labels, total_ns / 1e9
+            yield name + "_count", labels, cumulative
+
+    # ------------------------------------------------
+    # add_hook(hook)
+    #
+    # Adds a function called by samples() with this object, returning more
+    # (name, labels, value) tuples to export alongside the built in ones.
+    def add_hook(self, hook):
+        """!
+        Adds extra samples to the export
+
+        @param hook: Function taking this RFIDMetrics and returning samples
+        """
+        self._hooks.append(hook)
+
+    # ------------------------------------------------
+    # to_prometheus()
+    #
+    # Formats samples() in the Prometheus text exposition format, ready to be
+    # served by an exporter. Backslashes, double quotes and newlines in label
+    # values are escaped as the format requires.
+    def to_prometheus(self):
+        """!
+        Formats the metrics for Prometheus
+
+        @return **string** The metrics in the Prometheus text format
+        """
+        lines = []
+        for name, labels, value in self.samples():
+            if labels:
+                label_text = ",".join('%s="%s"' % (key, _escape_label(labels[key])) for key in sorted(labels))
+                lines.append("%s{%s} %s" % (name, label_text, value))
+            else:
+                lines.append("%s %s" % (name, value))
+        return "\n".join(lines) + "\n"
+
+# Escapes a label value for the Prometheus text format
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# PollScheduler
+#
+# Picks the time to the next drain from a prediction of how fast each reader's
+# buffer is filling. The arrival rate of each reader is an exponentially
+# weighted moving average of the tags found per second by each drain. A full
+# drain only gives a lower bound that way, so then the age of the oldest tag
+# is used instead, as the time the buffer took to fill, and the estimate is
+# raised to it straight away rather than averaged in.
+#
+# Tags are assumed to arrive as a Poisson process. The next drain is put off
+# for as long as the chance of more than capacity tags arriving first stays
+# under loss_target, but never longer than max_latency, so no tag waits on the
+# reader longer than that, and never sooner than min_interval. A short quiet
+# spell says little about the rate, so the wait grows at most twofold per drain.
+class PollScheduler(object):
+    """!
+    PollScheduler
+
+    @param loss_target: Acceptable chance that a reader's buffer overflows
+                        between two drains
+    @param max_latency: Longest time in seconds between drains
+    @param min_interval: Shortest time in seconds between drains
+    @param alpha: Weight, 0 to 1, of the newest rate sample in the moving average
+    @param capacity: Tags the reader's buffer holds
+
+    @return **Object** The scheduler object.
+    """
+    def __init__(self, loss_target=0.001, max_latency=1.0, min_interval=0.005, alpha=0.3, capacity=20):
+        if not 0 < loss_target < 1:
+            raise ValueError("loss_target must be between 0 and 1")
+
+        self.loss_target = loss_target
+        self.max_latency = max_latency
+        self.min_interval = min_interval
+        self.alpha = alpha
+        self.capacity = capacity
+
+        # Most tags that may be expected between drains while meeting loss_target
+        self.safe_fill = _poisson_safe_mean(capacity, loss_target)
+
+        self.last_interval = None
+        self._readers = {}
+
+    # ------------------------------------------------
+    # observe(records, keys, now_ns, counts)
+    #
+    # Updates the rate estimates with the tags from one drain. keys lists the
+    # addresses of every reader that was drained, so readers that returned
+    # nothing count as idle. Repeat scans fill the reader's buffer as much as
+    # new tags do, so when a dedupe filter drops some, counts gives how many
+    # were really read off each reader.
+    def observe(self, records, keys=None, now_ns=None, counts=None):
+        """!
+        Feeds the result of a drain to the scheduler
+
+        @param records: TagRecords from the drain
+        @param keys: Addresses of the readers drained. Defaults to those in counts.
+        @param now_ns: time.monotonic_ns() of the drain. Defaults to now.
+        @param counts: Dict of reader address to the number of tags read off
+                    that reader, including repeats dropped by dedupe. Defaults
+                    to the number in records.
+        """
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+
+        found = {}
+        oldest_ms = {}
+        for record in records:
+            found[record.address] = found.get(record.address, 0) + 1
+            oldest_ms[record.address] = max(oldest_ms.get(record.address, 0), record.age_ms)
+        if counts is None:
+            counts = found
+
+        for key in (keys if keys is not None else counts):
+            estimate = self._readers.get(key)
+            if estimate is None:
+                estimate = self._readers[key] = _RateEstimate(now_ns)
+
+            count = counts.get(key, 0)
+            elapsed = (now_ns - estimate.last_ns) / 1e9
+            estimate.full = count >= self.capacity
+
+            if key in oldest_ms and (estimate.full or elapsed <= 0):
+                sample = count / max(oldest_ms[key] / 1000.0, 0.001)
+            elif elapsed > 0:
+                sample = count / elapsed
+            else:
+                sample = None
+
+            if sample is not None:
+                if estimate.samples == 0:
+                    estimate.rate = sample
+                else:
+                    estimate.rate += self.alpha * (sample - estimate.rate)
+                if estimate.full:
+                    estimate.rate = max(estimate.rate, sample)
+                estimate.samples += 1
+
+            estimate.drains += 1
+            estimate.full_drains += estimate.full
+            estimate.last_ns = now_ns
+            estimate.interval = min(self._target_interval(estimate), max(2 * estimate.interval, self.min_interval))
+
+    def _target_interval(self, estimate):
+        if estimate.full:
+            return 0.0
+        if estimate.rate <= 0:
+            return self.max_latency
+        return min(max(self.safe_fill / estimate.rate, self.min_interval), self.max_latency)
+
+    # ------------------------------------------------
+    # interval_for(key)
+    #
+    # Returns the wait before the given reader should next be drained.
+    def interval_for(self, key):
+        """!
+        Gets the time to the next drain of one reader
+
+        @param key: The reader's address
+
+        @return **float** Seconds to wait
+        """
+        estimate = self._readers.get(key)
+        if estimate is None:
+            return self.min_interval
+        return estimate.interval
+
+    # ------------------------------------------------
+    # next_interval()
+    #
+    # Returns the wait before the next drain: that of the reader most in need.
+    def next_interval(self):
+        """!
+        Gets the time to the next drain
+
+        @return **float** Seconds to wait
+        """
+        if not self._readers:
+            interval = self.min_interval
+        else:
+            interval = min(self.interval_for(key) for key in self._readers)
+
+        self.last_interval = interval
+        return interval
+
+    # ------------------------------------------------
+    # stats()
+    #
+    # Returns the scheduler's estimates and decisions as a dict.
+    def stats(self):
+        """!
+        Gets the scheduler's view of each reader
+
+        @return **dict** The safe fill, last interval chosen, and per reader
+                    rate, interval, predicted fill and drain counts
+        """
+        now_ns = time.monotonic_ns()
+        readers = {}
+        for key, estimate in self._readers.items():
+            readers[key] = {
+                "rate": estimate.rate,
+                "interval": self.interval_for(key),
+                "predicted_fill": min(estimate.rate * (now_ns - estimate.last_ns) / 1e9, self.capacity),
+                "drains": estimate.drains,
+                "full_drains": estimate.full_drains,
+            }
+        return {"safe_fill": self.safe_fill, "last_interval": self.last_interval, "readers": readers}
+
+class _RateEstimate(object):
+    __slots__ = ("rate", "interval", "last_ns", "samples", "drains", "full_drains", "full")
+
+    def __init__(self, now_ns):
+        self.rate = 0.0    # Tags per second
+        self.interval = 0.0    # Seconds until the next drain
+        self.last_ns = now_ns
+        self.samples = 0
+        self.drains = 0
+        self.full_drains = 0
+        self.full = False
+
+# Chance of more than capacity arrivals from a Poisson process with the given mean
+def _poisson_tail(mean, capacity):
+    term = math.exp(-mean)
+    total = term
+    for k in range(1, capacity + 1):
+        term *= mean / k
+        total += term
+    return max(1.0 - total, 0.0)
+
+# Largest mean number of arrivals for which the chance of more than capacity
+# stays within loss_target, found by bisection
+def _poisson_safe_mean(capacity, loss_target):
+    low, high = 0.0, float(capacity)
+    for _ in range(60):
+        mid = (low + high) / 2
+        if _poisson_tail(mid, capacity) <= loss_target:
+            low = mid
+        else:
+            high = mid
+    return low
+
+# TagPoller
+#
+# A background thread that keeps draining a QwiicRFID and hands each tag to a
+# callback and/or a queue. The poll interval adapts: it drops to
+# min_interval as soon as tags are seen and doubles on every empty drain up to
+# max_interval, which bounds how long a tag can wait on the reader.
+class TagPoller(threading.Thread):
+    """!
+    TagPoller
+
+    @param reader: The QwiicRFID to poll
+    @param callback: Called with each TagRecord read. Optional. An exception
+                    it raises is counted in callback_errors and kept in
+                    callback_error; polling carries on.
+    @param queue: A queue.Queue each TagRecord is put on. Optional. Tags are
+                    dropped, and counted in dropped, if the queue is full.
+    @param min_interval: Seconds between polls while tags are arriving
+    @param max_interval: Longest wait between polls when the reader is idle
+    @param name: Thread name. Defaults to one naming the reader's address.
+    @param scheduler: A PollScheduler that chooses the wait between polls
+                    instead of the fixed back off. Optional.
+
+    @return **Object** The poller object. Call start() to begin polling.
+    """
+    def __init__(self, reader, callback=None, queue=None, min_interval=0.02, max_interval=0.5, name=None,
+            scheduler=None):
+        threading.Thread.__init__(self, name=name or "QwiicRFID-poll-0x%02X" % reader.address)
+        self.daemon = True
+
+        if max_interval < min_interval:
+            raise ValueError("max_interval must not be less than min_interval")
+
+        self.reader = reader
+        self.callback = callback
+        self.queue = queue
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.scheduler = scheduler
+
+        self.interval = min_interval    # Current wait between polls
+        self.tags_read = 0
+        self.dropped = 0
+        self.bus_errors = 0    # Polls that failed with a bus error
+        self.callback_errors = 0    # Tags the callback raised an exception for
+        self.callback_error = None    # Last exception the callback raised
+        self.error = None    # Exception that stopped the thread, if any
+
+        self._stop_event = threading.Event()
+
+    # ------------------------------------------------
+    # poll_once()
+    #
+    # Drains the reader once, delivers what was read and returns the number of
+    # tags read off the reader. Repeats dropped by dedupe are counted, since
+    # they took up room on the reader all the same. Called by the thread, but
+    # usable directly for testing.
+    def poll_once(self):
+        """!
+        Drains the reader and delivers its tags
+
+        @return **int** Number of tags read, including repeats dropped by dedupe
+        """
+        records, counts = self._drain()
+        if self.scheduler is not None:
+            self.scheduler.observe(records, list(counts), counts=counts)
+
+        for record in records:
+            self._deliver(record)
+
+        self.tags_read += len(records)
+        return sum(counts.values())
+
+    # Drains the reader, returning its tags and the number read off it by address
+    def _drain(self):
+        records, num_read = self.reader._drain_records()
+        return records, {self.reader.address: num_read}
+
+    # An exception from the callback is kept rather than raised, so one bad
+    # tag doesn't stop polling or keep the record off the queue.
+    def _deliver(self, record):
+        if self.callback is not None:
+            try:
+                self.callback(record)
+            except Exception as err:
+                self.callback_errors += 1
+                self.callback_error = err
+        if self.queue is not None:
+            try:
+                self.queue.put_nowait(record)
+            except _QueueFull:
+                self.dropped += 1
+
+    # ------------------------------------------------
+    # _next_interval(num_read)
+    #
+    # Chooses the wait before the next poll. A full drain means more tags may
+    # already be waiting, so the next poll happens straight away.
+    def _next_interval(self, num_read):
+        if self.scheduler is not None:
+            return self.scheduler.next_interval()
+        if self._drained_full(num_read):
+            return 0
+        if num_read > 0:
+            return self.min_interval
+        return min(max(self.interval, self.min_interval) * 2, self.max_interval)
+
+    def _drained_full(self, num_read):
+        return num_read >= self.reader.MAX_TAG_STORAGE
+
+    # A bus error that outlasts the reader's retries doesn't stop polling; the
+    # poller backs off to max_interval and tries again.
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.interval = self._next_interval(self.poll_once())
+                except OSError:
+                    self.bus_errors += 1
+                    self.interval = self.max_interval
+                self._stop_event.wait(self.interval)
+        except Exception as err:
+            self.error = err
+
+    # ------------------------------------------------
+    # stop(timeout)
+    #
+    # Asks the thread to finish and waits for it. A poll in progress is
+    # completed and delivered first.
+    def stop(self, timeout=None):
+        """!
+        Stops polling and waits for the thread to finish
+
+        @param timeout: Seconds to wait for the thread, or None to wait forever
+
+        @return **bool** True if the thread has finished
+        """
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        return not self.is_alive()
+
+# define the class that enxapsulates the device being created. All information associated with this
+# device is enxapsulated by this class. The device class should be the only value exported
+# from this module.
+
+class QwiicRFID(object):
+    """!
+    QwiicRFID
+
+    @param address: The I2C address to use for the device.
+                        If not provied, the default address is  used.
+    @param i2c_driver: An existing i2c driver object, or any other
+                        RFIDTransport. If not provided a driver object is created.
+    @param buffer_size: Number of drained tags held locally. Defaults to
+                        MAX_TAG_STORAGE, the size of the reader's own buffer.
+    @param dedupe: A TagDeduplicator that repeat scans are dropped by as
+                        they are read. Optional.
+    @param metrics: An RFIDMetrics to record I2C traffic in, or True to
+                        create one. Optional; see enable_metrics().
+    @param retry: The RetryPolicy for failed I2C transactions. Defaults to
+                        RetryPolicy(); pass False to fail on the first error.
+    @param burst_records: Records to read per transaction when draining, for
+                        reader firmware that returns several at once. Defaults
+                        to, and is limited by, the transport's
+                        max_burst_records; see begin().
+    @param bus_lock: Lock held for each I2C transaction, to share with other
+                        users of the bus. Must be reentrant if it is also held
+                        around calls into this object. If not provided one is
+                        created.
+
+    @return **Object** The RFID device object.
+    """
+    # Constructor
+    device_name = _DEFAULT_NAME
+    available_addresses = _AVAILABLE_I2C_ADDRESS
+
+    # Global variables
+    ALTERNATE_ADDR = 0x7C
+    ADDRESS_LOCATION = 0xC7
+
+    TAG_AND_TIME_REQUEST = 10
+    MAX_TAG_STORAGE = 20
+    BYTES_IN_BUFFER = 4
+
+    RFID_TAG = None
+    RFID_TIME = None
+
+    # Constructor
+    def __init__(self, address=None, i2c_driver=None, buffer_size=None, dedupe=None, metrics=None,
+            retry=None, burst_records=None, bus_lock=None):
+        
+        # Did the user specify an I2C address?
+        if address in self.available_addresses:
+            self.address = address
+        else:
+            self.address = self.available_addresses[0]
+
+        # If no I2C driver is provided, the platform's driver is loaded when
+        # the bus is first used
+        self._i2c = i2c_driver
+
+        # Retrying and reconnecting after bus errors
+        self.retry = RetryPolicy() if retry is None else (retry or None)
+        self.connected = True    # False once the reader has failed to answer a probe
+        self.reconnects = 0
+        self.last_error = None    # Last bus error, including ones that a retry got past
+
+        # The object may be shared between threads. _bus_lock is held only for
+        # each I2C transaction and _lock only while the local buffer, dedupe
+        # filter or legacy tag variables change. Buffers that transactions are
+        # read into, and the times get_req_time() and get_all_prec_times()
+        # return, are kept per thread so decoding needs no lock.
+        self._bus_lock = bus_lock if bus_lock is not None else threading.Lock()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Tags drained from the reader but not yet handed out, and the slots in
+        # it claimed by drains still reading
+        self._ring = TagRingBuffer(buffer_size or self.MAX_TAG_STORAGE)
+        self._reserved = 0
+
+        # Records per drain transaction. One until begin() finds out more.
+        self._burst_request = burst_records
+        self.burst_records = 1
+
+        # Background poller started by start_polling()
+        self._poller = None
+
+        # Drops repeat scans as they are read, if set
+        self.dedupe = dedupe
+
+        # Functions given every tag as it is read, see add_sink()
+        self._sinks = []
+
+        # Records I2C traffic, if set
+        self.metrics = None
+        if metrics is True:
+            self.enable_metrics()
+        elif metrics:
+            self.metrics = metrics
+
+    # ------------------------------------
+    # is_connected()
+    #
+    # Is an actual board connected to our system?
+    def is_connected(self):
+        """!
+        Determine if a Qwiic RFID device is connected to the system.
+
+        @return **void** True if the device is connected, otherwise False.
+        """
+        if self._i2c is None and not self._load_driver():
+            return False
+        with self._bus_lock:
+            return self._i2c.isDeviceConnected(self.address)
+
+    # ------------------------------------
+    # reconnect()
+    #
+    # Checks whether the reader answers again after dropping off the bus,
+    # loading the I2C driver first if that failed earlier. This is done
+    # automatically while retrying failed transactions.
+    def reconnect(self):
+        """!
+        Re-attaches to a reader that stopped answering
+
+        @return **bool** True if the reader answers
+        """
+        try:
+            connected = self.is_connected()
+        except OSError as err:
+            self.last_error = err
+            connected = False
+
+        if connected and not self.connected:
+            self.reconnects += 1
+            if self.metrics is not None:
+                self.metrics.record_reconnect()
+        self.connected = connected
+        return connected
+
+    def _load_driver(self):
+        import qwiic_i2c
+
+        self._i2c = qwiic_i2c.getI2CDriver()
+        if self._i2c is None:
+            print("Unable to load I2C driver for this platform.")
+        return self._i2c is not None
+
+    # Gets the I2C driver, loading it first if need be
+    def _driver(self):
+        if self._i2c is None and not self._load_driver():
+            raise OSError(errno.ENODEV, "Unable to load I2C driver for this platform")
+        return self._i2c
+
+    # ------------------------------------
+    # _transact(func, *args)
+    #
+    # Runs one I2C transaction, retrying failures as the retry policy allows.
+    # The last error is raised once the retries run out. A reader seen to
+    # drop off the bus and come back is counted in reconnects.
+    def _transact(self, func, *args):
+        i2c = self._i2c
+        try:
+            if i2c is None:
+                i2c = self._driver()
+            with self._bus_lock:
+                result = getattr(i2c, func)(*args)
+        except OSError as err:
+            return self._retry(func, args, err)
+
+        if not self.connected:
+            self.reconnect()
+        return result
+
+    # Reads a block from the reader as _transact() does, calling the driver
+    # directly while it is loaded and the reader connected
+    def _read_block(self, num_bytes):
+        i2c = self._i2c
+        if i2c is None or not self.connected:
+            return self._transact("readBlock", self.address, 0, num_bytes)
+        try:
+            with self._bus_lock:
+                return i2c.readBlock(self.address, 0, num_bytes)
+        except OSError as err:
+            return self._retry("readBlock", (self.address, 0, num_bytes), err)
+
+    # ------------------------------------
+    # _retry(func, args, err)
+    #
+    # The rest of _transact() once a transaction has failed with err: counts
+    # the failure and tries again as the retry policy allows. Kept apart so a
+    # transaction that succeeds first time does no retry book keeping.
+    def _retry(self, func, args, err):
+        attempt = 0
+        while True:
+            self.last_error = err
+            if self.metrics is not None:
+                self.metrics.record_error()
+
+            policy = self.retry
+            if policy is None or attempt >= policy.retries:
+                raise err
+
+            time.sleep(policy.delay(attempt))
+            attempt += 1
+            if self.metrics is not None:
+                self.metrics.record_retry()
+            if attempt >= policy.reconnect_after:
+                self.reconnect()
+
+            try:
+                with self._bus_lock:
+                    result = getattr(self._driver(), func)(*args)
+            except OSError as next_err:
+                err = next_err
+                continue
+
+            if not self.connected:
+                self.reconnect()
+            return result
+
+    # -------------------------------------
+    # begin()
+    #
+    # Initialize the system/validate the board. Also settles how many records
+    # each drain transaction asks for: burst_records if given, limited by the
+    # transport's max_burst_records. A transport that doesn't say, like the
+    # qwiic_i2c drivers, always gets one record per transaction, whatever
+    # burst_records asks for: the current firmware only fills the first
+    # record of a longer read, and what follows it isn't guaranteed to be
+    # blank, so it could be decoded as tags that were never scanned.
+    def begin(self):
+        """!
+        Initialize the operation of the Qwiic GPIO
+
+        @return **void** Returns true if the initialization was successful, otherwise False.
+        """
+        connected = self.is_connected()
+        self.burst_records = self._burst_size()
+        return connected
+
+    def _burst_size(self):
+        limit = getattr(self._i2c, "max_burst_records", None)
+        if limit is None:
+            return 1
+        return max(1, min(self._burst_request or limit, limit, self.MAX_TAG_STORAGE))
+
+    # --------------------------------------
+    # get_tag()
+    #
+    # This function gets the RFID tag from the Qwiic RFID Reader. If there is not
+    # a tag then it will return an empty string. When the function is called the tag
+    # is retrieved but saved to a global struct variable set within the _read_tag_time
+    # function. The tag is saved to a local variable, wiped from the global variable, and
+    # local variable is returned. This allows me to get both the tag and the
+    # associated time the tag was scanned at the same time, while keeping the 
+    # function simple.
+    def get_tag(self):
+        """!
+        Gets the current RFID tag
+
+        @return **string** Returns the RFID tag
+        """
+        # Take a tag left over from an earlier drain, or read one, and keep
+        # its time for get_req_time()
+        record = self._take_held()
+        if record is not None:
+            self._store_tag_time(record)
+            tag = record.tag
+        else:
+            tag = self._read_tag_time()
+
+        self.RFID_TAG = None   # Clear the global variable
+        return tag
+
+    # --------------------------------------
+    # get_tag_time()
+    #
+    # This function gets the next RFID tag and how long ago it was scanned in
+    # one call, so the two always belong together. Unlike get_tag() followed
+    # by get_req_time() it is safe when several threads share the reader.
+    def get_tag_time(self):
+        """!
+        Gets the next RFID tag and its scan time together
+
+        @return **tuple** (tag, seconds since the tag was scanned). The tag is
+                    "000000" with a time of 0 if no tag has been scanned.
+        """
+        record = self.read_tag_record()
+        if record is None:
+            return "000000", 0.0
+        return record.tag, record.age_ms / 1000.0
+
+    # --------------------------------------
+    # read_tag_record()
+    #
+    # This function gets the next RFID tag as a TagRecord holding the raw ID,
+    # its scan time and when it was read. A tag left over from an earlier drain
+    # is handed out first; otherwise the reader is asked for one.
+    def read_tag_record(self):
+        """!
+        Gets the next RFID tag and its scan time
+
+        @return **TagRecord** The tag, or None if no tag has been scanned
+        """
+        # Hand out a tag left over from an earlier drain before touching the bus
+        record = self._take_held()
+        if record is not None:
+            return record
+        return self._read_record()
+
+    # Pops the oldest tag left over from an earlier drain, or returns None.
+    # The ring is usually empty, so that is checked before taking the lock.
+    def _take_held(self):
+        ring = self._ring
+        if len(ring) == 0:
+            return None
+        with self._lock:
+            if len(ring) > 0:
+                return ring.pop(self.address)
+        return None
+
+    # --------------------------------------
+    # get_req_time()
+    # 
+    # This funtion gets the time in seconds of the latest RFID tag was scanned from the Qwiic
+    # RFID reader. If there is no tag then the time that is returned will be zero.
+    # The information is received in the call to get_tag() above, made by the
+    # same thread.
+    def get_req_time(self):
+        """!
+        Gets the time when when RFID tag was last scanned
+
+        @return **int** Returns time in seconds
+        """
+        # There is no time without a tag scan.
+        temp_time = self._take_req_time()
+        return temp_time/1000    # Return the local variable in seconds
+
+    # --------------------------------------------
+    # get_prec_req_time()
+    #
+    # This function gets the precise time in seconds of the latest RFID tag was scanned from the Qwiic 
+    # RFID reader. If there is no tag then the time that is returned will be zero.
+    # The information is received in the call to get_tag() above, made by the
+    # same thread.
+    def get_prec_req_time(self):
+        """!
+        Gets the time when the RFID tag was last scanned
+
+        @return **int** Returns time in seconds
+        """
+        # There is no time without a tag scan.
+        temp_time = float(self._take_req_time())/1000
+        return temp_time # Return the local variable in seconds
+
+    # Returns and clears the time stored by this thread's last get_tag(), in
+    # milliseconds
+    def _take_req_time(self):
+        state = self._thread_state()
+        temp_time = state.req_time
+        state.req_time = 0
+        self.RFID_TIME = 0   # Clear the global variable
+        return temp_time
+    
+    # ---------------------------------------------
+    # clear_tags()
+    #
+    # This function clears the buffer from the Qwiic RFID reader by reading them
+    # but not storing them.
+    def clear_tags(self):
+        """!
+        Reads and clears the tags from the buffer
+        """
+        # Forget anything drained earlier, then empty the reader itself
+        with self._lock:
+            self._ring.clear()
+        self._read_all_tags_times(self.MAX_TAG_STORAGE, [])
+
+    # ---------------------------------------------
+    # available()
+    #
+    # This function returns how many tags have been drained from the Qwiic RFID
+    # reader but not yet handed out by get_tag() or get_all_tags(). It does not
+    # touch the I2C bus, so callers can check it before deciding to read.
+    def available(self):
+        """!
+        Gets the number of drained tags waiting to be read
+
+        @return **int** Number of tags held locally
+        """
+        return len(self._ring)
+
+    # ---------------------------------------------
+    # add_sink(sink)
+    #
+    # This function adds a sink: a function called with a list of TagRecords
+    # each time tags are read off the reader, before they are handed out. A
+    # sink sees every tag once however the tags are later collected, which
+    # makes it the place to journal or publish them. Repeat scans dropped by
+    # dedupe are not passed on.
+    def add_sink(self, sink):
+        """!
+        Adds a function that receives every tag read
+
+        @param sink: Called with a list of TagRecords, oldest first
+        """
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """!
+        Removes a function added with add_sink()
+
+        @param sink: The function to remove
+        """
+        self._sinks.remove(sink)
+
+    # ---------------------------------------------
+    # enable_metrics()
+    #
+    # This function starts recording I2C latency, transaction counts, blank
+    # reads, decode time and overflows in an RFIDMetrics, labelled with the
+    # reader's address. disable_metrics() stops it again.
+    def enable_metrics(self):
+        """!
+        Turns on metrics for this reader
+
+        @return **RFIDMetrics** The metrics being recorded
+        """
+        if self.metrics is None:
+            self.metrics = RFIDMetrics({"address": "0x%02X" % self.address})
+        return self.metrics
+
+    def disable_metrics(self):
+        """!
+        Turns off metrics for this reader
+        """
+        self.metrics = None
+
+    # ---------------------------------------------
+    # drain_records()
+    #
+    # This function drains the reader and returns every tag held locally as
+    # a list of TagRecords, leaving the local buffer empty. The tags read go
+    # straight to the caller rather than through the local buffer, so threads
+    # draining at the same time each get their own.
+    def drain_records(self):
+        """!
+        Drains the reader and collects all held tags
+
+        @return **list** TagRecords, oldest first
+        """
+        return self._drain_records()[0]
+
+    # Drains the reader as drain_records() does. Also returns the number of
+    # tags read off the reader, including repeats dropped by dedupe, since
+    # that is what tells whether its buffer was full.
+    def _drain_records(self):
+        fresh = []
+        num_read = self._read_all_tags_times(self.MAX_TAG_STORAGE, fresh)
+
+        ring = self._ring
+        with self._lock:
+            records = [ring.pop(self.address) for _ in range(len(ring))]
+        records.extend(fresh)
+        return records, num_read
+
+    # ---------------------------------------------
+    # drain_columns(use_numpy)
+    #
+    # This function drains the reader and decodes everything read in one
+    # batched pass, returning columns rather than records. It is meant for
+    # analytics that process many tags at once. Tags go straight to the
+    # caller and any sinks: the local buffer and the dedupe filter are not used.
+    def drain_columns(self, use_numpy=None):
+        """!
+        Drains the reader into column arrays
+
+        @param use_numpy: True to require NumPy, False to avoid it, None to use it if installed
+
+        @return **tuple** (ids, ages, received) columns: tag IDs as integers, ages in
+                    milliseconds and time.monotonic_ns() when each tag was read
+        """
+        state = self._thread_state()
+        count = self._drain_raw(self.MAX_TAG_STORAGE, state)
+        if state.error is not None and count == 0:
+            raise state.error
+
+        ids, ages = decode_records(state.raw, count, use_numpy)
+
+        if self._sinks and count > 0:
+            records = [_decode_record(state.raw, i * _RECORD_STRUCT.size, state.received[i],
+                self.address, state.errors[i]) for i in range(count)]
+            for sink in self._sinks:
+                sink(records)
+
+        received = state.received[:count]
+        if use_numpy is not False and _numpy() is not None:
+            received = _numpy().array(received, dtype="int64")
+
+        return ids, ages, received
+
+    # ---------------------------------------------
+    # tag_buffer
+    #
+    # The ring buffer holding drained tags. Its segments() and snapshot()
+    # give direct access to the stored IDs and times.
+    @property
+    def tag_buffer(self):
+        """!
+        Gets the local buffer of drained tags
+
+        @return **TagRingBuffer** The buffer owned by this reader
+        """
+        return self._ring
+
+    # ---------------------------------------------
+    # drain()
+    #
+    # This function reads tags off the Qwiic RFID reader until its buffer is
+    # empty and holds them locally. The tags can then be collected with get_tag()
+    # or get_all_tags() without further I2C traffic.
+    def drain(self):
+        """!
+        Drains the tag buffer on the reader into local storage
+
+        @return **int** Number of tags read from the reader
+        """
+        return self._read_all_tags_times(self.MAX_TAG_STORAGE)
+
+    # ---------------------------------------------
+    # start_polling(interval, callback, queue, max_interval)
+    #
+    # This function starts a background thread that drains the reader and
+    # hands every tag to a callback and/or a queue as a TagRecord. Polling is
+    # fast while tags are arriving and backs off to max_interval when the
+    # reader is idle, or is timed by a PollScheduler if one is given. While
+    # polling, tags should not also be read with get_tag() or get_all_tags().
+    def start_polling(self, interval=0.02, callback=None, queue=None, max_interval=0.5, scheduler=None):
+        """!
+        Starts polling the reader in a background thread
+
+        @param interval: Seconds between polls while tags are arriving
+        @param callback: Called with each TagRecord read. Optional.
+        @param queue: A queue.Queue each TagRecord is put on. Optional.
+        @param max_interval: Longest wait between polls when the reader is idle
+        @param scheduler: A PollScheduler to time the polls. Optional.
+
+        @return **TagPoller** The running poller
+        """
+        if self._poller is not None and self._poller.is_alive():
+            raise RuntimeError("polling is already running")
+
+        self._poller = TagPoller(self, callback, queue, interval, max(interval, max_interval),
+            scheduler=scheduler)
+        self._poller.start()
+        return self._poller
+
+    # ---------------------------------------------
+    # stop_polling(timeout)
+    #
+    # This function stops the thread started by start_polling() and waits for
+    # it to finish.
+    def stop_polling(self, timeout=None):
+        """!
+        Stops the background poller
+
+        @param timeout: Seconds to wait for the thread, or None to wait forever
+
+        @return **bool** True if no poller is left running
+        """
+        if self._poller is None:
+            return True
+
+        stopped = self._poller.stop(timeout)
+        if stopped:
+            self._poller = None
+        return stopped
+
+    # --------------------------------------------
+    # get_all_tags(tagArray[MAX_TAG_STORAGE])
+    #
+    # This function gets all the available tags on the Qwiic RFID reader's buffer.
+    # The buffer on the Qwiic RFID holds 20 tags and their scan time. Not knowing
+    # how many are available until the i2c buffer is read, the parameter is a full
+    # 20 element array. Slots past the last tag are filled with a blank tag.
+    # Passing time_array as well fills in each tag's scan time in the same call,
+    # so get_all_prec_times() is not needed. Tags left from an earlier drain come
+    # first; the rest are decoded off the reader straight into tag_array. The
+    # times are kept per thread, beside the tags they belong to, so threads
+    # sharing the reader each get their own tags' times.
+    def get_all_tags(self, tag_array, time_array=None):
+        """!
+        Gets all the tags in the buffer
+
+        @param tag_array: list of upto 20 RFID tag numbers
+        @param time_array: list of upto 20 times in seconds since each tag was
+                            scanned. Optional.
+
+        @return **int** Number of tags placed in tag_array
+        """
+        ring = self._ring
+        state = self._thread_state()
+        all_times = state.all_times
+        with self._lock:
+            num_tags = min(len(ring), self.MAX_TAG_STORAGE)
+            for i in range(0, num_tags):
+                record = ring.pop()
+                tag_array[i] = record.tag  # Load up passed array with tag
+                all_times[i] = record.age_ms
+
+        num_tags += self._read_tag_strings(self.MAX_TAG_STORAGE - num_tags, tag_array, num_tags, state)
+
+        # Tags read before a bus error are kept; the error is only raised if
+        # there were none
+        if state.error is not None and num_tags == 0:
+            raise state.error
+
+        for i in range(num_tags, self.MAX_TAG_STORAGE):
+            tag_array[i] = "000000"   # Blank tag, same as an empty reader returns
+            all_times[i] = 0
+
+        if time_array is not None:
+            for i in range(0, self.MAX_TAG_STORAGE):
+                time_array[i] = float(all_times[i])/1000
+
+        return num_tags
+
+    # ---------------------------------------------
+    # get_all_prec_times(time_array)
+    # 
+    # This function gets all the available precise scan times associated with the scanned RFID tags.
+    # The buffer on the Qwiic RFID holds 20 tags and their scan time. Not knowing
+    # how many are available until the I2C buffer is read, the parameter is a full 20 element
+    # array.
+    # A note on the time: the time is not the time of the day when the tage was scanned
+    # but actually the time between when the tag was scanned and when it was read from the I2C bus.
+    # The times are those of the tags from the last call to get_all_tags() made
+    # by the same thread.
+    def get_all_prec_times(self, time_array):
+    
+        """!
+        Gets all times in the buffer
+
+        @param time_array: list of upto 20 times the RFID tag was read from the I2C bus
+        """
+        all_times = self._thread_state().all_times
+        for i in range(0, self.MAX_TAG_STORAGE):
+            time_array[i] = float(all_times[i])/1000    # Load up passed array with time in seconds
+            all_times[i] = 0   # Clear the stored time
+
+    # ----------------------------------------------
+    # change_address(new_address)
+    #
+    # This function changes the I2C address of the Qwiic RFID. The address
+    # is written to the memory location in EEPROM that determines its address.
+    def change_address(self, new_address):
+        """!
+        Changes the I2C address of the Qwiic RFID reader
+
+        @param new_address: the new address to set the RFID reader to
+        
+        @return **bool** False if the address is out of range
+        """
+        if new_address < 0x07 or new_address > 0x78:
+            return False
+        
+        start_ns = time.monotonic_ns()
+        self._transact("writeByte", self.address, self.ADDRESS_LOCATION, new_address)
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.record_write(time.monotonic_ns() - start_ns)
         
-            # The tag is copied to the global array
-            self.TAG_ARRAY[i] = _temp_tag_str
-            
-            # Bring in the time but only if there is a tag
-            if self.TAG_ARRAY[i] == "000000":    # Blank tag
-
-                # Time is zero since there is no tag
-                _temp_time = 0
-            
+        self.address = new_address
+
+    # ------------------------------------------------
+    # _read_record()
+    #
+    # This function handles the I2C transaction to get one RFID tag and time
+    # from the Qwiic RFID reader and decodes it into a TagRecord.
+    def _read_record(self, state=None):
+        """!
+        Handles the I2C transaction to get the RFID tag and time
+
+        @param state: The calling thread's _ReaderThreadState, if already at hand
+
+        @return **TagRecord** The tag read, or None if the reader's buffer is empty
+        """
+        read_buf = (state or self._thread_state()).read_buf
+        start_ns = time.monotonic_ns()
+        data = self._read_block(_RECORD_STRUCT.size)
+        end_ns = time.monotonic_ns()
+
+        read_buf[:] = data
+        tag_id, age_ms = _RECORD_STRUCT.unpack_from(read_buf)
+        record = None
+        if tag_id != _BLANK_TAG_ID:
+            record = TagRecord(tag_id, age_ms, (start_ns + end_ns) // 2, self.address,
+                (end_ns - start_ns) // 2 + _AGE_RESOLUTION_NS)
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.record_read(end_ns - start_ns, record is None)
+            metrics.record_decode(time.monotonic_ns() - end_ns)
+
+        if record is not None:
+            # A repeat scan is reported the same as no scan
+            if self.dedupe is not None:
+                with self._lock:
+                    if not self.dedupe.accept(record):
+                        return None
+
+            for sink in self._sinks:
+                sink([record])
+        return record
+
+    # ------------------------------------------------
+    # _store_tag_time(record)
+    #
+    # This function copies a tag record into the global variables, and the
+    # time into this thread's state for get_req_time(). A missing record is
+    # stored as a blank tag with zero time.
+    def _store_tag_time(self, record, state=None):
+        if record is None:
+            self.RFID_TAG = "000000"
+            age_ms = 0
+        else:
+            self.RFID_TAG = record.tag
+            age_ms = record.age_ms
+        self.RFID_TIME = age_ms    # Time in milliseconds
+        (state or self._thread_state()).req_time = age_ms
+
+    # Gets the calling thread's buffers, creating them on first use
+    def _thread_state(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = _ReaderThreadState(self.MAX_TAG_STORAGE)
+        return state
+
+    # ------------------------------------------------
+    # _read_tag_time()
+    # 
+    # This function handles the I2C transaction to get the RFID tag and 
+    # time from the Qwiic RFID reader. The tag and the time are saved to the
+    # global variables. As in _read_tag_strings(), the tag is decoded straight
+    # to its string unless dedupe or a sink needs a TagRecord.
+    def _read_tag_time(self):
+        """!
+        Handles the I2C transaction to get the RFID tag and time
+
+        @return **string** The tag read, "000000" if there was none
+        """
+        state = self._thread_state()
+        if self.dedupe is not None or self._sinks:
+            record = self._read_record(state)
+            self._store_tag_time(record, state)
+            return record.tag if record is not None else "000000"
+
+        read_buf = state.read_buf
+        start_ns = time.monotonic_ns()
+        data = self._read_block(_RECORD_STRUCT.size)
+        end_ns = time.monotonic_ns()
+
+        read_buf[:] = data
+        b0, b1, b2, b3, b4, b5, age_ms = _RECORD_BYTES_STRUCT.unpack_from(read_buf)
+        strings = _BYTE_STRINGS
+        tag = strings[b0] + strings[b1] + strings[b2] + strings[b3] + strings[b4] + strings[b5]
+        blank = tag == "000000"    # Only all zero ID bytes give six characters of zeros
+        if blank:
+            age_ms = 0
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.record_read(end_ns - start_ns, blank)
+            metrics.record_decode(time.monotonic_ns() - end_ns)
+
+        self.RFID_TAG = tag
+        self.RFID_TIME = age_ms    # Time in milliseconds
+        state.req_time = age_ms
+        return tag
+
+    # ----------------------------------------------------
+    # _read_all_tags_times(_num_of_reads, records)
+    #
+    # This function differs from the above by filling the local tag ring buffer as it
+    # drains the entire available rfid buffer on the Qwiic RFID Reader. Similar to the
+    # function above it handles the I2C transaction to get the RFID tags time from the 
+    # Qwiic RFID Reader. Reading stops at the first blank tag, since the reader hands
+    # its buffer out oldest first and has nothing after that. Given a list, the tags
+    # are appended to it as TagRecords instead of going into the ring buffer.
+    def _read_all_tags_times(self, _num_of_reads, records=None):
+        """!
+        Fills the local tag buffer and drains available RFID buffer on the Reader.
+
+        @param _num_of_reads: int maximum number of tags to read
+        @param records: list to collect the tags in instead of the local buffer. Optional.
+
+        @return **int** Number of tags read before the buffer ran dry, including
+                    any dropped as repeats
+        """
+        ring = self._ring
+        dedupe = self.dedupe
+        metrics = self.metrics
+        state = self._thread_state()
+        received = state.received
+        errors = state.errors
+        address = self.address
+        sunk = [] if self._sinks else None
+
+        # Only read as many tags as there is room for in the ring, so none are
+        # overwritten. The room is claimed before reading, so a drain running
+        # in another thread can't count on the same free slots.
+        reserved = 0
+        if records is None:
+            with self._lock:
+                reserved = max(min(_num_of_reads, ring.capacity - len(ring) - self._reserved), 0)
+                self._reserved += reserved
+            _num_of_reads = reserved
+
+        try:
+            num_read = self._drain_raw(_num_of_reads, state)
+
+            # Decode straight into the ring, with no list of the drain's
+            # records in between
+            decode_start_ns = time.monotonic_ns() if metrics is not None else 0
+            view = memoryview(state.raw)[:num_read * _RECORD_INT_STRUCT.size]
+
+            with self._lock:
+                for i, (id_high, id_low, age_ms) in enumerate(_RECORD_INT_STRUCT.iter_unpack(view)):
+                    tag_id = (id_high << 32) | id_low
+                    if dedupe is not None and not dedupe._accept(tag_id, received[i] - age_ms * 1000000, address):
+                        continue
+                    if records is None:
+                        ring.push(tag_id, age_ms, received[i], errors[i])
+                        if sunk is None:
+                            continue
+                    record = TagRecord(tag_id.to_bytes(6, "big"), age_ms, received[i], address, errors[i])
+                    if records is not None:
+                        records.append(record)
+                    if sunk is not None:
+                        sunk.append(record)
+                self._reserved -= reserved
+                reserved = 0
+        finally:
+            if reserved:
+                with self._lock:
+                    self._reserved -= reserved
+
+        if metrics is not None and num_read > 0:
+            metrics.record_decode(time.monotonic_ns() - decode_start_ns, num_read)
+
+        if sunk:
+            for sink in self._sinks:
+                sink(sunk)
+
+        # Tags read before a bus error are kept; the error is only raised if
+        # there were none
+        if state.error is not None and num_read == 0:
+            raise state.error
+
+        return num_read
+
+    # ----------------------------------------------------
+    # _read_tag_strings(_num_of_reads, tag_array, start, state)
+    #
+    # This function drains the reader for get_all_tags(). Each record is
+    # decoded straight into tag_array as the string get_tag() returns, and its
+    # age into the thread's times for get_all_prec_times(), from index start
+    # on. No TagRecord is made unless dedupe or a sink needs one. A bus error
+    # is left in state.error for the caller.
+    def _read_tag_strings(self, _num_of_reads, tag_array, start, state):
+        """!
+        Drains the reader into the legacy tag and time arrays
+
+        @param _num_of_reads: int maximum number of tags to read
+        @param tag_array: list the tag strings are placed in
+        @param start: Index in tag_array of the first tag read
+        @param state: The calling thread's _ReaderThreadState
+
+        @return **int** Number of tags placed in tag_array
+        """
+        dedupe = self.dedupe
+        metrics = self.metrics
+        sunk = [] if self._sinks else None
+        received = state.received
+        errors = state.errors
+        address = self.address
+        strings = _BYTE_STRINGS
+        all_times = state.all_times
+
+        num_read = self._drain_raw(_num_of_reads, state, dedupe is not None or sunk is not None)
+
+        decode_start_ns = time.monotonic_ns() if metrics is not None else 0
+        view = memoryview(state.raw)[:num_read * _RECORD_BYTES_STRUCT.size]
+        i = start
+        for n, (b0, b1, b2, b3, b4, b5, age_ms) in enumerate(_RECORD_BYTES_STRUCT.iter_unpack(view)):
+            if dedupe is not None or sunk is not None:
+                record = TagRecord(bytes((b0, b1, b2, b3, b4, b5)), age_ms, received[n], address, errors[n])
+                if dedupe is not None:
+                    with self._lock:
+                        if not dedupe.accept(record):
+                            continue
+                if sunk is not None:
+                    sunk.append(record)
+
+            tag_array[i] = strings[b0] + strings[b1] + strings[b2] + strings[b3] + strings[b4] + strings[b5]
+            all_times[i] = age_ms
+            i += 1
+
+        if metrics is not None and num_read > 0:
+            metrics.record_decode(time.monotonic_ns() - decode_start_ns, num_read)
+
+        if sunk:
+            for sink in self._sinks:
+                sink(sunk)
+
+        return i - start
+
+    # ----------------------------------------------------
+    # _drain_raw(_num_of_reads, state)
+    #
+    # This function does the I2C side of a drain. Records are read into the
+    # thread's raw buffer back to back, undecoded, until the reader returns a blank one,
+    # and the time of each read is noted. With burst_records above one each
+    # transaction fetches that many records straight into place, and they
+    # share its timing. The age is measured somewhere inside the transaction,
+    # so a scan time is known to within half the transaction plus the age's
+    # millisecond resolution. A bus error that outlasts the retries ends the
+    # drain early and is left in state.error, so the records read before it
+    # can still be used. The driver and bus lock are looked up once per drain
+    # rather than once per transaction, going through _transact() only until
+    # the reader is known to be connected. A caller that makes no TagRecords
+    # can pass timed=False to skip the timing, unless metrics need it.
+    def _drain_raw(self, _num_of_reads, state, timed=True):
+        """!
+        Reads records off the reader without decoding them
+
+        @param _num_of_reads: int maximum number of tags to read
+        @param state: The calling thread's _ReaderThreadState
+        @param timed: False if state.received and state.errors aren't needed
+
+        @return **int** Number of records placed in state.raw
+        """
+        raw = state.raw
+        received = state.received
+        errors = state.errors
+        metrics = self.metrics
+        size = _RECORD_STRUCT.size
+        burst = self.burst_records
+        address = self.address
+        bus_lock = self._bus_lock
+        monotonic_ns = time.monotonic_ns
+        read_block = self._i2c.readBlock if self._i2c is not None and self.connected else None
+        timed = timed or metrics is not None
+        state.error = None
+
+        num_read = 0
+        offset = 0
+        while num_read < _num_of_reads:
+            num_bytes = min(burst, _num_of_reads - num_read) * size
+            start_ns = monotonic_ns() if timed else 0
+            try:
+                if read_block is not None:
+                    try:
+                        with bus_lock:
+                            data = read_block(address, 0, num_bytes)
+                    except OSError as err:
+                        data = self._retry("readBlock", (address, 0, num_bytes), err)
+                else:
+                    data = self._transact("readBlock", address, 0, num_bytes)
+            except OSError as err:
+                state.error = err
+                break
+            end_ns = monotonic_ns() if timed else 0
+            end = offset + num_bytes
+            raw[offset:end] = data
+
+            # A blank tag means the reader's buffer is empty. find() checks the
+            # ID bytes in place without slicing them out.
+            received_ns = (start_ns + end_ns) // 2
+            error_ns = (end_ns - start_ns) // 2 + _AGE_RESOLUTION_NS
+            blank = False
+            while offset < end:
+                if raw.find(_BLANK_TAG_ID, offset, offset + 6) == offset:
+                    blank = True
+                    break
+                if timed:
+                    received[num_read] = received_ns
+                    errors[num_read] = error_ns
+                num_read += 1
+                offset += size
+
+            if metrics is not None:
+                metrics.record_read(end_ns - start_ns, blank)
+            if blank:
+                break
+
+        if metrics is not None:
+            metrics.record_drain(num_read)
+
+        return num_read
+
+# _ReaderThreadState
+#
+# Per thread scratch space for a QwiicRFID, so threads sharing a reader never
+# read into or decode from the same buffers.
+class _ReaderThreadState(object):
+    __slots__ = ("read_buf", "raw", "received", "errors", "error", "req_time", "all_times")
+
+    def __init__(self, max_records):
+        self.read_buf = bytearray(_RECORD_STRUCT.size)    # One record, so reads don't allocate
+
+        # Records of the last drain back to back, with when each was read and
+        # the error bound of its scan time
+        self.raw = bytearray(_RECORD_STRUCT.size * max_records)
+        self.received = array("q", bytes(8 * max_records))
+        self.errors = array("q", bytes(8 * max_records))
+        self.error = None    # Bus error that ended the last drain
+
+        self.req_time = 0    # Time in milliseconds of this thread's last get_tag()
+        self.all_times = array("L", [0]) * max_records    # Times of this thread's last get_all_tags()
+
+# AsyncQwiicRFID
+#
+# An asyncio front end for QwiicRFID. Every I2C transaction runs on an executor
+# thread, one per reader unless an executor is shared, so bus I/O never blocks
+# the event loop.
+class AsyncQwiicRFID(object):
+    """!
+    AsyncQwiicRFID
+
+    @param reader: An existing QwiicRFID. If not provided one is created from
+                    the remaining arguments.
+    @param executor: A concurrent.futures executor to run bus I/O on. If not
+                    provided a single thread executor is created and owned.
+    @param kwargs: Passed to QwiicRFID() when no reader is given
+
+    @return **Object** The async RFID device object.
+    """
+    def __init__(self, reader=None, executor=None, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.reader = reader if reader is not None else QwiicRFID(**kwargs)
+
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1,
+                thread_name_prefix="QwiicRFID-io-0x%02X" % self.reader.address)
+        self._executor = executor
+
+        self._drain_lock = None    # asyncio.Lock taking drains in turn, made on first use
+        self._pending = None    # Drain still running when its caller was cancelled
+        self._backlog = collections.deque()    # Drained tags not yet yielded by tags()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self, func, *args):
+        import asyncio
+
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def begin(self):
+        """!
+        Initialize the operation of the Qwiic RFID
+
+        @return **bool** Returns true if the initialization was successful, otherwise False.
+        """
+        return await self._run(self.reader.begin)
+
+    async def is_connected(self):
+        """!
+        Determine if a Qwiic RFID device is connected to the system.
+
+        @return **bool** True if the device is connected, otherwise False.
+        """
+        return await self._run(self.reader.is_connected)
+
+    async def get_tag(self):
+        """!
+        Gets the current RFID tag
+
+        @return **string** Returns the RFID tag
+        """
+        return await self._run(self.reader.get_tag)
+
+    async def read_tag_record(self):
+        """!
+        Gets the next RFID tag and its scan time
+
+        @return **TagRecord** The tag, or None if no tag has been scanned
+        """
+        return await self._run(self.reader.read_tag_record)
+
+    # ------------------------------------------------
+    # drain_records()
+    #
+    # Drains the reader on the executor and returns what was read. Calls made
+    # at the same time take turns, so each gets its own tags. If the caller
+    # is cancelled the drain still completes, and its tags are returned by
+    # the next call instead of being lost.
+    async def drain_records(self):
+        """!
+        Drains the reader's tag buffer
+
+        @return **list** TagRecords read, oldest first
+        """
+        return (await self._drain_records())[0]
+
+    # Drains as drain_records() does, also returning the number of tags read
+    # off the reader including repeats dropped by dedupe. The drain is only
+    # kept for the next call when this one is cancelled; once its tags or its
+    # error have been handed back, the next call starts a fresh drain.
+    async def _drain_records(self):
+        import asyncio
+
+        # Made here rather than in __init__, which may not be running in the
+        # event loop the lock has to belong to
+        if self._drain_lock is None:
+            self._drain_lock = asyncio.Lock()
+
+        async with self._drain_lock:
+            if self._pending is None:
+                self._pending = self._run(self.reader._drain_records)
+
+            keep = False
+            try:
+                return await asyncio.shield(self._pending)
+            except asyncio.CancelledError:
+                keep = not self._pending.cancelled()
+                raise
+            finally:
+                if not keep:
+                    self._pending = None
+
+    # ------------------------------------------------
+    # tags(min_interval, max_interval)
+    #
+    # An async iterator over every tag read. The reader is only drained once
+    # the tags from the previous drain have been consumed, so a slow consumer
+    # holds tags back on the reader instead of piling them up in memory. The
+    # wait between drains backs off from min_interval to max_interval while
+    # the reader is idle. Tags not yet consumed when the loop is left are kept
+    # for the next call.
+    async def tags(self, min_interval=0.02, max_interval=0.5):
+        """!
+        Streams tags as they are read
+
+        @param min_interval: Seconds between drains while tags are arriving
+        @param max_interval: Longest wait between drains when the reader is idle
+
+        @return **async iterator** Yields a TagRecord for each tag read
+        """
+        import asyncio
+
+        interval = min_interval
+        backlog = self._backlog
+
+        while True:
+            if not backlog:
+                records, num_read = await self._drain_records()
+                backlog.extend(records)
+
+                if num_read >= self.reader.MAX_TAG_STORAGE:
+                    interval = 0
+                elif num_read:
+                    interval = min_interval
+                else:
+                    interval = min(max(interval, min_interval) * 2, max_interval)
+
+            while backlog:
+                yield backlog.popleft()
+
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------
+    # close()
+    #
+    # Shuts down the executor if this object created it.
+    def close(self):
+        """!
+        Releases the I/O thread
+        """
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+# _BusReader
+#
+# Book keeping for one reader on a ReaderBus: its scheduling priority, the
+# optional channel select hook, and what is known about how fast its buffer
+# fills.
+class _BusReader(object):
+    __slots__ = ("reader", "priority", "select", "last_poll_ns", "rate", "full", "error")
+
+    def __init__(self, reader, priority, select):
+        self.reader = reader
+        self.priority = priority
+        self.select = select
+        self.last_poll_ns = time.monotonic_ns()
+        self.rate = 0.0    # Tags per second seen by the last drain
+        self.full = False    # Last drain hit MAX_TAG_STORAGE
+        self.error = None    # Bus error from the last drain, if any
+
+    # Estimated number of tags waiting on the reader
+    def backlog(self, now_ns):
+        return self.rate * (now_ns - self.last_poll_ns) / 1e9
+
+    def update(self, num_read, now_ns):
+        elapsed = (now_ns - self.last_poll_ns) / 1e9
+        if elapsed > 0:
+            self.rate = num_read / elapsed
+        self.last_poll_ns = now_ns
+        self.full = num_read >= self.reader.MAX_TAG_STORAGE
+
+# ReaderBus
+#
+# Coordinates several Qwiic RFID readers that share one I2C driver. Each drain
+# holds the bus lock, and readers are drained most at risk of overflowing
+# first: by priority, then by the estimated number of tags waiting, then by
+# how long since they were last drained. Tags from all readers are merged
+# into one list in scan time order, each tagged with its reader's address.
+class ReaderBus(object):
+    """!
+    ReaderBus
+
+    @param i2c_driver: An existing i2c driver object. If not provided
+                        a driver object is created when the first reader is
+                        added, and shared by every reader on the bus.
+    @param lock: Reentrant lock held around each reader's drain and given to
+                        the readers the bus creates as their bus_lock. If not
+                        provided a threading.RLock is created.
+
+    @return **Object** The reader bus object.
+    """
+    def __init__(self, i2c_driver=None, lock=None):
+
+        # Without a driver the platform's driver is loaded by the first
+        # add_reader() that needs it, see _driver()
+        self._i2c = i2c_driver
+        self.lock = lock if lock is not None else threading.RLock()
+
+        self._entries = []
+        self._poller = None
+
+    @property
+    def readers(self):
+        """!
+        The readers on this bus, in the order they were added
+
+        @return **list** QwiicRFID objects
+        """
+        return [entry.reader for entry in self._entries]
+
+    # ------------------------------------------------
+    # add_reader(reader, address, priority, select)
+    #
+    # Adds a reader to the bus. Either pass an existing QwiicRFID, or an
+    # address to create one on this bus's driver; any address is accepted, so
+    # readers moved with change_address() can be added. A reader behind a
+    # Qwiic mux can be given a select function, called with the bus lock held
+    # before each drain, that switches the mux to its channel.
+    def add_reader(self, reader=None, address=None, priority=0, select=None):
+        """!
+        Adds a reader to the bus
+
+        @param reader: An existing QwiicRFID. Optional.
+        @param address: I2C address of a reader to create on this bus. Optional.
+        @param priority: Readers with a higher priority are drained first
+        @param select: Called with no arguments before each drain of this reader. Optional.
+
+        @return **QwiicRFID** The reader added
+        """
+        if reader is None:
+            reader = QwiicRFID(i2c_driver=self._driver(), bus_lock=self.lock)
+            if address is not None:
+                reader.address = address
+
+        self._entries.append(_BusReader(reader, priority, select))
+        return reader
+
+    # Returns the bus's driver, loading the platform's driver the first time
+    # it is needed. If that fails the readers try again when they use the bus.
+    def _driver(self):
+        if self._i2c is None:
+            import qwiic_i2c
+
+            self._i2c = qwiic_i2c.getI2CDriver()
+            if self._i2c is None:
+                print("Unable to load I2C driver for this platform.")
+        return self._i2c
+
+    # ------------------------------------------------
+    # remove_reader(reader)
+    #
+    # Removes a reader, given as the QwiicRFID or its address.
+    def remove_reader(self, reader):
+        """!
+        Removes a reader from the bus
+
+        @param reader: The QwiicRFID or its I2C address
+
+        @return **bool** True if a reader was removed
+        """
+        for entry in self._entries:
+            if entry.reader is reader or entry.reader.address == reader:
+                self._entries.remove(entry)
+                return True
+        return False
+
+    # ------------------------------------------------
+    # poll_order()
+    #
+    # Returns the readers in the order the next drain will visit them.
+    def poll_order(self):
+        """!
+        Gets the readers ordered by overflow risk
+
+        @return **list** QwiicRFID objects, most at risk first
+        """
+        return [entry.reader for entry in self._ordered_entries(time.monotonic_ns())]
+
+    def _ordered_entries(self, now_ns):
+        return sorted(self._entries, reverse=True,
+            key=lambda entry: (entry.priority, entry.backlog(now_ns), now_ns - entry.last_poll_ns))
+
+    # ------------------------------------------------
+    # errors()
+    #
+    # Returns the readers whose last drain failed with a bus error.
+    def errors(self):
+        """!
+        Gets the bus errors from the last drain of each reader
+
+        @return **dict** Reader address to the error, for readers that failed
+        """
+        return dict((entry.reader.address, entry.error) for entry in self._entries
+            if entry.error is not None)
+
+    # ------------------------------------------------
+    # drain_records(limit)
+    #
+    # Drains the readers, most at risk first, and merges their tags. With a
+    # limit only that many readers are drained; the rest move up the order as
+    # their estimated backlog grows, so every reader is reached in turn. A
+    # reader that fails is skipped and its error kept, see errors().
+    def drain_records(self, limit=None):
+        """!
+        Drains the readers on the bus
+
+        @param limit: Most readers to drain this call, or None for all
+
+        @return **list** TagRecords from every reader drained, in scan time order
+        """
+        return self._drain_records(limit)[0]
+
+    # Drains as drain_records() does, also returning the number of tags read
+    # off each reader by address, including repeats dropped by dedupe
+    def _drain_records(self, limit=None):
+        merged = []
+        counts = {}
+        entries = self._ordered_entries(time.monotonic_ns())
+        if limit is not None:
+            entries = entries[:limit]
+
+        for entry in entries:
+            # A reader that fails is skipped so the others are still drained
+            try:
+                with self.lock:
+                    if entry.select is not None:
+                        entry.select()
+                    records, num_read = entry.reader._drain_records()
+                entry.error = None
+            except OSError as err:
+                entry.error = err
+                records, num_read = [], 0
+
+            entry.update(num_read, time.monotonic_ns())
+            counts[entry.reader.address] = num_read
+            merged.extend(records)
+
+        merged.sort(key=_scan_time)
+        return merged, counts
+
+    @property
+    def saturated(self):
+        """!
+        Whether any reader returned a full buffer on its last drain
+
+        @return **bool** True if a reader may be holding more tags
+        """
+        return any(entry.full for entry in self._entries)
+
+    # ---------------------------------------------
+    # start_polling(interval, callback, queue, max_interval)
+    #
+    # Starts a background thread that drains every reader on the bus and
+    # hands each tag, in scan time order, to a callback and/or a queue. With a
+    # PollScheduler the bus is drained when the busiest reader needs it.
+    def start_polling(self, interval=0.02, callback=None, queue=None, max_interval=0.5, scheduler=None):
+        """!
+        Starts polling the bus in a background thread
+
+        @param interval: Seconds between polls while tags are arriving
+        @param callback: Called with each TagRecord read. Optional.
+        @param queue: A queue.Queue each TagRecord is put on. Optional.
+        @param max_interval: Longest wait between polls when the readers are idle
+        @param scheduler: A PollScheduler to time the polls. Optional.
+
+        @return **TagPoller** The running poller
+        """
+        if self._poller is not None and self._poller.is_alive():
+            raise RuntimeError("polling is already running")
+
+        self._poller = _BusPoller(self, callback, queue, interval, max(interval, max_interval),
+            name="QwiicRFID-bus-poll", scheduler=scheduler)
+        self._poller.start()
+        return self._poller
+
+    # ---------------------------------------------
+    # stop_polling(timeout)
+    #
+    # Stops the thread started by start_polling() and waits for it to finish.
+    def stop_polling(self, timeout=None):
+        """!
+        Stops the background poller
+
+        @param timeout: Seconds to wait for the thread, or None to wait forever
+
+        @return **bool** True if no poller is left running
+        """
+        if self._poller is None:
+            return True
+
+        stopped = self._poller.stop(timeout)
+        if stopped:
+            self._poller = None
+        return stopped
+
+# _BusPoller
+#
+# A TagPoller for a ReaderBus. The bus merges several readers, so a full
+# drain is judged per reader rather than by the total count.
+class _BusPoller(TagPoller):
+
+    def _drain(self):
+        return self.reader._drain_records()
+
+    def _drained_full(self, num_read):
+        return self.reader.saturated
+
+# SimulatedRFIDReader
+#
+# An RFIDTransport that behaves like a Qwiic RFID reader with no hardware
+# attached. Tags are scanned at random at rate tags per second (a Poisson
+# process over the given tag IDs) or injected with scan(). Like the real
+# reader it keeps the last 20 scans, overwriting the oldest when full, and
+# answers each read with the oldest tag and the milliseconds since it was
+# scanned. Every transaction takes latency seconds, and transactions are
+# serialised as they are on a real bus. A fraction error_rate of transactions
+# fail with OSError, as on a noisy cable, and setting present to False takes
+# the reader off the bus. Pass clock to run faster or slower than real time.
+class SimulatedRFIDReader(RFIDTransport):
+    """!
+    SimulatedRFIDReader
+
+    @param address: I2C address the simulated reader answers at
+    @param rate: Average tag scans per second. 0 for scans only via scan().
+    @param tag_ids: Tag IDs scanned at random, as 6 byte bytes objects.
+                    Defaults to 100 made up tags.
+    @param latency: Seconds each I2C transaction takes
+    @param seed: Seed for the random scans, for repeatable runs
+    @param clock: Function returning the time in nanoseconds. Defaults to
+                    time.monotonic_ns.
+    @param error_rate: Fraction of transactions that fail with OSError
+    @param max_burst_records: Records one read can return, as burst capable
+                    firmware would. 1 behaves like the current firmware.
+
+    @return **Object** The simulated reader.
+    """
+    FIFO_DEPTH = 20
+
+    def __init__(self, address=0x13, rate=0.0, tag_ids=None, latency=0.0, seed=None, clock=None,
+            error_rate=0.0, max_burst_records=1):
+        self.address = address
+        self.rate = rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_burst_records = max_burst_records
+        self.present = True
+        self.tag_ids = list(tag_ids) if tag_ids is not None else \
+            [(0x2A0000 + i).to_bytes(6, "big") for i in range(100)]
+
+        self._clock = clock or time.monotonic_ns
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._fifo = collections.deque(maxlen=self.FIFO_DEPTH)    # (tag_id, scan_ns)
+        self._next_scan_ns = None
+
+        self.transactions = 0
+        self.errors = 0
+        self.scanned = 0
+        self.overwritten = 0    # Scans lost to a full buffer
+        self.delivered = 0
+
+        # Random scans start from now
+        self._advance(self._clock())
+
+    def __len__(self):
+        with self._lock:
+            self._advance(self._clock())
+            return len(self._fifo)
+
+    # ------------------------------------------------
+    # scan(tag_id, scan_ns)
+    #
+    # Puts a scan in the buffer, as if a tag had been held to the reader.
+    def scan(self, tag_id, scan_ns=None):
+        """!
+        Simulates a tag scan
+
+        @param tag_id: The 6 byte tag ID
+        @param scan_ns: When the scan happened on the simulator's clock. Defaults to now.
+        """
+        with self._lock:
+            now_ns = self._clock()
+            self._advance(now_ns)
+            self._push(bytes(tag_id), now_ns if scan_ns is None else scan_ns)
+
+    def _push(self, tag_id, scan_ns):
+        if len(self._fifo) == self.FIFO_DEPTH:
+            self.overwritten += 1
+        self._fifo.append((tag_id, scan_ns))
+        self.scanned += 1
+
+    # Adds the random scans due between the last call and now_ns
+    def _advance(self, now_ns):
+        if self.rate <= 0:
+            self._next_scan_ns = None
+            return
+
+        if self._next_scan_ns is None:
+            self._next_scan_ns = now_ns + int(self._random.expovariate(self.rate) * 1e9)
+
+        while self._next_scan_ns <= now_ns:
+            self._push(self._random.choice(self.tag_ids), self._next_scan_ns)
+            self._next_scan_ns += int(self._random.expovariate(self.rate) * 1e9)
+
+    def _transaction(self, address):
+        if address != self.address or not self.present:
+            raise OSError(errno.EREMOTEIO, "No device at address 0x%02X" % address)
+
+        self.transactions += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise OSError(errno.EIO, "Simulated bus error")
+
+        now_ns = self._clock()
+        self._advance(now_ns)
+        return now_ns
+
+    # Returns the bytes the reader sends for its oldest record
+    def _next_record(self, now_ns):
+        if not self._fifo:
+            return bytes(_RECORD_STRUCT.size)
+
+        tag_id, scan_ns = self._fifo.popleft()
+        self.delivered += 1
+        age_ms = min(max(now_ns - scan_ns, 0) // 1000000, 0xFFFFFFFF)
+        return _RECORD_STRUCT.pack(tag_id, age_ms)
+
+    def readBlock(self, address, commandCode, nBytes):
+        with self._lock:
+            now_ns = self._transaction(address)
+            count = min(max(nBytes // _RECORD_STRUCT.size, 1), self.max_burst_records)
+            data = b"".join([self._next_record(now_ns) for _ in range(count)])
+
+        # Reads past the records sent see nothing more
+        return list(data[:nBytes]) + [0] * (nBytes - len(data))
+
+    def writeByte(self, address, commandCode, value):
+        with self._lock:
+            self._transaction(address)
+            if commandCode == QwiicRFID.ADDRESS_LOCATION:
+                self.address = value
+
+    def isDeviceConnected(self, devAddress):
+        return devAddress == self.address and self.present
+
+    # ------------------------------------------------
+    # stats()
+    #
+    # Returns the simulator's counters as a dict.
+    def stats(self):
+        """!
+        Gets the simulated reader's counters
+
+        @return **dict** transactions, errors, scanned, overwritten, delivered and queued
+        """
+        with self._lock:
+            self._advance(self._clock())
+            return {"transactions": self.transactions, "errors": self.errors, "scanned": self.scanned,
+                "overwritten": self.overwritten, "delivered": self.delivered,
+                "queued": len(self._fifo)}
+
+# SimulatedI2CBus
+#
+# An RFIDTransport with several simulated readers on it. Transactions go to
+# the reader at the requested address, one at a time, and an address with no
+# reader fails as a real bus does.
+class SimulatedI2CBus(RFIDTransport):
+    """!
+    SimulatedI2CBus
+
+    @param readers: SimulatedRFIDReader objects on the bus
+
+    @return **Object** The simulated bus.
+    """
+    def __init__(self, readers=()):
+        self.readers = list(readers)
+        self._lock = threading.Lock()
+
+    @property
+    def max_burst_records(self):
+        """!
+        Records one read can return from every reader on the bus
+
+        @return **int** The smallest of the readers' max_burst_records
+        """
+        return min([reader.max_burst_records for reader in self.readers] or [1])
+
+    def _device(self, address):
+        for reader in self.readers:
+            if reader.address == address and reader.present:
+                return reader
+        raise OSError(errno.EREMOTEIO, "No device at address 0x%02X" % address)
+
+    def readBlock(self, address, commandCode, nBytes):
+        with self._lock:
+            return self._device(address).readBlock(address, commandCode, nBytes)
+
+    def writeByte(self, address, commandCode, value):
+        with self._lock:
+            return self._device(address).writeByte(address, commandCode, value)
+
+    def isDeviceConnected(self, devAddress):
+        return any(reader.isDeviceConnected(devAddress) for reader in self.readers)
+
+    # ------------------------------------------------
+    # stats()
+    #
+    # Returns each reader's counters, keyed by address.
+    def stats(self):
+        """!
+        Gets the counters of every simulated reader
+
+        @return **dict** Reader address to that reader's stats()
+        """
+        return dict((reader.address, reader.stats()) for reader in self.readers)
+
+# Capture files hold a header, which also notes the recorded driver's
+# max_burst_records (0 if it gave none), then one entry per transaction in the order
+# they happened: when it started, in nanoseconds since the capture began,
+# how long it took, the operation, address, register, whether it failed and
+# the length of the data that follows. The data is the bytes read, the byte
+# written, or whether the device answered; for a failed transaction it is
+# the errno.
+_CAPTURE_MAGIC = b"QRFC"
+_CAPTURE_VERSION = 1
+_CAPTURE_HEADER = struct.Struct("<4sHHqH")    # Magic, version, entry size, wall clock start in ns, burst
+_CAPTURE_ENTRY = struct.Struct("<qIBBBBH")
+_CAPTURE_ERRNO = struct.Struct("<H")
+_CAPTURE_READ = 1
+_CAPTURE_WRITE = 2
+_CAPTURE_CONNECTED = 3
+
+# RecordingTransport
+#
+# Wraps an I2C driver and writes every transaction QwiicRFID makes through it,
+# with its timing and the exact bytes the reader sent, to a capture file.
+# ReplayTransport plays a capture back, so problems seen on real hardware can
+# be reproduced and decode or polling changes measured against real traffic.
+class RecordingTransport(RFIDTransport):
+    """!
+    RecordingTransport
+
+    @param driver: The I2C driver or other RFIDTransport to record
+    @param path: Capture file to write. An existing file is replaced.
+
+    @return **Object** The recording transport, to pass as i2c_driver.
+    """
+    def __init__(self, driver, path):
+        self.driver = driver
+        self.path = path
+        self.entries = 0
+
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._file.write(_CAPTURE_HEADER.pack(_CAPTURE_MAGIC, _CAPTURE_VERSION, _CAPTURE_ENTRY.size,
+            time.time_ns(), self.max_burst_records or 0))
+        self._start_ns = time.monotonic_ns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def max_burst_records(self):
+        return getattr(self.driver, "max_burst_records", None)
+
+    def readBlock(self, address, commandCode, nBytes):
+        return self._record(_CAPTURE_READ, address, commandCode, self.driver.readBlock,
+            (address, commandCode, nBytes), bytes)
+
+    def writeByte(self, address, commandCode, value):
+        return self._record(_CAPTURE_WRITE, address, commandCode, self.driver.writeByte,
+            (address, commandCode, value), lambda result: bytes([value]))
+
+    def isDeviceConnected(self, devAddress):
+        return self._record(_CAPTURE_CONNECTED, devAddress, 0, self.driver.isDeviceConnected,
+            (devAddress,), lambda result: bytes([bool(result)]))
+
+    # Runs one transaction on the driver and writes its entry
+    def _record(self, operation, address, commandCode, func, args, encode):
+        start_ns = time.monotonic_ns()
+        try:
+            result = func(*args)
+        except OSError as err:
+            self._write(operation, address, commandCode, start_ns, 1, _CAPTURE_ERRNO.pack(err.errno or 0))
+            raise
+        self._write(operation, address, commandCode, start_ns, 0, encode(result))
+        return result
+
+    def _write(self, operation, address, commandCode, start_ns, failed, data):
+        duration_ns = min(time.monotonic_ns() - start_ns, 0xFFFFFFFF)
+        with self._lock:
+            self._file.write(_CAPTURE_ENTRY.pack(start_ns - self._start_ns, duration_ns, operation, address,
+                commandCode, failed, len(data)) + data)
+            self.entries += 1
+
+    def close(self):
+        """!
+        Finishes the capture file
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+# ReplayTransport
+#
+# Answers transactions from a capture written by RecordingTransport, in the
+# order they were recorded. With realtime each answer waits until the time it
+# was given in the capture, relative to the first transaction, and takes as
+# long as it did; otherwise the capture plays as fast as it is read. Once the
+# capture runs out the reader appears empty.
+class ReplayTransport(RFIDTransport):
+    """!
+    ReplayTransport
+
+    @param path: Capture file written by RecordingTransport
+    @param realtime: True to keep the capture's timing, False to replay as fast as possible
+    @param strict: True to raise ValueError when a transaction doesn't match
+                    the capture, False to skip ahead to the next one that does
+
+    @return **Object** The replay transport, to pass as i2c_driver.
+    """
+    def __init__(self, path, realtime=False, strict=True):
+        self.realtime = realtime
+        self.strict = strict
+
+        with open(path, "rb") as capture:
+            data = capture.read()
+        if len(data) < _CAPTURE_HEADER.size:
+            raise ValueError("%s is not a qwiic_rfid capture" % path)
+        magic, version, entry_size, self.start_wall_ns, burst = _CAPTURE_HEADER.unpack_from(data)
+        if magic != _CAPTURE_MAGIC or version != _CAPTURE_VERSION or entry_size != _CAPTURE_ENTRY.size:
+            raise ValueError("%s is not a qwiic_rfid capture" % path)
+
+        # Reads are the same size as when recorded only if bursts are
+        self.max_burst_records = burst or None
+
+        # Entries are indexed up front so replay does no parsing. A torn last
+        # entry from an interrupted capture is dropped.
+        self._data = data
+        self._entries = []
+        offset = _CAPTURE_HEADER.size
+        while offset + _CAPTURE_ENTRY.size <= len(data):
+            entry = _CAPTURE_ENTRY.unpack_from(data, offset)
+            body = offset + _CAPTURE_ENTRY.size
+            if body + entry[6] > len(data):
+                break
+            self._entries.append(entry + (body,))
+            offset = body + entry[6]
+
+        self.position = 0
+        self._lock = threading.Lock()
+        self._base_ns = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def finished(self):
+        """!
+        Whether every recorded transaction has been replayed
+
+        @return **bool** True once the capture has run out
+        """
+        return self.position >= len(self._entries)
+
+    # ------------------------------------------------
+    # rewind()
+    #
+    # Starts the capture again from the beginning.
+    def rewind(self):
+        """!
+        Restarts the replay from the first transaction
+        """
+        with self._lock:
+            self.position = 0
+            self._base_ns = None
+
+    def readBlock(self, address, commandCode, nBytes):
+        data = self._replay(_CAPTURE_READ, address, commandCode)
+        if data is None:
+            return [0] * nBytes    # Capture finished: an empty reader
+        if self.strict and len(data) != nBytes:
+            raise ValueError("capture read %d bytes from 0x%02X, not %d" % (len(data), address, nBytes))
+        return list(data[:nBytes]) + [0] * (nBytes - len(data))
+
+    def writeByte(self, address, commandCode, value):
+        self._replay(_CAPTURE_WRITE, address, commandCode)
+
+    def isDeviceConnected(self, devAddress):
+        data = self._replay(_CAPTURE_CONNECTED, devAddress, 0)
+        return data is None or data[:1] == b"\x01"
+
+    # Finds the next entry for this transaction, keeps its timing if asked,
+    # and returns its data, raises its error, or returns None past the end
+    def _replay(self, operation, address, commandCode):
+        with self._lock:
+            while self.position < len(self._entries):
+                entry = self._entries[self.position]
+                self.position += 1
+                if entry[2:5] == (operation, address, commandCode):
+                    break
+                if self.strict:
+                    raise ValueError("transaction %d of the capture is operation %d at 0x%02X, not %d at 0x%02X"
+                        % (self.position - 1, entry[2], entry[3], operation, address))
             else:
-                _temp_time = int(_temp_tag_list[6]) * 16 ** (6) + int(_temp_tag_list[7]) * 16 ** (4) + int(_temp_tag_list[8]) * 16 ** (2) + int(_temp_tag_list[9])
-            
-            # Time is copied to the global array
-            self.TIME_ARRAY[i] = _temp_time   # Convert to seconds            
+                return None
+
+            start_ns, duration_ns, _, _, _, failed, length, body = entry
+            if self.realtime:
+                now_ns = time.monotonic_ns()
+                if self._base_ns is None:
+                    self._base_ns = now_ns - start_ns
+                delay_ns = self._base_ns + start_ns + duration_ns - now_ns
+                if delay_ns > 0:
+                    time.sleep(delay_ns / 1e9)
+
+        data = self._data[body:body + length]
+        if failed:
+            err = _CAPTURE_ERRNO.unpack(data)[0]
+            raise OSError(err, "Replayed bus error: %s" % os.strerror(err))
+        return data
+
+# TagAllowList
+#
+# A set of permitted tags for access control, checked in constant time. Tags
+# are loaded from a CSV file, taking the first column of each row, or from a
+# binary file of back to back 6 byte IDs. In CSV a tag is either the string
+# get_tag() returns, or the raw ID in hex with a 0x prefix. Rows whose first
+# column is neither, such as headers and comments, are skipped, but a 0x
+# value that isn't valid hex fails the load rather than quietly dropping a tag.
+#
+# get_tag() strings run the ID bytes' decimal values together, so different
+# IDs can give the same string. A TagRecord is therefore only matched by its
+# ID, never by its string, unless match_strings is set for lists that still
+# hold tag strings. Prefer 0x IDs or binary files.
+#
+# start_watching() reloads the file in a background thread whenever its
+# modification time changes. The new set is built off to the side and swapped
+# in with one assignment, so is_allowed() never waits on a reload and always
+# sees a complete list. A file that can't be loaded when the list is created
+# raises, rather than leaving an empty list that refuses every tag; one that
+# fails to reload leaves the old list in place. Write updates to a temporary
+# file and rename it over the old one.
+class TagAllowList(object):
+    """!
+    TagAllowList
+
+    @param path: CSV or binary (.bin) file of permitted tags. Optional.
+    @param tags: Iterable of permitted tags, in any form is_allowed() takes. Optional.
+    @param match_strings: Also allow a TagRecord whose tag string is on the
+                    list. Off by default, since tag strings are ambiguous.
+
+    @return **Object** The allow list object.
+    """
+    def __init__(self, path=None, tags=None, match_strings=False):
+        self.path = path
+        self.match_strings = match_strings
+        self.loaded_mtime = None
+        self.last_error = None    # Exception from the last failed reload
+
+        self._tags = frozenset(_allow_key(tag) for tag in tags) if tags is not None else frozenset()
+        self._watcher = None
+        self._stop_event = threading.Event()
+
+        if path is not None:
+            mtime = os.stat(path).st_mtime_ns
+            self._tags = self.load(path)
+            self.loaded_mtime = mtime
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __contains__(self, tag):
+        return self.is_allowed(tag)
+
+    # ------------------------------------------------
+    # is_allowed(tag)
+    #
+    # Checks a tag against the list. The tag may be a TagRecord, the string
+    # get_tag() returns, the 6 ID bytes, or the ID as an integer. IDs only
+    # match IDs and tag strings only match tag strings; see match_strings. A
+    # string that is not a valid tag is never allowed.
+    def is_allowed(self, tag):
+        """!
+        Checks whether a tag is permitted
+
+        @param tag: TagRecord, tag string, ID bytes or ID integer
+
+        @return **bool** True if the tag is on the list
+        """
+        tags = self._tags
+        if isinstance(tag, TagRecord):
+            return tag.tag_int in tags or (self.match_strings and tag.tag in tags)
+        try:
+            return _allow_key(tag) in tags
+        except ValueError:
+            return False
+
+    # ------------------------------------------------
+    # reload()
+    #
+    # Loads the file again and swaps the new list in. On failure the old list
+    # is kept and the error left in last_error.
+    def reload(self):
+        """!
+        Reloads the list from its file
+
+        @return **bool** True if the list was loaded, False if loading failed
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            tags = self.load(self.path)
+        except (OSError, ValueError) as err:
+            self.last_error = err
+            return False
+
+        self._tags = tags
+        self.loaded_mtime = mtime
+        self.last_error = None
+        return True
+
+    # ------------------------------------------------
+    # load(path)
+    #
+    # Reads a tag file into a frozenset without changing this list.
+    @staticmethod
+    def load(path):
+        """!
+        Reads a file of tags
+
+        @param path: CSV file, or binary file of 6 byte IDs if it ends in .bin
+
+        @return **frozenset** The tags, as strings and ID integers. Raises
+                    ValueError for a 0x value that isn't valid hex.
+        """
+        import csv
+
+        if path.endswith(".bin"):
+            with open(path, "rb") as tag_file:
+                data = tag_file.read()
+            if len(data) % 6:
+                raise ValueError("%s is not a whole number of 6 byte tag IDs" % path)
+            return frozenset(int.from_bytes(data[i:i + 6], "big") for i in range(0, len(data), 6))
+
+        tags = set()
+        with open(path, newline="") as tag_file:
+            for row in csv.reader(tag_file):
+                value = row[0].strip() if row else ""
+                if value.isdigit() or (value[:2].lower() == "0x" and len(value) > 2):
+                    tags.add(_allow_key(value))
+        return frozenset(tags)
+
+    # ------------------------------------------------
+    # start_watching(interval)
+    #
+    # Starts a thread that reloads the file when it changes.
+    def start_watching(self, interval=1.0):
+        """!
+        Reloads the list automatically when its file changes
+
+        @param interval: Seconds between checks of the file's modification time
+        """
+        if self.path is None:
+            raise ValueError("no file to watch")
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+            name="QwiicRFID-allow-list")
+        self._watcher.daemon = True
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while not self._stop_event.wait(interval):
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as err:
+                self.last_error = err
+                continue
+            if mtime != self.loaded_mtime:
+                self.reload()
+
+    def stop_watching(self):
+        """!
+        Stops reloading the list automatically
+        """
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+# Turns a tag in any accepted form into the value stored in an allow list:
+# tag strings are kept as they are, everything else becomes the ID integer.
+def _allow_key(tag):
+    if isinstance(tag, (bytes, bytearray)):
+        return int.from_bytes(tag, "big")
+    if isinstance(tag, str) and tag[:2].lower() == "0x":
+        return int(tag, 16)
+    return tag
+
+# ScanAnalytics
+#
+# Live statistics over the stream of scans, fed as a QwiicRFID sink so no log
+# needs post-processing. Memory is fixed by the settings, not by how many
+# scans or tags go by:
+#
+#   - scans per reader over a sliding window, kept as a ring of bucket counts
+#   - a histogram per reader of scans per minute, one sample per bucket
+#   - the top_k most scanned tags, by the space-saving algorithm, with the
+#     most each count may be over
+#   - dwell time, from a tag's first scan to its last before a gap of more
+#     than dwell_gap, with at most max_visits visits open at once
+#
+# Time is taken from the scans themselves, so replayed or journaled scans
+# give the same figures as live ones. snapshot() never makes the writer wait:
+# each batch of scans bumps a version number before and after it is added,
+# and a snapshot copies the figures without a lock, starting over if the
+# version shows a batch was added while it was copying. Sinks are called
+# from whichever thread drained the reader, so writers do take a lock among
+# themselves, one that snapshot() never touches.
+class ScanAnalytics(object):
+    """!
+    ScanAnalytics
+
+    @param window: Seconds covered by the sliding window counts
+    @param buckets: Buckets the window is divided into. Each is one rate sample.
+    @param top_k: Number of most scanned tags to track
+    @param dwell_gap: Seconds without a scan after which a tag's visit has ended
+    @param max_visits: Most visits tracked at once. The visit scanned longest
+                    ago is ended early to make room.
+
+    @return **Object** The analytics object.
+    """
+    RATE_EDGES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)    # Scans per minute
+    DWELL_EDGES = (1, 2, 5, 10, 30, 60, 300, 900, 3600)    # Seconds
+
+    def __init__(self, window=60.0, buckets=60, top_k=32, dwell_gap=5.0, max_visits=1024):
+        if buckets < 1 or top_k < 1 or max_visits < 1:
+            raise ValueError("buckets, top_k and max_visits must be at least 1")
+
+        self.window = window
+        self.buckets = buckets
+        self.top_k = top_k
+        self.dwell_gap_ns = int(dwell_gap * 1e9)
+        self.max_visits = max_visits
+        self._bucket_ns = max(int(window * 1e9) // buckets, 1)
+
+        self._version = 0
+        self._write_lock = threading.Lock()
+        self.reset()
+
+    # ------------------------------------------------
+    # reset()
+    #
+    # Forgets every scan seen so far.
+    def reset(self):
+        """!
+        Clears all the statistics
+        """
+        with self._write_lock:
+            self._version += 1
+            self.scans = 0
+            self.late = 0    # Scans too old for the window when they arrived
+            self.now_ns = None    # Newest scan time seen
+
+            self._readers = {}    # address -> _ReaderWindow
+
+            self._top_counts = {}    # tag -> count, at most top_k tags
+            self._top_errors = {}    # tag -> most the count may be over
+
+            self._visits = collections.OrderedDict()    # tag -> [first scan_ns, last scan_ns], oldest last scan first
+            self.visits = 0    # Visits ended
+            self.dwell_total_ns = 0
+            self.dwell_max_ns = 0
+            self._dwell_histogram = [0] * (len(self.DWELL_EDGES) + 1)
+            self._version += 1
+
+    # ------------------------------------------------
+    # write_records(records)
+    #
+    # Adds a batch of scans. Usable directly as a QwiicRFID sink.
+    def write_records(self, records):
+        """!
+        Adds scans to the statistics
+
+        @param records: An iterable of TagRecords
+        """
+        with self._write_lock:
+            self._version += 1    # Odd while the figures are changing
+            try:
+                for record in records:
+                    self._add(record.tag_int, record.scan_ns, record.address)
+            finally:
+                self._version += 1
+
+    def _add(self, tag, scan_ns, address):
+        self.scans += 1
+        if self.now_ns is None or scan_ns > self.now_ns:
+            self.now_ns = scan_ns
+
+        # Sliding window and rate histogram
+        window = self._readers.get(address)
+        if window is None:
+            window = self._readers[address] = _ReaderWindow(self.buckets, len(self.RATE_EDGES) + 1)
+        if not window.add(scan_ns // self._bucket_ns, self._rate_bin):
+            self.late += 1
+
+        # Space-saving top K: a new tag takes over the smallest counter
+        counts = self._top_counts
+        if tag in counts:
+            counts[tag] += 1
+        elif len(counts) < self.top_k:
+            counts[tag] = 1
+            self._top_errors[tag] = 0
+        else:
+            smallest = min(counts, key=counts.get)
+            floor = counts.pop(smallest)
+            del self._top_errors[smallest]
+            counts[tag] = floor + 1
+            self._top_errors[tag] = floor
+
+        # Dwell: visits whose last scan is more than dwell_gap old are ended
+        visits = self._visits
+        visit = visits.get(tag)
+        if visit is not None and scan_ns - visit[1] <= self.dwell_gap_ns:
+            visit[1] = max(visit[1], scan_ns)
+            visits.move_to_end(tag)
+        else:
+            if visit is not None:
+                del visits[tag]
+                self._end_visit(visit)
+            visits[tag] = [scan_ns, scan_ns]
+        self._end_visits(self.now_ns - self.dwell_gap_ns)
+
+    # Ends the visits last scanned before cutoff_ns, and the oldest ones beyond max_visits
+    def _end_visits(self, cutoff_ns):
+        visits = self._visits
+        while visits:
+            tag, visit = next(iter(visits.items()))
+            if visit[1] >= cutoff_ns and len(visits) <= self.max_visits:
+                break
+            del visits[tag]
+            self._end_visit(visit)
+
+    def _end_visit(self, visit):
+        dwell_ns = visit[1] - visit[0]
+        self.visits += 1
+        self.dwell_total_ns += dwell_ns
+        self.dwell_max_ns = max(self.dwell_max_ns, dwell_ns)
+        self._dwell_histogram[bisect.bisect_right(self.DWELL_EDGES, dwell_ns / 1e9)] += 1
+
+    # Histogram bin for a bucket that held count scans
+    def _rate_bin(self, count):
+        return bisect.bisect_right(self.RATE_EDGES, count * 60e9 / self._bucket_ns)
+
+    # ------------------------------------------------
+    # snapshot()
+    #
+    # Returns a consistent copy of the statistics as plain dicts and lists.
+    def snapshot(self):
+        """!
+        Gets the current statistics
+
+        @return **dict** Total scans; scans and scans per minute per reader over
+                    the window with each reader's rate histogram; the top tags
+                    with their counts and error bounds; and dwell time figures
+        """
+        while True:
+            version = self._version
+            if version % 2 == 0:
+                try:
+                    copied = self._copy()
+                except RuntimeError:
+                    copied = None    # A dict changed size while being read
+                if copied is not None and self._version == version:
+                    return self._summarise(*copied)
+            time.sleep(0)    # Let the writer finish its batch
+
+    # Copies everything snapshot() reports, with C level copies that the
+    # writer can't interleave with
+    def _copy(self):
+        readers = dict((address, window.copy()) for address, window in self._readers.copy().items())
+        return (self.scans, self.late, self.now_ns, readers, self._top_counts.copy(), self._top_errors.copy(),
+            len(self._visits), self.visits, self.dwell_total_ns, self.dwell_max_ns, self._dwell_histogram[:])
+
+    def _summarise(self, scans, late, now_ns, readers, top_counts, top_errors, open_visits, visits,
+            dwell_total_ns, dwell_max_ns, dwell_histogram):
+        per_reader = {}
+        now_bucket = now_ns // self._bucket_ns if now_ns is not None else 0
+        for address, (bucket, counts, histogram) in readers.items():
+            in_window = _ReaderWindow.total(bucket, counts, now_bucket)
+            per_reader[address] = {
+                "scans": in_window,
+                "scans_per_minute": in_window * 60.0 / self.window,
+                "rate_histogram": list(zip((0,) + self.RATE_EDGES, histogram)),
+            }
+
+        top = sorted(top_counts.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "scans": scans,
+            "late": late,
+            "window": self.window,
+            "readers": per_reader,
+            "top_tags": [{"tag": tag, "count": count, "error": top_errors.get(tag, 0)} for tag, count in top],
+            "dwell": {
+                "visits": visits,
+                "open": open_visits,
+                "mean": dwell_total_ns / visits / 1e9 if visits else 0.0,
+                "max": dwell_max_ns / 1e9,
+                "histogram": list(zip((0,) + self.DWELL_EDGES, dwell_histogram)),
+            },
+        }
+
+# One reader's sliding window: scan counts for the last few buckets in a
+# ring, and the histogram of scans per minute over finished buckets
+class _ReaderWindow(object):
+    __slots__ = ("bucket", "counts", "histogram")
+
+    def __init__(self, buckets, bins):
+        self.bucket = None    # Newest bucket number seen
+        self.counts = array("L", [0]) * buckets
+        self.histogram = [0] * bins
+
+    # Counts a scan in bucket number `bucket`. Returns False if it is older
+    # than the window.
+    def add(self, bucket, rate_bin):
+        counts = self.counts
+        size = len(counts)
+        if self.bucket is None:
+            self.bucket = bucket
+        elif bucket > self.bucket:
+            # The newest bucket is finished and becomes a rate sample, as does
+            # each empty one passed over, all at once in the lowest bin
+            self.histogram[rate_bin(counts[self.bucket % size])] += 1
+            self.histogram[0] += bucket - self.bucket - 1
+
+            # The slots the new buckets take hold counts from before the window
+            for newer in range(self.bucket + 1, min(bucket, self.bucket + size) + 1):
+                counts[newer % size] = 0
+            self.bucket = bucket
+        elif bucket <= self.bucket - size:
+            return False
+
+        counts[bucket % size] += 1
+        return True
+
+    def copy(self):
+        return (self.bucket, self.counts[:], self.histogram[:])
+
+    # Scans in the window ending at bucket number now_bucket
+    @staticmethod
+    def total(bucket, counts, now_bucket):
+        if bucket is None:
+            return 0
+        size = len(counts)
+        return sum(counts[newest % size] for newest in range(max(bucket - size + 1, now_bucket - size + 1),
+            bucket + 1))
+
+# python -m qwiic_rfid runs the qwiic-rfid command line tool, loaded only then
+if __name__ == "__main__":
+    import sys
+
+    import qwiic_rfid_cli
+    sys.exit(qwiic_rfid_cli.main())
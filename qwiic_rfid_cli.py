@@ -0,0 +1,347 @@
+#-----------------------------------------------------------------------------
+# qwiic_rfid_cli.py
+#
+# Command line tool for the SparkFun qwiic rfid reader.
+#   https://www.sparkfun.com/products/15191
+#
+#------------------------------------------------------------------------
+#
+# This python library supports the SparkFun Electroncis qwiic 
+# qwiic sensor/board ecosystem 
+#
+# More information on qwiic is at https:// www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SparkFun. Buy a board!
+#==================================================================================
+# Copyright (c) 2020 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+
+"""!
+qwiic_rfid_cli
+============
+The qwiic-rfid command: scan, drain, probe, set-address, bench and serve.
+"""
+#-----------------------------------------------------------------------------
+
+import argparse
+import errno
+import os
+import sys
+import time
+
+from qwiic_rfid import (_AVAILABLE_I2C_ADDRESS, QwiicRFID, ReaderBus, RecordingTransport, ReplayTransport,
+    SimulatedI2CBus, SimulatedRFIDReader)
+
+# concurrent.futures and the tag service, with the socket modules it needs,
+# are imported by the commands that use them, so the others don't pay for
+# them. The port the tag service listens on by default, as in qwiic_rfid_server.
+_DEFAULT_PORT = 4913
+
+# ------------------------------------------------
+# Command line
+#
+# qwiic-rfid <command>, or python -m qwiic_rfid <command>. Only the
+# command run is set up.
+def main(argv=None):
+    """!
+    Runs the qwiic_rfid command line tool
+
+    @param argv: Arguments, not including the program name. Defaults to sys.argv.
+
+    @return **int** Exit status
+    """
+
+    parser = argparse.ArgumentParser(prog="qwiic-rfid", description="SparkFun Qwiic RFID reader tool")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    scan = commands.add_parser("scan", help="print tags as they are scanned")
+    _add_reader_arguments(scan)
+    _add_format_argument(scan)
+    scan.add_argument("--interval", type=float, default=0.001, help="seconds to wait when no tags are waiting")
+    scan.add_argument("--count", type=int, help="stop after this many tags")
+    scan.add_argument("--duration", type=float, help="stop after this many seconds")
+    scan.set_defaults(run=_scan_command)
+
+    drain = commands.add_parser("drain", help="print the tags waiting on the readers and exit")
+    _add_reader_arguments(drain)
+    _add_format_argument(drain)
+    drain.set_defaults(run=_drain_command)
+
+    probe = commands.add_parser("probe", help="list the readers answering on the bus")
+    _add_reader_arguments(probe, multiple_buses=True)
+    probe.add_argument("--all", action="store_true",
+        help="try every I2C address, to find readers moved to another address")
+    probe.set_defaults(run=_probe_command)
+
+    set_address = commands.add_parser("set-address", help="change a reader's I2C address")
+    _add_reader_arguments(set_address)
+    set_address.add_argument("new_address", type=_int_argument, help="address to move the reader to")
+    set_address.set_defaults(run=_set_address_command)
+
+    bench = commands.add_parser("bench", help="measure tag throughput and latency")
+    _add_reader_arguments(bench)
+    bench.add_argument("--duration", type=float, default=5.0, help="seconds to run (default 5)")
+    bench.add_argument("--interval", type=float, default=0.001, help="seconds to wait when no tags are waiting")
+    bench.set_defaults(run=_bench_command)
+
+    serve = commands.add_parser("serve", help="stream tags to network clients")
+    _add_reader_arguments(serve)
+    serve.add_argument("--listen", default="127.0.0.1:%d" % _DEFAULT_PORT,
+        help="host:port to serve TCP on, or unix:PATH for a Unix socket (default 127.0.0.1:%d; "
+            "clients are not authenticated, so use 0.0.0.0:PORT only on a trusted network)" % _DEFAULT_PORT)
+    serve.add_argument("--interval", type=float, default=0.02, help="seconds between polls while tags arrive")
+    serve.set_defaults(run=_serve_command)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args)
+    except BrokenPipeError:
+        # The reader of the output went away, as with | head. Point stdout at
+        # devnull so the interpreter's final flush does not fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except OSError as err:
+        print("qwiic-rfid: %s" % err, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+def _int_argument(value):
+    return int(value, 0)
+
+def _add_reader_arguments(parser, multiple_buses=False):
+    parser.add_argument("--address", type=_int_argument, action="append",
+        help="reader I2C address; repeat for several readers (default 0x%02X)" % _AVAILABLE_I2C_ADDRESS[0])
+    if multiple_buses:
+        parser.add_argument("--bus", type=int, action="append", help="I2C bus number; repeat for several buses")
+    else:
+        parser.add_argument("--bus", type=int, help="I2C bus number (default: the platform's bus)")
+    parser.add_argument("--simulate", type=float, metavar="RATE",
+        help="use simulated readers scanning RATE tags per second instead of the bus")
+    parser.add_argument("--record", metavar="PATH", help="write every bus transaction to a capture file")
+    parser.add_argument("--replay", metavar="PATH", help="answer from a capture file instead of the bus")
+    parser.add_argument("--realtime", action="store_true", help="replay with the capture's original timing")
+
+def _add_format_argument(parser):
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="output format (default jsonl)")
+
+# Gets the I2C driver for the command line options: a capture to replay,
+# simulated readers at the given addresses, a numbered bus, or the platform's
+# default bus, wrapped in a recorder if asked
+def _open_driver(args, bus=None):
+    if args.replay is not None:
+        driver = ReplayTransport(args.replay, realtime=args.realtime)
+    elif args.simulate is not None:
+        addresses = args.address or [_AVAILABLE_I2C_ADDRESS[0]]
+        driver = SimulatedI2CBus([SimulatedRFIDReader(address, rate=args.simulate) for address in addresses])
+    elif bus is not None or args.record is not None:
+        import qwiic_i2c
+
+        driver = qwiic_i2c.getI2CDriver(iBus=bus) if bus is not None else qwiic_i2c.getI2CDriver()
+        if driver is None:
+            raise OSError(errno.ENODEV, "no I2C driver for bus %s" % (bus if bus is not None else "default"))
+    else:
+        return None
+
+    if args.record is not None:
+        import atexit
+
+        driver = RecordingTransport(driver, args.record)
+        atexit.register(driver.close)
+    return driver
+
+# Whether the readers are answering from a capture that has run out
+def _replay_finished(bus):
+    return getattr(bus._i2c, "finished", False)
+
+# Opens the readers named on the command line as a ReaderBus, checking each
+# one is connected
+def _open_readers(args):
+    addresses = args.address or [_AVAILABLE_I2C_ADDRESS[0]]
+    bus = ReaderBus(_open_driver(args, args.bus))
+    for address in addresses:
+        reader = bus.add_reader(address=address)
+        if not reader.begin():
+            raise OSError(errno.ENODEV, "no Qwiic RFID reader at 0x%02X" % address)
+    return bus
+
+# Writes TagRecords to a stream as JSON lines or CSV rows, one batch per
+# write. The tag column is the get_tag() string, whose decimal bytes run
+# together so different IDs can print the same; the id column is the 6 ID
+# bytes in hex, which can't. Neither needs quoting, so the lines are
+# formatted directly.
+class _RecordWriter(object):
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.written = 0
+        if output_format == "csv":
+            self._line = "%.6f,%d,%s,%s,%d\n"
+            stream.write("time,address,id,tag,age_ms\n")
+        else:
+            self._line = '{"time": %.6f, "address": %d, "id": "%s", "tag": "%s", "age_ms": %d}\n'
+
+    def write_records(self, records):
+        if not records:
+            return
+        line = self._line
+        offset = (time.time_ns() - time.monotonic_ns()) / 1e9
+        self.stream.write("".join([line % (record.scan_ns / 1e9 + offset, record.address or 0,
+            record.tag_id.hex(), record.tag, record.age_ms) for record in records]))
+        self.stream.flush()
+        self.written += len(records)
+
+def _scan_command(args):
+    bus = _open_readers(args)
+    writer = _RecordWriter(sys.stdout, args.format)
+    end = time.monotonic() + args.duration if args.duration is not None else None
+
+    try:
+        while args.count is None or writer.written < args.count:
+            records = bus.drain_records()
+            if args.count is not None:
+                records = records[:args.count - writer.written]
+            writer.write_records(records)
+            if end is not None and time.monotonic() >= end or _replay_finished(bus):
+                break
+            if not records:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def _drain_command(args):
+    bus = _open_readers(args)
+    _RecordWriter(sys.stdout, args.format).write_records(bus.drain_records())
+    return 0
+
+# Probes each bus in its own thread, since separate buses can be driven at
+# the same time. The addresses on one bus are tried in turn, as they share
+# its wires.
+def _probe_command(args):
+    from concurrent.futures import ThreadPoolExecutor
+
+    if args.all:
+        addresses = list(range(0x08, 0x78))
+    else:
+        addresses = sorted(set(_AVAILABLE_I2C_ADDRESS) | set(args.address or []))
+    buses = args.bus or [None]
+
+    def probe_bus(bus):
+        reader = QwiicRFID(i2c_driver=_open_driver(args, bus), retry=False)
+        found = []
+        for address in addresses:
+            reader.address = address
+            try:
+                if reader.is_connected():
+                    found.append(address)
+            except OSError:
+                pass
+        return found
+
+    with ThreadPoolExecutor(max_workers=len(buses)) as executor:
+        results = list(executor.map(probe_bus, buses))
+
+    for bus, found in zip(buses, results):
+        for address in found:
+            if bus is None:
+                print("0x%02X" % address)
+            else:
+                print("%d 0x%02X" % (bus, address))
+    return 0 if any(results) else 1
+
+def _set_address_command(args):
+    if args.address is not None and len(args.address) > 1:
+        print("qwiic-rfid: set-address takes one --address", file=sys.stderr)
+        return 2
+
+    reader = _open_readers(args).readers[0]
+    old_address = reader.address
+    if reader.change_address(args.new_address) is False:
+        print("qwiic-rfid: 0x%02X is not a valid address" % args.new_address, file=sys.stderr)
+        return 2
+    print("moved reader 0x%02X to 0x%02X" % (old_address, args.new_address))
+    return 0
+
+# Drains as fast as tags arrive for a while and reports the tags per second,
+# the time each drain took, and how long tags waited from scan to delivery.
+def _bench_command(args):
+    bus = _open_readers(args)
+    drain_ns = []
+    tag_ns = []
+    start = time.monotonic_ns()
+    end = start + int(args.duration * 1e9)
+
+    try:
+        while time.monotonic_ns() < end and not _replay_finished(bus):
+            before = time.monotonic_ns()
+            records = bus.drain_records()
+            after = time.monotonic_ns()
+            drain_ns.append(after - before)
+            tag_ns.extend([after - record.scan_ns for record in records])
+            if not records:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    elapsed = (time.monotonic_ns() - start) / 1e9
+    print("tags: %d" % len(tag_ns))
+    print("tags/sec: %.1f" % (len(tag_ns) / elapsed))
+    print("drains: %d" % len(drain_ns))
+    for name, samples in (("drain", drain_ns), ("tag latency", tag_ns)):
+        if samples:
+            samples.sort()
+            print("%s ms: p50 %.3f  p99 %.3f  max %.3f" % (name, _percentile(samples, 0.5) / 1e6,
+                _percentile(samples, 0.99) / 1e6, samples[-1] / 1e6))
+    return 0
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+# Parses host:port, :port or unix:PATH
+def _parse_listen(value):
+    if value.startswith("unix:"):
+        return value[5:]
+    host, _, port = value.rpartition(":")
+    return (host, int(port))
+
+def _serve_command(args):
+    from qwiic_rfid_server import TagServer
+
+    bus = _open_readers(args)
+    server = TagServer(_parse_listen(args.listen)).start()
+    for reader in bus.readers:
+        reader.add_sink(server.write_records)
+    bus.start_polling(args.interval)
+    print("serving tags on %s" % (server.address,), file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.stop_polling()
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,602 @@
+#-----------------------------------------------------------------------------
+# qwiic_rfid_ipc.py
+#
+# Sharing Qwiic RFID tags between processes.
+#   https://www.sparkfun.com/products/15191
+#
+#------------------------------------------------------------------------
+#
+# This python library supports the SparkFun Electroncis qwiic 
+# qwiic sensor/board ecosystem 
+#
+# More information on qwiic is at https:// www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SparkFun. Buy a board!
+#==================================================================================
+# Copyright (c) 2020 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+
+"""!
+qwiic_rfid_ipc
+============
+Publishes drained tags to other processes through shared memory, and polls
+readers on several I2C buses from one worker process per bus.
+"""
+#-----------------------------------------------------------------------------
+
+import collections
+import errno
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from queue import Full as _QueueFull
+
+from qwiic_rfid import ReaderBus, SimulatedI2CBus, SimulatedRFIDReader, TagRecord
+
+# Shared tag rings are a header followed by a ring of fixed size slots. The
+# header holds the magic, version, slot size and slot count, then at
+# _SHARED_HEAD_OFFSET the sequence number of the last record published. Each
+# slot holds a record's sequence number followed by its received time, error
+# bound, age, tag ID and reader address. Record n lives in slot n % capacity.
+_SHARED_MAGIC = b"QRFS"
+_SHARED_VERSION = 1
+_SHARED_HEADER = struct.Struct("<4sHHI")    # Magic, version, slot size, slot count
+_SHARED_HEAD = struct.Struct("<Q")
+_SHARED_HEAD_OFFSET = 16
+_SHARED_SLOTS_OFFSET = 64
+_SHARED_RECORD = struct.Struct("<QqqI6sB5x")
+
+# SharedTagPublisher
+#
+# Publishes tags into a ring in shared memory for other processes to read
+# with SharedTagSubscriber, so one process can own the bus while any number
+# of others see every scan. Subscribers take no lock: each slot's sequence
+# number is cleared while the slot is written and set once it is complete,
+# and the head is moved on only after the slots behind it are written.
+# Writers, which as sinks run in whichever thread drained the reader, take
+# turns through a lock of their own so no two claim the same slots.
+# Subscribers that fall more than capacity records behind lose the oldest
+# ones, the same as the reader's own buffer.
+class SharedTagPublisher(object):
+    """!
+    SharedTagPublisher
+
+    @param name: Name of the shared memory block. Defaults to a generated name.
+    @param capacity: Records held in the ring
+
+    @return **Object** The publisher object.
+    """
+    def __init__(self, name=None, capacity=4096):
+        size = _SHARED_SLOTS_OFFSET + capacity * _SHARED_RECORD.size
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published_rings.add(self._shm._name)
+        self.capacity = capacity
+        self.published = 0
+        self._write_lock = threading.Lock()
+
+        _SHARED_HEADER.pack_into(self._shm.buf, 0, _SHARED_MAGIC, _SHARED_VERSION, _SHARED_RECORD.size, capacity)
+        _SHARED_HEAD.pack_into(self._shm.buf, _SHARED_HEAD_OFFSET, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def name(self):
+        """!
+        Name subscribers attach with
+
+        @return **str** The shared memory block's name
+        """
+        return self._shm.name
+
+    # ------------------------------------------------
+    # write_records(records)
+    #
+    # Publishes records to every subscriber. Usable directly as a QwiicRFID sink.
+    def write_records(self, records):
+        """!
+        Publishes tags to the subscribers
+
+        @param records: An iterable of TagRecords
+        """
+        with self._write_lock:
+            buf = self._shm.buf
+            sequence = self.published
+            for record in records:
+                sequence += 1
+                offset = _SHARED_SLOTS_OFFSET + (sequence % self.capacity) * _SHARED_RECORD.size
+                _SHARED_HEAD.pack_into(buf, offset, 0)
+                _SHARED_RECORD.pack_into(buf, offset, 0, record.received_ns, record.error_ns, record.age_ms,
+                    record.tag_id, record.address or 0)
+                _SHARED_HEAD.pack_into(buf, offset, sequence)
+
+            if sequence != self.published:
+                _SHARED_HEAD.pack_into(buf, _SHARED_HEAD_OFFSET, sequence)
+                self.published = sequence
+
+    def close(self, unlink=True):
+        """!
+        Releases the shared memory
+
+        @param unlink: Also remove the block, ending every subscriber's stream
+        """
+        if self._shm is None:
+            return
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+            _published_rings.discard(self._shm._name)
+        self._shm = None
+
+# SharedTagSubscriber
+#
+# Reads the tags published by a SharedTagPublisher, usually in another
+# process. Each subscriber keeps its own cursor, so they do not affect one
+# another or the publisher. A slot whose sequence number is not the one
+# expected, before or after it is read, was overwritten and counts as lost.
+class SharedTagSubscriber(object):
+    """!
+    SharedTagSubscriber
+
+    @param name: Name of the publisher's shared memory block
+    @param start: "latest" to read only tags published from now on, or
+                "oldest" to begin with the oldest tag still in the ring
+
+    @return **Object** The subscriber object.
+    """
+    def __init__(self, name, start="latest"):
+        if start not in ("latest", "oldest"):
+            raise ValueError("start must be 'latest' or 'oldest'")
+
+        self._shm = _attach_shared_memory(name)
+        magic, version, record_size, capacity = _SHARED_HEADER.unpack_from(self._shm.buf, 0)
+        if magic != _SHARED_MAGIC or version != _SHARED_VERSION or record_size != _SHARED_RECORD.size:
+            self._shm.close()
+            raise ValueError("%s is not a shared tag ring" % name)
+
+        self.capacity = capacity
+        self.lost = 0
+
+        head = self._head()
+        self.cursor = head if start == "latest" else max(head - capacity, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _head(self):
+        return _SHARED_HEAD.unpack_from(self._shm.buf, _SHARED_HEAD_OFFSET)[0]
+
+    # ------------------------------------------------
+    # available()
+    #
+    # Returns how many published tags this subscriber has not yet read.
+    def available(self):
+        """!
+        Gets the number of tags waiting to be read
+
+        @return **int** Tags published since the cursor, at most capacity
+        """
+        return min(self._head() - self.cursor, self.capacity)
+
+    # ------------------------------------------------
+    # read(max_records)
+    #
+    # Returns the tags published since the last read, oldest first, and moves
+    # the cursor past them.
+    def read(self, max_records=None):
+        """!
+        Reads the tags published since the last read
+
+        @param max_records: Most tags to return, or None for all waiting
+
+        @return **list** TagRecords in the order they were published
+        """
+        buf = self._shm.buf
+        head = self._head()
+        if head - self.cursor > self.capacity:
+            self.lost += head - self.capacity - self.cursor
+            self.cursor = head - self.capacity
+
+        end = head if max_records is None else min(head, self.cursor + max_records)
+        records = []
+        for sequence in range(self.cursor + 1, end + 1):
+            offset = _SHARED_SLOTS_OFFSET + (sequence % self.capacity) * _SHARED_RECORD.size
+            written, received_ns, error_ns, age_ms, tag_id, address = _SHARED_RECORD.unpack_from(buf, offset)
+            if written != sequence or _SHARED_HEAD.unpack_from(buf, offset)[0] != sequence:
+                self.lost += 1
+                continue
+            records.append(TagRecord(tag_id, age_ms, received_ns, address, error_ns))
+
+        self.cursor = end
+        return records
+
+    # ------------------------------------------------
+    # tail(interval)
+    #
+    # Yields tags as they are published, checking every interval seconds
+    # while none are waiting.
+    def tail(self, interval=0.01):
+        """!
+        Follows the stream of published tags
+
+        @param interval: Seconds between checks while no tags are waiting
+
+        @return **iterator** TagRecords as they are published
+        """
+        while self._shm is not None:
+            records = self.read()
+            if not records:
+                time.sleep(interval)
+            for record in records:
+                yield record
+
+    def close(self):
+        """!
+        Detaches from the shared memory
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+# Names of the rings published by this process, which the resource tracker
+# must keep tracking when a subscriber in the same process attaches
+_published_rings = set()
+
+# Attaches to an existing shared memory block without handing it to the
+# resource tracker, which would otherwise remove it when this process exits
+# even though the publisher still owns it.
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        if shm._name not in _published_rings:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+# Records travel from bus workers to the supervisor in batches, one pipe
+# message per drain, as fixed size records: when the tag was read and the
+# error bound of its scan time, both on the shared monotonic clock, its age,
+# its ID and its reader's address.
+_PIPE_RECORD = struct.Struct("<qqI6sBx")
+
+# BusSupervisor
+#
+# Polls readers on several I2C buses at once with one worker process per bus,
+# so neither the GIL nor one bus's transactions hold up the others. Each
+# worker runs a ReaderBus drain loop and sends every drain back over a pipe.
+# A thread in the supervising process hands the batches to the sink and/or
+# queue, restarts any worker that dies, and counts each bus's throughput.
+# Workers are spawned rather than forked by default: they are started from
+# that thread while others may hold locks, such as a reader's bus lock, that
+# a forked child would inherit held and never see released.
+class BusSupervisor(object):
+    """!
+    BusSupervisor
+
+    @param buses: Dict of I2C bus number to the reader addresses on that bus
+    @param sink: Called with each batch of TagRecords, like a QwiicRFID sink. Optional.
+    @param queue: A queue.Queue each TagRecord is put on. Optional.
+    @param driver_factory: Called in each worker as driver_factory(bus, addresses)
+                    to make that bus's I2C driver. Defaults to the platform's
+                    qwiic_i2c driver for the bus number. Must be picklable, like
+                    a module level function or SimulatedBusFactory.
+    @param interval: Seconds between polls while tags are arriving
+    @param max_interval: Longest wait between polls when a bus is idle
+    @param restart_delay: Seconds to wait before restarting a dead worker,
+                    doubled for each restart in a row without tags in between
+    @param start_method: multiprocessing start method for the workers, "spawn"
+                    or "forkserver". Defaults to "spawn".
+
+    @return **Object** The supervisor object. Call start() to begin polling.
+    """
+    def __init__(self, buses, sink=None, queue=None, driver_factory=None, interval=0.02, max_interval=0.5,
+            restart_delay=0.5, start_method="spawn"):
+        self.sink = sink
+        self.queue = queue
+        self.driver_factory = driver_factory if driver_factory is not None else _platform_driver
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.restart_delay = restart_delay
+        self._context = multiprocessing.get_context(start_method)
+
+        self.dropped = 0    # Records the queue had no room for
+        self.error = None    # Exception raised by the sink, which stops the supervisor
+
+        self._workers = dict((bus, _BusWorker(bus, list(addresses))) for bus, addresses in buses.items())
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._wake_recv = self._wake_send = None    # Pipe that interrupts the supervising thread's wait
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ------------------------------------------------
+    # start()
+    #
+    # Starts a worker for every bus and the thread that collects their tags.
+    def start(self):
+        """!
+        Starts polling every bus
+
+        @return **BusSupervisor** The supervisor itself
+        """
+        if self._thread is not None:
+            raise RuntimeError("supervisor is already running")
+
+        self._stop_event.clear()
+        self._wake_recv, self._wake_send = self._context.Pipe(duplex=False)
+        for worker in self._workers.values():
+            self._start_worker(worker)
+
+        self._thread = threading.Thread(target=self._supervise, name="QwiicRFID-supervisor", daemon=True)
+        self._thread.start()
+        return self
+
+    def _start_worker(self, worker):
+        receiver, sender = self._context.Pipe(duplex=False)
+        worker.stop_event = self._context.Event()
+        worker.process = self._context.Process(target=_run_bus_worker, name="QwiicRFID-bus-%s" % worker.bus,
+            args=(worker.bus, worker.addresses, self.driver_factory, sender, worker.stop_event,
+                self.interval, self.max_interval), daemon=True)
+        worker.process.start()
+        sender.close()    # The worker holds the only sending end, so its exit closes the pipe
+        worker.conn = receiver
+        worker.started_ns = time.monotonic_ns()
+        worker.first_start_ns = worker.first_start_ns or worker.started_ns
+        worker.restart_at = None
+
+    # Waits on every worker's pipe and the wake pipe, so stop() is seen at
+    # once even while every bus is idle
+    def _supervise(self):
+        while not self._stop_event.is_set():
+            by_conn = dict((worker.conn, worker) for worker in self._workers.values() if worker.conn is not None)
+            for conn in wait(list(by_conn) + [self._wake_recv], self._restart_due()):
+                if conn is self._wake_recv or self._stop_event.is_set():
+                    break
+                worker = by_conn[conn]
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, OSError):
+                    self._worker_died(worker)
+                    continue
+                try:
+                    self._deliver(worker, data)
+                except Exception as err:
+                    self.error = err
+                    self._stop_event.set()
+                    break
+
+            now = time.monotonic()
+            for worker in self._workers.values():
+                if worker.restart_at is not None and now >= worker.restart_at and not self._stop_event.is_set():
+                    worker.restarts += 1
+                    self._start_worker(worker)
+
+    # Seconds until the next restart is due, or None if none are waiting
+    def _restart_due(self):
+        due = [worker.restart_at for worker in self._workers.values() if worker.restart_at is not None]
+        if not due:
+            return None
+        return max(min(due) - time.monotonic(), 0)
+
+    def _deliver(self, worker, data):
+        records = [TagRecord(tag_id, age_ms, received_ns, address or None, error_ns)
+            for received_ns, error_ns, age_ms, tag_id, address in _PIPE_RECORD.iter_unpack(data)]
+        worker.count(len(records))
+
+        if self.sink is not None:
+            self.sink(records)
+        if self.queue is not None:
+            for record in records:
+                try:
+                    self.queue.put_nowait(record)
+                except _QueueFull:
+                    self.dropped += 1
+
+    # Notes a worker's exit and schedules its restart
+    def _worker_died(self, worker):
+        worker.conn.close()
+        worker.conn = None
+        worker.process.join(1.0)
+        worker.last_exit = worker.process.exitcode
+        worker.crashes += 1
+        worker.crash_streak = worker.crash_streak + 1 if worker.records_since_start == 0 else 1
+        worker.records_since_start = 0
+        worker.restart_at = time.monotonic() + self.restart_delay * 2 ** min(worker.crash_streak - 1, 6)
+
+    # ------------------------------------------------
+    # stats()
+    #
+    # Returns each bus's worker state and throughput.
+    def stats(self):
+        """!
+        Gets the supervisor's per bus counters
+
+        @return **dict** Bus number to a dict of pid, alive, records, batches,
+                    records_per_sec since the supervisor started, recent_rate
+                    over the last few seconds, crashes, restarts and last_exit
+        """
+        now_ns = time.monotonic_ns()
+        stats = {}
+        for bus, worker in self._workers.items():
+            process = worker.process
+            stats[bus] = {
+                "pid": process.pid if process is not None else None,
+                "alive": process is not None and process.is_alive(),
+                "records": worker.records,
+                "batches": worker.batches,
+                "records_per_sec": worker.records / ((now_ns - worker.first_start_ns) / 1e9)
+                    if worker.first_start_ns and now_ns > worker.first_start_ns else 0.0,
+                "recent_rate": worker.recent_rate(now_ns),
+                "crashes": worker.crashes,
+                "restarts": worker.restarts,
+                "last_exit": worker.last_exit,
+            }
+        return stats
+
+    # ------------------------------------------------
+    # stop(timeout)
+    #
+    # Asks every worker to finish, ending any that don't within timeout, and
+    # stops the supervising thread.
+    def stop(self, timeout=2.0):
+        """!
+        Stops polling every bus
+
+        @param timeout: Seconds to let each worker finish before it is terminated
+        """
+        self._stop_event.set()
+        for worker in self._workers.values():
+            if worker.stop_event is not None:
+                worker.stop_event.set()
+
+        if self._thread is not None:
+            self._wake_send.send_bytes(b"")
+            self._thread.join()
+            self._thread = None
+        if self._wake_recv is not None:
+            self._wake_recv.close()
+            self._wake_send.close()
+            self._wake_recv = self._wake_send = None
+
+        for worker in self._workers.values():
+            if worker.process is None:
+                continue
+            worker.stop_event.set()
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            if worker.conn is not None:
+                worker.conn.close()
+                worker.conn = None
+            worker.restart_at = None
+
+# Book keeping for one bus's worker process
+class _BusWorker(object):
+    RATE_WINDOW_NS = 5 * 1000000000
+
+    def __init__(self, bus, addresses):
+        self.bus = bus
+        self.addresses = addresses
+        self.process = None
+        self.conn = None
+        self.stop_event = None
+
+        self.started_ns = 0
+        self.first_start_ns = 0
+        self.restart_at = None    # time.monotonic() to restart at after a crash
+
+        self.records = 0
+        self.batches = 0
+        self.records_since_start = 0
+        self.crashes = 0
+        self.crash_streak = 0
+        self.restarts = 0
+        self.last_exit = None
+
+        self._window = collections.deque()    # (received time, records) of recent batches
+
+    def count(self, num_records):
+        now_ns = time.monotonic_ns()
+        self.records += num_records
+        self.records_since_start += num_records
+        self.batches += 1
+        self._window.append((now_ns, num_records))
+        self.recent_rate(now_ns)
+
+    # Records per second over the last RATE_WINDOW_NS, or since the first
+    # start if that was more recent
+    def recent_rate(self, now_ns):
+        window = self._window
+        while window and window[0][0] < now_ns - self.RATE_WINDOW_NS:
+            window.popleft()
+        span_ns = min(self.RATE_WINDOW_NS, now_ns - self.first_start_ns) if self.first_start_ns else 0
+        if span_ns <= 0:
+            return 0.0
+        return sum(count for _, count in window) / (span_ns / 1e9)
+
+# Makes the platform's I2C driver for a numbered bus
+def _platform_driver(bus, addresses):
+    import qwiic_i2c
+
+    driver = qwiic_i2c.getI2CDriver(iBus=bus)
+    if driver is None:
+        raise OSError(errno.ENODEV, "no I2C driver for bus %s" % bus)
+    return driver
+
+# SimulatedBusFactory
+#
+# A driver_factory for BusSupervisor that gives each bus simulated readers,
+# so multi bus polling can be tried without hardware.
+class SimulatedBusFactory(object):
+    """!
+    SimulatedBusFactory
+
+    @param kwargs: Passed to each SimulatedRFIDReader, as rate=, latency= and so on
+
+    @return **Object** The factory, to pass as driver_factory.
+    """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def __call__(self, bus, addresses):
+        return SimulatedI2CBus([SimulatedRFIDReader(address, **self.kwargs) for address in addresses])
+
+# The drain loop run by each bus worker process. Tags are sent on as soon as
+# they are drained. Polls speed up while tags arrive and back off when the
+# bus is idle, as a TagPoller's do.
+def _run_bus_worker(bus, addresses, driver_factory, conn, stop_event, interval, max_interval):
+    readers = ReaderBus(driver_factory(bus, addresses))
+    for address in addresses:
+        readers.add_reader(address=address)
+
+    pack = _PIPE_RECORD.pack
+    wait = interval
+    try:
+        while not stop_event.is_set():
+            records = readers.drain_records()
+            if records:
+                conn.send_bytes(b"".join([pack(record.received_ns, record.error_ns, record.age_ms,
+                    record.tag_id, record.address or 0) for record in records]))
+                wait = 0 if readers.saturated else interval
+            else:
+                wait = min(max(wait, interval) * 2, max_interval)
+            stop_event.wait(wait)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass    # The supervisor has gone or is stopping
+    finally:
+        conn.close()
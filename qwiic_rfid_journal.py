@@ -0,0 +1,462 @@
+#-----------------------------------------------------------------------------
+# qwiic_rfid_journal.py
+#
+# Crash safe scan journal for the SparkFun qwiic rfid reader.
+#   https://www.sparkfun.com/products/15191
+#
+#------------------------------------------------------------------------
+#
+# This python library supports the SparkFun Electroncis qwiic 
+# qwiic sensor/board ecosystem 
+#
+# More information on qwiic is at https:// www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SparkFun. Buy a board!
+#==================================================================================
+# Copyright (c) 2020 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+
+"""!
+qwiic_rfid_journal
+============
+An append only journal of tag scans on disk, fed by a QwiicRFID sink, and a
+reader for the segments it writes.
+"""
+#-----------------------------------------------------------------------------
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Journal files hold fixed size records after a short header: the wall clock
+# scan time in nanoseconds, the reader address and the 6 byte tag ID.
+_JOURNAL_MAGIC = b"QRFJ"
+_JOURNAL_VERSION = 1
+_JOURNAL_HEADER = struct.Struct("<4sHH")    # Magic, version, record size
+_JOURNAL_RECORD = struct.Struct("<qB6sx")
+_JOURNAL_SUFFIX = ".qrj"
+
+# ScanJournal
+#
+# An append only journal of scans on disk, so tags already drained off a
+# reader survive a restart. Add its write_records as a QwiicRFID sink. Records
+# are collected in memory and written with one write and fsync per group:
+# when batch_size records are waiting or commit_interval seconds after the
+# first of them arrived, whichever is sooner. A crash loses at most that
+# group. The timed commits are made by one flusher thread, started with the
+# first record and kept until close(), which waits on a condition for the
+# next one to fall due. Files are split into segments of about segment_size bytes; old
+# segments can be merged and trimmed with compact().
+class ScanJournal(object):
+    """!
+    ScanJournal
+
+    @param directory: Directory holding the journal segments. Created if missing.
+    @param batch_size: Records written together in one commit
+    @param commit_interval: Longest time in seconds a record waits to be committed
+    @param segment_size: Bytes after which a new segment file is started
+
+    @return **Object** The journal object.
+    """
+    def __init__(self, directory, batch_size=256, commit_interval=1.0, segment_size=16 * 1024 * 1024):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.segment_size = segment_size
+
+        self.commits = 0
+        self.records_written = 0
+
+        self._pending = bytearray()
+        self._pending_count = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)    # Signals the flusher of a new commit time
+        self._due = None    # time.monotonic() the waiting records must be committed by
+        self._flusher = None
+        self._fd = None
+        self._segment_bytes = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # A merged segment left by a compaction that crashed before renaming
+        # it into place is incomplete, and the segments it came from are all
+        # still there
+        for name in os.listdir(directory):
+            if name.startswith("scans-") and name.endswith(_JOURNAL_SUFFIX + ".tmp"):
+                os.remove(os.path.join(directory, name))
+
+        segments = _journal_segments(directory)
+        self._next_sequence = _segment_sequence(segments[-1]) + 1 if segments else 0
+        if segments:
+            self._open_segment(segments[-1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ------------------------------------------------
+    # write_records(records)
+    #
+    # Queues records for the next commit. Usable directly as a QwiicRFID sink.
+    def write_records(self, records):
+        """!
+        Adds scans to the journal
+
+        @param records: TagRecords to add
+        """
+        pack = _JOURNAL_RECORD.pack
+        offset_ns = time.time_ns() - time.monotonic_ns()
+
+        with self._lock:
+            for record in records:
+                self._pending += pack(record.scan_ns + offset_ns, record.address or 0, record.tag_id)
+            self._pending_count += len(records)
+
+            if self._pending_count >= self.batch_size:
+                self._commit()
+            elif self._pending_count and self._due is None and self.commit_interval is not None:
+                self._due = time.monotonic() + self.commit_interval
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._flush_when_due, name="QwiicRFID-journal")
+                    self._flusher.daemon = True
+                    self._flusher.start()
+                self._wakeup.notify()
+
+    # The flusher thread: commits the waiting records once they fall due,
+    # until close() replaces it with None
+    def _flush_when_due(self):
+        with self._lock:
+            while self._flusher is threading.current_thread():
+                if self._due is None:
+                    self._wakeup.wait()
+                elif self._due > time.monotonic():
+                    self._wakeup.wait(self._due - time.monotonic())
+                else:
+                    self._commit()
+
+    # ------------------------------------------------
+    # flush()
+    #
+    # Commits whatever is waiting now, without waiting for the group to fill.
+    def flush(self):
+        """!
+        Writes and syncs all queued records
+        """
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        self._due = None
+        if not self._pending_count:
+            return
+
+        if self._fd is None or self._segment_bytes >= self.segment_size:
+            self._new_segment()
+
+        os.write(self._fd, self._pending)
+        os.fsync(self._fd)
+
+        self._segment_bytes += len(self._pending)
+        self.records_written += self._pending_count
+        self.commits += 1
+        del self._pending[:]
+        self._pending_count = 0
+
+    def _new_segment(self):
+        path = os.path.join(self.directory, "scans-%08d%s" % (self._next_sequence, _JOURNAL_SUFFIX))
+        self._next_sequence += 1
+        _write_segment(path, b"")
+        _sync_directory(self.directory)
+        self._open_segment(path)
+
+    # Opens a segment for appending. A partial record left by a crash in the
+    # middle of a write is cut off first, and a header left unfinished by a
+    # crash while the segment was created is written again.
+    def _open_segment(self, path):
+        if self._fd is not None:
+            os.close(self._fd)
+
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        size = os.fstat(self._fd).st_size
+        if size < _JOURNAL_HEADER.size:
+            os.ftruncate(self._fd, 0)
+            os.write(self._fd, _JOURNAL_HEADER.pack(_JOURNAL_MAGIC, _JOURNAL_VERSION, _JOURNAL_RECORD.size))
+            os.fsync(self._fd)
+            size = _JOURNAL_HEADER.size
+        whole = _JOURNAL_HEADER.size + \
+            (size - _JOURNAL_HEADER.size) // _JOURNAL_RECORD.size * _JOURNAL_RECORD.size
+        if size != whole:
+            os.ftruncate(self._fd, whole)
+        self._segment_bytes = whole
+
+    # ------------------------------------------------
+    # rotate()
+    #
+    # Commits what is waiting and starts a new segment for later records.
+    def rotate(self):
+        """!
+        Closes the current segment and starts another
+        """
+        with self._lock:
+            self._commit()
+            self._new_segment()
+
+    # ------------------------------------------------
+    # compact(older_than)
+    #
+    # Merges every segment except the one being written into a single
+    # segment sorted by scan time, dropping records scanned before
+    # older_than. The merged segment is written and synced under a temporary
+    # name, then renamed over the first old segment, and only once that
+    # rename is on disk are the other old segments removed. A crash before
+    # the rename leaves the old segments intact; one after it can leave some
+    # records in the journal twice, but never loses any.
+    def compact(self, older_than=None):
+        """!
+        Merges and trims old segments
+
+        @param older_than: Wall clock time in seconds; older scans are dropped. Optional.
+
+        @return **int** Number of records kept in the merged segment
+        """
+        with self._lock:
+            self._commit()
+            old = _journal_segments(self.directory)[:-1]
+            if not old:
+                return 0
+
+            cutoff_ns = int(older_than * 1e9) if older_than is not None else None
+            records = []
+            for path in old:
+                with _JournalSegment(path) as segment:
+                    records.extend(record for record in segment.iter_unpack()
+                        if cutoff_ns is None or record[0] >= cutoff_ns)
+            records.sort(key=lambda record: record[0])
+
+            if records:
+                temp = old[0] + ".tmp"
+                _write_segment(temp, b"".join(_JOURNAL_RECORD.pack(*record) for record in records))
+                os.replace(temp, old[0])
+                _sync_directory(self.directory)
+                old = old[1:]
+
+            # Everything left is either merged or too old to keep
+            for path in old:
+                os.remove(path)
+            _sync_directory(self.directory)
+
+            return len(records)
+
+    # ------------------------------------------------
+    # close()
+    #
+    # Commits anything waiting, closes the current segment and stops the
+    # flusher thread.
+    def close(self):
+        """!
+        Flushes and closes the journal
+        """
+        with self._lock:
+            self._commit()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+            flusher = self._flusher
+            self._flusher = None
+            self._wakeup.notify_all()
+
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+
+def _journal_segments(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith("scans-") and name.endswith(_JOURNAL_SUFFIX))
+
+def _segment_sequence(path):
+    return int(os.path.basename(path)[len("scans-"):-len(_JOURNAL_SUFFIX)])
+
+# Makes renames and new files in a directory survive a crash. Platforms that
+# can't open a directory, like Windows, have nothing to sync.
+def _sync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_segment(path, body):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, _JOURNAL_HEADER.pack(_JOURNAL_MAGIC, _JOURNAL_VERSION, _JOURNAL_RECORD.size) + body)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# _JournalSegment
+#
+# One segment file mapped into memory. Records are read in place, and when
+# the segment is in time order, as compacted segments are, the records in a
+# time range are found by binary search.
+class _JournalSegment(object):
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.count = max(size - _JOURNAL_HEADER.size, 0) // _JOURNAL_RECORD.size
+
+        self._map = None
+        self.view = memoryview(b"")
+        if self.count:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_size = _JOURNAL_HEADER.unpack_from(self._map)
+            if magic != _JOURNAL_MAGIC or record_size != _JOURNAL_RECORD.size:
+                self.close()
+                raise ValueError("%s is not a scan journal segment" % path)
+            self.view = memoryview(self._map)[_JOURNAL_HEADER.size:
+                _JOURNAL_HEADER.size + self.count * _JOURNAL_RECORD.size]
+
+        # Time span of the segment, and whether its records are in time order
+        self.first_ns = self.last_ns = None
+        self.ordered = True
+        previous = None
+        for timestamp in self._timestamps():
+            if previous is not None and timestamp < previous:
+                self.ordered = False
+            self.first_ns = timestamp if self.first_ns is None else min(self.first_ns, timestamp)
+            self.last_ns = timestamp if self.last_ns is None else max(self.last_ns, timestamp)
+            previous = timestamp
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    # Timestamp of record i, so the segment can be bisected
+    def __getitem__(self, i):
+        return _JOURNAL_RECORD.unpack_from(self.view, i * _JOURNAL_RECORD.size)[0]
+
+    def _timestamps(self):
+        return (record[0] for record in self.iter_unpack())
+
+    def iter_unpack(self, start=0, end=None):
+        end = self.count if end is None else end
+        return _JOURNAL_RECORD.iter_unpack(self.view[start * _JOURNAL_RECORD.size:end * _JOURNAL_RECORD.size])
+
+    def range(self, start_ns, end_ns):
+        if self.count == 0 or self.last_ns < start_ns or self.first_ns >= end_ns:
+            return
+        if self.ordered:
+            for record in self.iter_unpack(bisect.bisect_left(self, start_ns), bisect.bisect_left(self, end_ns)):
+                yield record
+        else:
+            for record in self.iter_unpack():
+                if start_ns <= record[0] < end_ns:
+                    yield record
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+# JournalReader
+#
+# Reads a ScanJournal directory through memory maps. Records come back as
+# (scan time in wall clock nanoseconds, reader address, tag ID bytes) tuples.
+class JournalReader(object):
+    """!
+    JournalReader
+
+    @param directory: Directory written by a ScanJournal
+
+    @return **Object** The journal reader object.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._segments = [_JournalSegment(path) for path in _journal_segments(directory)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return sum(len(segment) for segment in self._segments)
+
+    # ------------------------------------------------
+    # replay()
+    #
+    # Yields every record in the order it was written.
+    def replay(self):
+        """!
+        Reads every record in the journal
+
+        @return **iterator** (timestamp_ns, address, tag_id) tuples
+        """
+        for segment in self._segments:
+            for record in segment.iter_unpack():
+                yield record
+
+    # ------------------------------------------------
+    # range(start, end)
+    #
+    # Yields the records scanned from start up to but not including end, given
+    # as wall clock seconds. Segments outside the range are skipped without
+    # reading their records.
+    def range(self, start=None, end=None):
+        """!
+        Reads the records scanned in a time range
+
+        @param start: Wall clock time in seconds, or None for the beginning
+        @param end: Wall clock time in seconds, or None for the end
+
+        @return **iterator** (timestamp_ns, address, tag_id) tuples
+        """
+        start_ns = int(start * 1e9) if start is not None else -(1 << 63)
+        end_ns = int(end * 1e9) if end is not None else (1 << 63) - 1
+        for segment in self._segments:
+            for record in segment.range(start_ns, end_ns):
+                yield record
+
+    def close(self):
+        """!
+        Releases the memory maps
+        """
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
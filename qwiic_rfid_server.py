@@ -0,0 +1,432 @@
+#-----------------------------------------------------------------------------
+# qwiic_rfid_server.py
+#
+# Network tag service for the SparkFun qwiic rfid reader.
+#   https://www.sparkfun.com/products/15191
+#
+#------------------------------------------------------------------------
+#
+# This python library supports the SparkFun Electroncis qwiic 
+# qwiic sensor/board ecosystem 
+#
+# More information on qwiic is at https:// www.sparkfun.com/qwiic
+#
+# Do you like this library? Help support SparkFun. Buy a board!
+#==================================================================================
+# Copyright (c) 2020 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy 
+# of this software and associated documentation files (the "Software"), to deal 
+# in the Software without restriction, including without limitation the rights 
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+# copies of the Software, and to permit persons to whom the Software is 
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all 
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE 
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, 
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE 
+# SOFTWARE.
+#==================================================================================
+
+"""!
+qwiic_rfid_server
+============
+Streams drained tags to clients over TCP or a Unix socket, and the client that
+reads them.
+"""
+#-----------------------------------------------------------------------------
+
+import errno
+import os
+import selectors
+import socket
+import stat
+import struct
+import threading
+import time
+
+# Tag service frames are a big endian header, the length of what follows it
+# and a frame type, then the body. A records frame holds fixed size records:
+# the wall clock scan time in nanoseconds, the reader address and the 6 byte
+# tag ID. A subscribe frame, sent by clients, holds one byte per reader
+# address wanted, or nothing for every reader.
+_FRAME_HEADER = struct.Struct(">IB")    # Length of type and body, type
+_FRAME_RECORDS = 1
+_FRAME_SUBSCRIBE = 2
+_WIRE_RECORD = struct.Struct(">qB6s")
+_DEFAULT_PORT = 4913
+
+# Longest frame a client may send: a subscribe frame naming every address
+_MAX_CLIENT_FRAME = 1 + 256
+
+# Removes the socket file an earlier server left at path. Anything else at
+# the path is refused rather than deleted.
+def _remove_stale_socket(path):
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket, so not replacing it", path)
+    os.unlink(path)
+
+# TagServer
+#
+# Streams tags to clients over TCP or a Unix socket, so one host can own the
+# readers while many others see the scans. write_records() is a QwiicRFID
+# sink: each drain is encoded once and queued for every client whose
+# subscription it matches, and one thread sends the queues without blocking.
+# Frames are batched per drain and a client's whole queue goes out in one
+# send, so Nagle's algorithm is turned off rather than left to delay small
+# writes. A client that lets more than max_pending bytes build up is
+# disconnected instead of slowing the others, as is one that sends a frame
+# that can't be valid.
+#
+# Clients are not authenticated, so by default only this host can connect.
+# Listen on ("0.0.0.0", port) to serve the network.
+class TagServer(object):
+    """!
+    TagServer
+
+    @param listen: A (host, port) tuple to serve TCP, or a path for a Unix socket.
+                    Defaults to the loopback interface. A socket left at the
+                    path by an earlier server is replaced; any other file
+                    there raises FileExistsError.
+    @param max_pending: Bytes queued for one client before it is disconnected
+    @param max_batch: Most records in one frame
+
+    @return **Object** The server object. Call start() to begin serving.
+    """
+    def __init__(self, listen=("127.0.0.1", _DEFAULT_PORT), max_pending=1024 * 1024, max_batch=512):
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+
+        self.clients_accepted = 0
+        self.clients_dropped = 0
+        self.records_sent = 0    # Records queued, counted once per client
+
+        if isinstance(listen, str):
+            _remove_stale_socket(listen)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(listen)
+        self._listener.listen(16)
+        self._listener.setblocking(False)
+        self._unix_path = listen if isinstance(listen, str) else None
+
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ)
+
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def address(self):
+        """!
+        Where the server is listening
+
+        @return The bound (host, port) or socket path
+        """
+        return self._listener.getsockname()
+
+    @property
+    def clients(self):
+        """!
+        Number of connected clients
+
+        @return **int** Clients connected now
+        """
+        return len(self._clients)
+
+    # ------------------------------------------------
+    # start()
+    #
+    # Starts the thread that accepts clients and sends their frames.
+    def start(self):
+        """!
+        Starts serving in a background thread
+
+        @return **TagServer** The server itself
+        """
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._serve, name="QwiicRFID-serve", daemon=True)
+            self._thread.start()
+        return self
+
+    # ------------------------------------------------
+    # write_records(records)
+    #
+    # Queues records for every client subscribed to their readers. Usable
+    # directly as a QwiicRFID sink.
+    def write_records(self, records):
+        """!
+        Sends tags to the subscribed clients
+
+        @param records: An iterable of TagRecords
+        """
+        pack = _WIRE_RECORD.pack
+        offset_ns = time.time_ns() - time.monotonic_ns()
+        encoded = [(record.address or 0, pack(record.scan_ns + offset_ns, record.address or 0, record.tag_id))
+            for record in records]
+        if not encoded:
+            return
+
+        everything = None
+        with self._lock:
+            for client in self._clients.values():
+                if client.addresses is None:
+                    if everything is None:
+                        everything = self._frames([wire for _, wire in encoded])
+                    frames = everything
+                else:
+                    wanted = [wire for address, wire in encoded if address in client.addresses]
+                    if not wanted:
+                        continue
+                    frames = self._frames(wanted)
+                client.pending += frames
+                self.records_sent += len(encoded) if client.addresses is None else len(wanted)
+
+        self._wake()
+
+    # Joins encoded records into frames of at most max_batch records
+    def _frames(self, wires):
+        frames = bytearray()
+        for start in range(0, len(wires), self.max_batch):
+            batch = wires[start:start + self.max_batch]
+            frames += _FRAME_HEADER.pack(1 + len(batch) * _WIRE_RECORD.size, _FRAME_RECORDS)
+            frames += b"".join(batch)
+        return frames
+
+    def _wake(self):
+        try:
+            self._wake_send.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass    # Already woken, or closing
+
+    def _serve(self):
+        while self._running:
+            for key, events in self._selector.select():
+                if key.fileobj is self._listener:
+                    self._accept()
+                elif key.fileobj is self._wake_recv:
+                    try:
+                        while self._wake_recv.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                elif events & selectors.EVENT_READ:
+                    self._receive(key.data)
+
+            with self._lock:
+                for client in list(self._clients.values()):
+                    if client.pending or client.waiting:
+                        self._send(client)
+
+    def _accept(self):
+        try:
+            conn, _ = self._listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        conn.setblocking(False)
+        if conn.family != socket.AF_UNIX:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        client = _ServerClient(conn)
+        with self._lock:
+            self._clients[conn] = client
+            self.clients_accepted += 1
+        self._selector.register(conn, selectors.EVENT_READ, client)
+
+    # Reads subscribe frames from a client
+    def _receive(self, client):
+        try:
+            data = client.conn.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            with self._lock:
+                self._drop(client)
+            return
+
+        client.received += data
+        while len(client.received) >= _FRAME_HEADER.size:
+            length, frame_type = _FRAME_HEADER.unpack_from(client.received)
+            if not 1 <= length <= _MAX_CLIENT_FRAME:
+                with self._lock:
+                    self.clients_dropped += 1
+                    self._drop(client)
+                return
+            end = _FRAME_HEADER.size - 1 + length
+            if len(client.received) < end:
+                break
+            if frame_type == _FRAME_SUBSCRIBE:
+                body = bytes(client.received[_FRAME_HEADER.size:end])
+                client.addresses = frozenset(body) if body else None
+            del client.received[:end]
+
+    # Sends as much of a client's queue as the socket takes. Called with the lock held.
+    def _send(self, client):
+        if len(client.pending) > self.max_pending:
+            self.clients_dropped += 1
+            self._drop(client)
+            return
+
+        try:
+            sent = client.conn.send(client.pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(client)
+            return
+        del client.pending[:sent]
+
+        # Only ask to be told when the socket can take more while data is waiting
+        waiting = bool(client.pending)
+        if waiting != client.waiting:
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if waiting else 0)
+            self._selector.modify(client.conn, events, client)
+            client.waiting = waiting
+
+    # Forgets a client. Called with the lock held.
+    def _drop(self, client):
+        if self._clients.pop(client.conn, None) is not None:
+            self._selector.unregister(client.conn)
+            client.conn.close()
+
+    def close(self):
+        """!
+        Stops serving and disconnects every client
+        """
+        if self._thread is not None:
+            self._running = False
+            self._wake()
+            self._thread.join()
+            self._thread = None
+
+        with self._lock:
+            for client in list(self._clients.values()):
+                self._drop(client)
+        if self._listener.fileno() != -1:
+            self._selector.close()
+            self._listener.close()
+            self._wake_recv.close()
+            self._wake_send.close()
+            if self._unix_path is not None and os.path.exists(self._unix_path):
+                os.unlink(self._unix_path)
+
+class _ServerClient(object):
+    __slots__ = ("conn", "addresses", "pending", "received", "waiting")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.addresses = None    # Reader addresses subscribed to, None for all
+        self.pending = bytearray()    # Frames not yet sent
+        self.received = bytearray()    # Partial frame from the client
+        self.waiting = False    # Registered for write readiness
+
+# TagClient
+#
+# Connects to a TagServer and reads the tags it streams, as the same
+# (scan time in wall clock nanoseconds, reader address, tag ID bytes) tuples
+# a JournalReader returns.
+class TagClient(object):
+    """!
+    TagClient
+
+    @param connect: A (host, port) tuple for TCP, or a path for a Unix socket
+    @param addresses: Reader addresses to receive tags from. Defaults to every reader.
+    @param timeout: Seconds to wait for data before socket.timeout is raised,
+                    or None to wait forever
+
+    @return **Object** The client object.
+    """
+    def __init__(self, connect=("localhost", _DEFAULT_PORT), addresses=None, timeout=None):
+        if isinstance(connect, str):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.settimeout(timeout)
+        self._sock.connect(connect)
+        self._file = self._sock.makefile("rb")
+
+        if addresses is not None:
+            self.subscribe(addresses)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            for record in self.read():
+                yield record
+
+    # ------------------------------------------------
+    # subscribe(addresses)
+    #
+    # Changes which readers' tags the server sends.
+    def subscribe(self, addresses=None):
+        """!
+        Chooses the readers to receive tags from
+
+        @param addresses: Reader addresses, or None for every reader
+        """
+        body = bytes(addresses) if addresses else b""
+        self._sock.sendall(_FRAME_HEADER.pack(1 + len(body), _FRAME_SUBSCRIBE) + body)
+
+    # ------------------------------------------------
+    # read()
+    #
+    # Waits for the next frame of tags and returns them.
+    def read(self):
+        """!
+        Reads the next batch of tags from the server
+
+        @return **list** (timestamp_ns, address, tag_id) tuples
+        """
+        while True:
+            header = self._read_exact(_FRAME_HEADER.size)
+            length, frame_type = _FRAME_HEADER.unpack(header)
+            body = self._read_exact(length - 1)
+            if frame_type == _FRAME_RECORDS:
+                return list(_WIRE_RECORD.iter_unpack(body))
+
+    def _read_exact(self, size):
+        data = self._file.read(size)
+        if len(data) < size:
+            raise ConnectionError("tag server closed the connection")
+        return data
+
+    def close(self):
+        """!
+        Disconnects from the server
+        """
+        self._file.close()
+        self._sock.close()
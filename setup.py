@@ -100,6 +100,11 @@ setup(
 
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
-    py_modules=["qwiic_rfid"],
+    py_modules=["qwiic_rfid", "qwiic_rfid_journal", "qwiic_rfid_ipc", "qwiic_rfid_server", "qwiic_rfid_cli"],
+
+    # Installs the qwiic-rfid command line tool
+    entry_points={
+        'console_scripts': ['qwiic-rfid=qwiic_rfid_cli:main'],
+    },
 
 )
@@ -0,0 +1,44 @@
+# Tests for the qwiic-rfid command line tool.
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import qwiic_rfid
+from qwiic_rfid_cli import _RecordWriter
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Two IDs whose decimal bytes run together into the same get_tag() string
+_SAME_TAG = [qwiic_rfid.TagRecord(bytes([0, 0, 0, 0, 1, 23]), 5, address=0x13),
+    qwiic_rfid.TagRecord(bytes([0, 0, 0, 0, 12, 3]), 5, address=0x13)]
+
+
+def test_json_lines_tell_apart_ids_with_the_same_tag():
+    stream = io.StringIO()
+    _RecordWriter(stream, "jsonl").write_records(_SAME_TAG)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["tag"] for line in lines] == ["0000123", "0000123"]
+    assert [line["id"] for line in lines] == ["000000000117", "000000000c03"]
+    assert [int(line["id"], 16) for line in lines] == [record.tag_int for record in _SAME_TAG]
+
+
+def test_csv_rows_tell_apart_ids_with_the_same_tag():
+    stream = io.StringIO()
+    _RecordWriter(stream, "csv").write_records(_SAME_TAG)
+
+    header, *rows = stream.getvalue().splitlines()
+    assert header == "time,address,id,tag,age_ms"
+    assert [row.split(",")[1:] for row in rows] == [["19", "000000000117", "0000123", "5"],
+        ["19", "000000000c03", "0000123", "5"]]
+
+
+def test_python_m_qwiic_rfid_runs_the_tool():
+    result = subprocess.run([sys.executable, "-m", "qwiic_rfid", "serve", "--help"], cwd=_ROOT,
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+
+    assert result.stdout.startswith("usage: qwiic-rfid serve")
@@ -0,0 +1,30 @@
+# Tests that importing the driver stays cheap: the modules only some features
+# need must not be loaded by import qwiic_rfid alone.
+
+import os
+import subprocess
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, "benchmarks"))
+
+from import_time import DEFERRED
+
+
+def test_import_defers_optional_modules():
+    code = "import sys, qwiic_rfid; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=_ROOT, stdout=subprocess.PIPE,
+        universal_newlines=True, check=True)
+
+    loaded = set(result.stdout.split())
+    assert [name for name in DEFERRED if name in loaded] == []
+
+
+def test_cli_import_defers_the_tag_service_and_thread_pool():
+    code = "import sys, qwiic_rfid_cli; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=_ROOT, stdout=subprocess.PIPE,
+        universal_newlines=True, check=True)
+
+    loaded = set(result.stdout.split())
+    assert [name for name in ("concurrent.futures", "qwiic_rfid_server", "selectors", "socket")
+        if name in loaded] == []
@@ -0,0 +1,109 @@
+# Tests for the shared memory ring and the multi bus supervisor.
+
+import collections
+import os
+import sys
+import threading
+import time
+
+from qwiic_rfid import TagRecord
+from qwiic_rfid_ipc import BusSupervisor, SharedTagPublisher, SharedTagSubscriber, SimulatedBusFactory
+
+
+def _tag(n):
+    return (0x2A0000 + n).to_bytes(6, "big")
+
+
+# A driver_factory whose first worker fails while opening its bus, leaving
+# a marker file so the restarted worker gets simulated readers
+class _CrashOnceFactory(object):
+
+    def __init__(self, marker):
+        self.marker = marker
+        self.simulated = SimulatedBusFactory(rate=200)
+
+    def __call__(self, bus, addresses):
+        if not os.path.exists(self.marker):
+            open(self.marker, "w").close()
+            raise OSError("simulated bus failure")
+        return self.simulated(bus, addresses)
+
+
+def test_supervisor_stops_while_every_bus_is_idle():
+    supervisor = BusSupervisor({1: [0x13], 2: [0x14]}, sink=lambda records: None,
+        driver_factory=SimulatedBusFactory(rate=0)).start()
+    assert supervisor._context.get_start_method() == "spawn"
+    time.sleep(0.2)
+
+    start = time.monotonic()
+    supervisor.stop()
+    assert time.monotonic() - start < 2.0
+    assert not any(stats["alive"] for stats in supervisor.stats().values())
+    assert all(stats["crashes"] == 0 for stats in supervisor.stats().values())
+
+
+def test_publisher_keeps_every_record_from_several_writers():
+    batches = 1000
+    start = threading.Barrier(4)
+
+    def write(address):
+        start.wait()
+        for batch in range(batches):
+            publisher.write_records([TagRecord(_tag(batch), 0, batch, address) for _ in range(16)])
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)    # Switch threads often, mid batch
+    with SharedTagPublisher(capacity=4 * batches * 16) as publisher:
+        with SharedTagSubscriber(publisher.name) as subscriber:
+            threads = [threading.Thread(target=write, args=(0x13 + i,)) for i in range(4)]
+            try:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                sys.setswitchinterval(interval)
+
+            records = subscriber.read()
+            assert publisher.published == 4 * batches * 16
+            assert subscriber.lost == 0
+            assert collections.Counter(record.address for record in records) == \
+                dict((0x13 + i, batches * 16) for i in range(4))
+
+
+def test_supervisor_restarts_a_crashed_worker(tmp_path):
+    batches = []
+    supervisor = BusSupervisor({1: [0x13]}, sink=batches.append,
+        driver_factory=_CrashOnceFactory(str(tmp_path / "crashed")), restart_delay=0.05).start()
+    try:
+        end = time.monotonic() + 5.0
+        while not batches and time.monotonic() < end:
+            time.sleep(0.02)
+        stats = supervisor.stats()[1]
+    finally:
+        supervisor.stop()
+
+    assert batches
+    assert stats["crashes"] == 1
+    assert stats["restarts"] == 1
+    assert stats["last_exit"] != 0
+    assert stats["records"] == sum(len(batch) for batch in batches)
+
+
+def test_subscriber_lapped_by_the_publisher_counts_what_it_lost():
+    with SharedTagPublisher(capacity=8) as publisher:
+        with SharedTagSubscriber(publisher.name) as subscriber:
+            publisher.write_records([TagRecord(_tag(n), 0, n, 0x13) for n in range(20)])
+            assert subscriber.available() == 8
+
+            records = subscriber.read()
+            assert [record.tag_id for record in records] == [_tag(n) for n in range(12, 20)]
+            assert subscriber.lost == 12
+
+            publisher.write_records([TagRecord(_tag(20), 0, 20, 0x13)])
+            assert [record.tag_id for record in subscriber.read()] == [_tag(20)]
+            assert subscriber.lost == 12
+
+        with SharedTagSubscriber(publisher.name, start="oldest") as late:
+            assert [record.tag_id for record in late.read()] == [_tag(n) for n in range(13, 21)]
+            assert late.lost == 0
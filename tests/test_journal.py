@@ -0,0 +1,129 @@
+# Tests for the scan journal, including the files a crash can leave behind.
+
+import os
+import threading
+import time
+
+import pytest
+
+import qwiic_rfid
+from qwiic_rfid_journal import JournalReader, ScanJournal
+
+
+def _records(count, start=0):
+    return [qwiic_rfid.TagRecord((0x2A0000 + n).to_bytes(6, "big"), 0, 1000000 * (n + 1), 0x13)
+        for n in range(start, start + count)]
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(str(directory)) if name.endswith(".qrj"))
+
+
+# Writes count records over several segments, leaving the last one open
+def _journal_in_segments(directory, segments, per_segment):
+    journal = ScanJournal(str(directory), commit_interval=None)
+    for n in range(segments):
+        journal.write_records(_records(per_segment, n * per_segment))
+        journal.rotate()
+    return journal
+
+
+def test_compaction_crashing_at_the_rename_keeps_every_record(tmp_path, monkeypatch):
+    journal = _journal_in_segments(tmp_path, 4, 4)
+
+    def crash(src, dst):
+        raise OSError("simulated crash")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        journal.compact()
+    monkeypatch.undo()
+    journal.close()
+
+    # Reopening clears away the unfinished merge
+    ScanJournal(str(tmp_path)).close()
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
+    with JournalReader(str(tmp_path)) as reader:
+        assert len(reader) == 16
+
+
+def test_compaction_merges_old_segments(tmp_path):
+    journal = _journal_in_segments(tmp_path, 4, 4)
+    assert journal.compact() == 16
+    journal.close()
+
+    # The merged segment and the empty one still being written
+    assert len(_segments(tmp_path)) == 2
+    with JournalReader(str(tmp_path)) as reader:
+        assert [record[2] for record in reader.replay()] == [record.tag_id for record in _records(16)]
+
+
+@pytest.mark.parametrize("left", [b"", b"QRF"])
+def test_journal_opens_after_a_crash_creating_a_segment(tmp_path, left):
+    with open(str(tmp_path / "scans-00000000.qrj"), "wb") as segment:
+        segment.write(left)
+
+    with ScanJournal(str(tmp_path), commit_interval=None) as journal:
+        journal.write_records(_records(3))
+
+    with JournalReader(str(tmp_path)) as reader:
+        assert len(reader) == 3
+
+
+def test_journal_round_trip(tmp_path):
+    with ScanJournal(str(tmp_path), batch_size=4, commit_interval=None) as journal:
+        journal.write_records(_records(3))
+        assert journal.records_written == 0    # Waiting for the group to fill
+        journal.write_records(_records(3, 3))
+        assert journal.records_written == 6
+        journal.write_records(_records(4, 6))
+    with ScanJournal(str(tmp_path), commit_interval=None) as journal:
+        journal.write_records(_records(5, 10))
+
+    with JournalReader(str(tmp_path)) as reader:
+        records = list(reader.replay())
+        assert len(reader) == 15
+        assert [(address, tag_id) for _, address, tag_id in records] == \
+            [(record.address, record.tag_id) for record in _records(15)]
+
+        # Scans are a millisecond apart, so the middle five come back on
+        # their own. Float seconds cannot hold every nanosecond, so the
+        # range is cut halfway between scans rather than on them
+        times = [timestamp for timestamp, _, _ in records]
+        assert times == sorted(times)
+        middle = list(reader.range((times[5] - 500000) / 1e9, (times[10] - 500000) / 1e9))
+        assert [tag_id for _, _, tag_id in middle] == [record.tag_id for record in _records(5, 5)]
+
+
+def test_journal_cuts_off_a_torn_record(tmp_path):
+    with ScanJournal(str(tmp_path), commit_interval=None) as journal:
+        journal.write_records(_records(3))
+    path = str(tmp_path / _segments(tmp_path)[-1])
+    size = os.path.getsize(path)
+    with open(path, "ab") as segment:
+        segment.write(b"\x01\x02\x03\x04\x05")    # Half a record, as a crash mid write leaves
+
+    with ScanJournal(str(tmp_path), commit_interval=None) as journal:
+        assert os.path.getsize(path) == size
+        journal.write_records(_records(2, 3))
+
+    with JournalReader(str(tmp_path)) as reader:
+        assert [tag_id for _, _, tag_id in reader.replay()] == [record.tag_id for record in _records(5)]
+
+
+def test_journal_commits_every_group_from_one_flusher(tmp_path):
+    journal = ScanJournal(str(tmp_path), batch_size=100, commit_interval=0.02)
+    for group in range(3):
+        journal.write_records(_records(2, 2 * group))
+        flushers = [thread for thread in threading.enumerate() if thread.name == "QwiicRFID-journal"]
+        assert len(flushers) == 1
+        deadline = time.monotonic() + 2
+        while journal.records_written < 2 * (group + 1) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert journal.records_written == 2 * (group + 1)
+
+    flusher = flushers[0]
+    journal.close()
+    assert not flusher.is_alive()
+    with JournalReader(str(tmp_path)) as reader:
+        assert len(reader) == 6
@@ -0,0 +1,1050 @@
+# Tests for the QwiicRFID driver, run against simulated readers.
+
+import asyncio
+import contextlib
+import errno
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import qwiic_rfid
+
+
+def _tag(n):
+    return (0x2A0000 + n).to_bytes(6, "big")
+
+
+# A simulated reader whose first read in each thread waits at a barrier, so
+# drains in several threads are all under way before any of them reads a tag.
+class _BarrierReader(qwiic_rfid.SimulatedRFIDReader):
+
+    def __init__(self, parties, **kwargs):
+        qwiic_rfid.SimulatedRFIDReader.__init__(self, **kwargs)
+        self.barrier = threading.Barrier(parties, timeout=0.5)
+        self._waited = threading.local()
+
+    def readBlock(self, address, commandCode, nBytes):
+        if not getattr(self._waited, "done", False):
+            self._waited.done = True
+            try:
+                self.barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+        return qwiic_rfid.SimulatedRFIDReader.readBlock(self, address, commandCode, nBytes)
+
+
+def _run_together(functions):
+    results = [None] * len(functions)
+
+    def run(i):
+        results[i] = functions[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(functions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# Fills a reader with count distinct tags, more than the simulated buffer
+# holds by making it deeper
+def _loaded_reader(parties, count):
+    device = _BarrierReader(parties)
+    device.FIFO_DEPTH = count
+    device._fifo = type(device._fifo)(maxlen=count)
+    for n in range(count):
+        device.scan(_tag(n))
+    return device
+
+
+def test_concurrent_drain_records_keep_every_tag():
+    device = _loaded_reader(2, 40)
+    # Transactions are serialised by the simulator itself, so the bus lock
+    # can be left out to let both drains reach the barrier
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, bus_lock=contextlib.nullcontext())
+
+    # Sinks run once a drain's tags are decoded and before they are returned,
+    # so holding both drains there makes each finish reading before either
+    # hands its tags back
+    seen = []
+    decoded = threading.Barrier(2, timeout=0.5)
+
+    def sink(records):
+        seen.extend(records)
+        try:
+            decoded.wait()
+        except threading.BrokenBarrierError:
+            pass
+
+    reader.add_sink(sink)
+
+    first, second = _run_together([reader.drain_records, reader.drain_records])
+
+    assert len(first) + len(second) == 40
+    assert sorted(record.tag_id for record in first + second) == sorted(_tag(n) for n in range(40))
+    assert len(seen) == 40
+
+
+def test_concurrent_drains_into_the_ring_never_overwrite():
+    device = _loaded_reader(2, 40)
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, bus_lock=contextlib.nullcontext())
+
+    counts = _run_together([reader.drain, reader.drain])
+
+    # The ring holds 20, so one drain takes them and the other leaves the
+    # rest on the reader rather than overwriting
+    assert sum(counts) == 20
+    assert reader.available() == 20
+    assert device.stats()["queued"] == 20
+    assert sorted(record.tag_id for record in reader.drain_records()) == sorted(_tag(n) for n in range(40))
+
+
+# A tag ID whose bytes all have three digits, so its tag string is unique
+def _wide_tag(n):
+    return bytes([100, 100, 100, 100, 100 + n // 100, 100 + n % 100])
+
+
+# Answers each read with the next of count distinct tags, tag n having been
+# scanned n + 1 milliseconds ago, then with blank records
+class _CountingTransport(qwiic_rfid.RFIDTransport):
+
+    def __init__(self, count):
+        self.count = count
+        self.next_tag = 0
+        self._lock = threading.Lock()
+
+    def readBlock(self, address, commandCode, nBytes):
+        with self._lock:
+            n = self.next_tag
+            if n >= self.count:
+                return [0] * nBytes
+            self.next_tag += 1
+        return list(qwiic_rfid._RECORD_STRUCT.pack(_wide_tag(n), n + 1))
+
+
+def test_concurrent_get_all_tags_keep_tags_with_their_times():
+    count = 4000
+    transport = _CountingTransport(count)
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=transport)
+    expected = {qwiic_rfid.TagRecord(_wide_tag(n), n + 1).tag: (n + 1) / 1000.0 for n in range(count)}
+    seen = []
+    mismatched = []
+
+    def collect(use_prec_times):
+        tags = [None] * reader.MAX_TAG_STORAGE
+        times = [None] * reader.MAX_TAG_STORAGE
+        while transport.next_tag < count or reader.available():
+            if use_prec_times:
+                num_tags = reader.get_all_tags(tags)
+                reader.get_all_prec_times(times)
+            else:
+                num_tags = reader.get_all_tags(tags, times)
+            for tag, age in zip(tags[:num_tags], times[:num_tags]):
+                seen.append(tag)
+                if expected[tag] != age:
+                    mismatched.append((tag, age))
+
+    def fill_ring():
+        while transport.next_tag < count:
+            reader.drain()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        _run_together([lambda: collect(False), lambda: collect(False), lambda: collect(True),
+            lambda: collect(True), fill_ring])
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert mismatched == []
+    assert sorted(seen) == sorted(expected)
+
+
+def test_ring_buffer_wraps_and_overwrites_the_oldest():
+    ring = qwiic_rfid.TagRingBuffer(4)
+    for n in range(3):
+        assert not ring.push(n, 10 * n, 100 * n)
+    assert ring.pop().tag_int == 0
+
+    # Two more wrap past the end of the arrays; a third overwrites tag 1
+    assert not ring.push(3, 30, 300)
+    assert not ring.push(4, 40, 400)
+    assert ring.push(5, 50, 500, 7)
+    assert len(ring) == 4
+
+    segments = ring.segments()
+    assert len(segments) == 2
+    assert [n for ids, _, _, _ in segments for n in ids] == [2, 3, 4, 5]
+    assert [n for _, ages, _, _ in segments for n in ages] == [20, 30, 40, 50]
+
+    ids, ages, received, errors = ring.snapshot()
+    records = [ring.pop(0x13) for _ in range(4)]
+    ring.push(6, 60, 600)
+    assert list(ids) == [2, 3, 4, 5] and list(received) == [200, 300, 400, 500]
+    assert list(errors) == [0, 0, 0, 7]
+    assert [(record.tag_int, record.age_ms, record.address) for record in records] == \
+        [(2, 20, 0x13), (3, 30, 0x13), (4, 40, 0x13), (5, 50, 0x13)]
+    assert ring.pop().tag_int == 6 and ring.pop() is None and ring.segments() == []
+
+
+def test_drain_fills_the_ring_and_leaves_the_rest_on_the_reader():
+    now = [10 ** 12]
+    device = qwiic_rfid.SimulatedRFIDReader(clock=lambda: now[0])
+    for n in range(8):
+        device.scan(_wide_tag(n), now[0] - (n + 1) * 1000000)
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, buffer_size=5)
+
+    assert reader.drain() == 5
+    assert reader.drain() == 0    # The ring is full, so nothing more is read
+    assert len(reader.tag_buffer) == 5 and device.stats()["queued"] == 3
+
+    # Tags held in the ring come first, then the rest are read off the reader
+    assert reader.get_tag_time() == (qwiic_rfid.TagRecord(_wide_tag(0), 0).tag, 0.001)
+    tags = [None] * reader.MAX_TAG_STORAGE
+    times = [None] * reader.MAX_TAG_STORAGE
+    assert reader.get_all_tags(tags) == 7
+    reader.get_all_prec_times(times)
+
+    assert tags[:7] == [qwiic_rfid.TagRecord(_wide_tag(n), 0).tag for n in range(1, 8)]
+    assert times[:7] == [(n + 1) / 1000.0 for n in range(1, 8)]
+    assert tags[7:] == ["000000"] * 13 and times[7:] == [0.0] * 13
+
+    # The times are only handed out once
+    reader.get_all_prec_times(times)
+    assert times == [0.0] * reader.MAX_TAG_STORAGE
+    assert reader.get_tag_time() == ("000000", 0.0)
+
+
+# A badge held at the reader fills its buffer with repeats, which dedupe
+# drops; the poller and scheduler still have to see that the buffer was full
+def _held_badge_reader(**kwargs):
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for _ in range(device.FIFO_DEPTH):
+        device.scan(_tag(1))
+    return qwiic_rfid.QwiicRFID(i2c_driver=device, dedupe=qwiic_rfid.TagDeduplicator(window=60.0), **kwargs)
+
+
+def test_poller_drains_again_after_a_full_buffer_of_repeats():
+    reader = _held_badge_reader()
+    delivered = []
+    poller = qwiic_rfid.TagPoller(reader, callback=delivered.append)
+
+    assert poller.poll_once() == 20
+    assert len(delivered) == 1
+    assert poller._next_interval(20) == 0
+
+
+def test_scheduler_sees_a_full_buffer_of_repeats():
+    reader = _held_badge_reader()
+    scheduler = qwiic_rfid.PollScheduler()
+    poller = qwiic_rfid.TagPoller(reader, scheduler=scheduler)
+
+    poller.poll_once()
+
+    stats = scheduler.stats()["readers"][reader.address]
+    assert stats["full_drains"] == 1
+    assert scheduler.next_interval() == 0
+
+
+def test_poller_backs_off_while_idle_and_resets_on_tags():
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=qwiic_rfid.SimulatedRFIDReader())
+    poller = qwiic_rfid.TagPoller(reader, min_interval=0.02, max_interval=0.1)
+
+    waits = []
+    for _ in range(4):
+        poller.interval = poller._next_interval(0)
+        waits.append(poller.interval)
+
+    assert waits == [0.04, 0.08, 0.1, 0.1]
+    assert poller._next_interval(3) == 0.02
+    assert poller._next_interval(reader.MAX_TAG_STORAGE) == 0
+
+
+def test_poller_keeps_polling_after_a_callback_error():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device)
+    delivered = []
+
+    def callback(record):
+        delivered.append(record)
+        if len(delivered) == 1:
+            raise ValueError("bad tag")
+
+    poller = qwiic_rfid.TagPoller(reader, callback=callback, min_interval=0.01, max_interval=0.01)
+    device.scan(_tag(1))
+    device.scan(_tag(2))
+    poller.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while len(delivered) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        device.scan(_tag(3))
+        while len(delivered) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert poller.is_alive()
+    finally:
+        assert poller.stop(timeout=1.0)
+
+    assert [record.tag_id for record in delivered] == [_tag(1), _tag(2), _tag(3)]
+    assert poller.callback_errors == 1
+    assert isinstance(poller.callback_error, ValueError)
+    assert poller.error is None
+
+
+def test_start_and_stop_polling():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device)
+    delivered = []
+
+    poller = reader.start_polling(interval=0.01, callback=delivered.append)
+    with pytest.raises(RuntimeError):
+        reader.start_polling()
+
+    device.scan(_tag(1))
+    deadline = time.monotonic() + 2.0
+    while not delivered and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert reader.stop_polling(timeout=1.0)
+    assert not poller.is_alive()
+    assert [record.tag_id for record in delivered] == [_tag(1)]
+    assert reader.stop_polling()
+
+
+def test_bus_reports_saturation_from_repeats():
+    bus = qwiic_rfid.ReaderBus(qwiic_rfid.SimulatedI2CBus([qwiic_rfid.SimulatedRFIDReader()]))
+    reader = bus.add_reader(address=0x13)
+    reader.dedupe = qwiic_rfid.TagDeduplicator(window=60.0)
+    for _ in range(20):
+        bus._i2c.readers[0].scan(_tag(1))
+
+    assert len(bus.drain_records()) == 1
+    assert bus.saturated
+
+
+def test_analytics_counts_every_scan_from_several_writers():
+    analytics = qwiic_rfid.ScanAnalytics(top_k=8)
+    batches = 2000
+    seen = []
+    stop = threading.Event()
+    start = threading.Barrier(4)
+
+    def write(address):
+        def run():
+            start.wait()
+            for batch in range(batches):
+                records = [qwiic_rfid.TagRecord(_tag(n), 0, received_ns=batch * 1000000 + n, address=address)
+                    for n in range(8)]
+                analytics.write_records(records)
+        return run
+
+    def watch():
+        while not stop.is_set():
+            snapshot = analytics.snapshot()
+            seen.append((snapshot["scans"], sum(tag["count"] for tag in snapshot["top_tags"])))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)    # Switch threads often, mid batch
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        _run_together([write(0x13 + i) for i in range(4)])
+    finally:
+        stop.set()
+        watcher.join()
+        sys.setswitchinterval(interval)
+
+    snapshot = analytics.snapshot()
+    assert snapshot["scans"] == 4 * batches * 8
+    assert sum(tag["count"] for tag in snapshot["top_tags"]) == 4 * batches * 8
+    assert all(scans == counted for scans, counted in seen)
+
+
+def test_analytics_dwell_ends_a_visit_after_a_gap():
+    analytics = qwiic_rfid.ScanAnalytics(dwell_gap=5.0)
+
+    # Tag 1 stays 4 s, leaves, and comes back for 1 s; tag 2 arriving 9 s
+    # after that ends the second visit
+    analytics.write_records([_scan(1, seconds) for seconds in (0, 2, 4)])
+    analytics.write_records([_scan(1, 20), _scan(1, 21)])
+    assert analytics.snapshot()["dwell"]["visits"] == 1
+    analytics.write_records([_scan(2, 30)])
+
+    dwell = analytics.snapshot()["dwell"]
+    assert (dwell["visits"], dwell["open"]) == (2, 1)
+    assert (dwell["mean"], dwell["max"]) == (2.5, 4.0)
+    assert [(edge, count) for edge, count in dwell["histogram"] if count] == [(1, 1), (2, 1)]
+
+
+def test_analytics_ends_the_oldest_visit_beyond_max_visits():
+    analytics = qwiic_rfid.ScanAnalytics(dwell_gap=60.0, max_visits=1)
+    analytics.write_records([_scan(1, 0), _scan(1, 3), _scan(2, 4)])
+
+    dwell = analytics.snapshot()["dwell"]
+    assert (dwell["visits"], dwell["open"], dwell["max"]) == (1, 1, 3.0)
+
+
+def test_analytics_snapshot_waits_out_a_batch_being_written():
+    analytics = qwiic_rfid.ScanAnalytics()
+    analytics.write_records([_scan(1, 0)])
+
+    # An odd version means a writer is part way through a batch
+    analytics._version += 1
+    snapshots = []
+    reader = threading.Thread(target=lambda: snapshots.append(analytics.snapshot()))
+    reader.start()
+    time.sleep(0.05)
+    assert not snapshots
+
+    analytics._add(2, 1000000000, 0x13)
+    analytics._version += 1
+    reader.join(1.0)
+    assert [snapshot["scans"] for snapshot in snapshots] == [2]
+
+
+def test_analytics_snapshots_alongside_a_writer_see_whole_batches():
+    analytics = qwiic_rfid.ScanAnalytics(window=1.0, buckets=10, dwell_gap=0.5)
+    stop = threading.Event()
+    seen = []
+
+    def write():
+        for batch in range(3000):
+            analytics.write_records([_scan(n, batch * 0.01) for n in range(8)])
+
+    def watch():
+        while not stop.is_set():
+            snapshot = analytics.snapshot()
+            seen.append((snapshot["scans"], snapshot["dwell"]["visits"] + snapshot["dwell"]["open"]))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        write()
+    finally:
+        stop.set()
+        watcher.join()
+        sys.setswitchinterval(interval)
+
+    assert len(seen) > 1
+    assert all(scans % 8 == 0 for scans, _ in seen)
+    assert all(visits == (8 if scans else 0) for scans, visits in seen)
+
+
+# Records a drain of count tags, scanned 100 ms apart, to a capture file
+def _record_capture(path, count):
+    device = qwiic_rfid.SimulatedRFIDReader()
+    now_ns = time.monotonic_ns()
+    for n in range(count):
+        device.scan(_tag(n), scan_ns=now_ns - (count - n) * 100000000)
+
+    with qwiic_rfid.RecordingTransport(device, str(path)) as transport:
+        reader = qwiic_rfid.QwiicRFID(i2c_driver=transport)
+        assert reader.begin()
+        return reader.drain_records()
+
+
+def test_replay_returns_the_recorded_tags(tmp_path):
+    recorded = _record_capture(tmp_path / "site.qrc", 5)
+    assert [record.age_ms // 100 for record in recorded] == [5, 4, 3, 2, 1]
+
+    transport = qwiic_rfid.ReplayTransport(str(tmp_path / "site.qrc"))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=transport)
+    assert reader.begin()
+    replayed = reader.drain_records()
+
+    assert [(record.tag_id, record.age_ms) for record in replayed] == \
+        [(record.tag_id, record.age_ms) for record in recorded]
+    assert transport.finished
+    assert reader.drain_records() == []    # An empty reader once the capture runs out
+
+
+def test_replay_drops_a_torn_last_entry(tmp_path):
+    path = tmp_path / "site.qrc"
+    _record_capture(path, 5)
+    entries = len(qwiic_rfid.ReplayTransport(str(path)))
+    with open(str(path), "r+b") as capture:
+        capture.truncate(capture.seek(0, 2) - 3)
+
+    assert len(qwiic_rfid.ReplayTransport(str(path))) == entries - 1
+
+
+def test_strict_replay_rejects_a_different_transaction(tmp_path):
+    path = tmp_path / "site.qrc"
+    _record_capture(path, 1)
+
+    transport = qwiic_rfid.ReplayTransport(str(path))
+    with pytest.raises(ValueError):
+        transport.readBlock(0x13, 0, 10)    # The capture starts with begin()'s probe
+
+
+def test_async_drain_recovers_after_a_bus_error():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    reader = qwiic_rfid.AsyncQwiicRFID(qwiic_rfid.QwiicRFID(i2c_driver=device, retry=False))
+
+    async def run():
+        device.present = False
+        with pytest.raises(OSError):
+            await reader.drain_records()
+
+        # The reader is back with a tag waiting, so the failed drain must not
+        # be handed out again
+        device.present = True
+        device.scan(_tag(1))
+        return await reader.drain_records()
+
+    try:
+        assert [record.tag_id for record in asyncio.run(run())] == [_tag(1)]
+    finally:
+        reader.close()
+
+
+# A simulated reader whose reads wait until release is set
+class _SlowReader(qwiic_rfid.SimulatedRFIDReader):
+
+    def __init__(self, **kwargs):
+        qwiic_rfid.SimulatedRFIDReader.__init__(self, **kwargs)
+        self.release = threading.Event()
+
+    def readBlock(self, address, commandCode, nBytes):
+        self.release.wait(2.0)
+        return qwiic_rfid.SimulatedRFIDReader.readBlock(self, address, commandCode, nBytes)
+
+
+def test_async_drain_cancelled_hands_its_tags_to_the_next_call():
+    device = _SlowReader()
+    device.scan(_tag(1))
+    device.scan(_tag(2))
+    reader = qwiic_rfid.AsyncQwiicRFID(qwiic_rfid.QwiicRFID(i2c_driver=device))
+
+    async def run():
+        task = asyncio.ensure_future(reader.drain_records())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        device.release.set()
+        drained = await reader.drain_records()
+        return drained, await reader.drain_records()
+
+    try:
+        drained, after = asyncio.run(run())
+    finally:
+        reader.close()
+
+    assert [record.tag_id for record in drained] == [_tag(1), _tag(2)]
+    assert after == []
+
+
+def test_async_drains_at_the_same_time_get_their_own_tags():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(3):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.AsyncQwiicRFID(qwiic_rfid.QwiicRFID(i2c_driver=device))
+
+    async def run():
+        return await asyncio.gather(reader.drain_records(), reader.drain_records())
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        reader.close()
+
+    assert [record.tag_id for record in first] == [_tag(0), _tag(1), _tag(2)]
+    assert second == []
+
+
+def test_async_tags_streams_and_keeps_what_is_not_consumed():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(3):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.AsyncQwiicRFID(qwiic_rfid.QwiicRFID(i2c_driver=device))
+
+    async def take(count):
+        taken = []
+        async for record in reader.tags(min_interval=0.01, max_interval=0.02):
+            taken.append(record.tag_id)
+            if len(taken) == count:
+                return taken
+
+    async def run():
+        first = await take(1)
+        device.scan(_tag(3))
+        return first, await take(3)
+
+    try:
+        first, rest = asyncio.run(run())
+    finally:
+        reader.close()
+
+    assert first == [_tag(0)]
+    assert rest == [_tag(1), _tag(2), _tag(3)]
+
+
+def test_async_tags_cancelled_mid_drain_loses_no_tags():
+    device = _SlowReader()
+    device.scan(_tag(1))
+    device.scan(_tag(2))
+    reader = qwiic_rfid.AsyncQwiicRFID(qwiic_rfid.QwiicRFID(i2c_driver=device))
+
+    async def first_tag():
+        async for record in reader.tags(min_interval=0.01, max_interval=0.02):
+            return record.tag_id
+
+    async def run():
+        task = asyncio.ensure_future(first_tag())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        device.release.set()
+        return [await first_tag(), await first_tag()]
+
+    try:
+        assert asyncio.run(run()) == [_tag(1), _tag(2)]
+    finally:
+        reader.close()
+
+
+# A simulated reader that drops off the bus for the reads numbered in absent,
+# counting from 0, and is back for the rest
+class _DropoutReader(qwiic_rfid.SimulatedRFIDReader):
+
+    def __init__(self, absent, **kwargs):
+        qwiic_rfid.SimulatedRFIDReader.__init__(self, **kwargs)
+        self.absent = set(absent)
+        self.reads = 0
+
+    def readBlock(self, address, commandCode, nBytes):
+        self.present = self.reads not in self.absent
+        self.reads += 1
+        return qwiic_rfid.SimulatedRFIDReader.readBlock(self, address, commandCode, nBytes)
+
+
+def test_retry_reconnects_to_a_reader_that_comes_back():
+    device = _DropoutReader(absent=[0, 1])
+    device.scan(_tag(1))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, metrics=True,
+        retry=qwiic_rfid.RetryPolicy(retries=3, base_delay=0, reconnect_after=1))
+
+    assert reader.read_tag_record().tag_id == _tag(1)
+    assert reader.connected
+    assert reader.reconnects == 1
+    assert isinstance(reader.last_error, OSError)
+
+    snapshot = reader.metrics.snapshot()
+    assert (snapshot["errors"], snapshot["retries"], snapshot["reconnects"]) == (2, 2, 1)
+
+
+def test_retry_gives_up_and_reconnect_finds_the_reader_later():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    device.present = False
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, metrics=True,
+        retry=qwiic_rfid.RetryPolicy(retries=2, base_delay=0, reconnect_after=1))
+
+    with pytest.raises(OSError):
+        reader.read_tag_record()
+    assert not reader.connected
+    assert (reader.metrics.errors, reader.metrics.retries) == (3, 2)
+
+    device.present = True
+    assert reader.reconnect()
+    assert reader.connected
+    assert reader.reconnects == 1
+
+
+def test_retry_rides_out_a_noisy_bus():
+    device = qwiic_rfid.SimulatedRFIDReader(error_rate=0.3, seed=1)
+    for n in range(20):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, retry=qwiic_rfid.RetryPolicy(retries=10, base_delay=0))
+
+    assert [record.tag_id for record in reader.drain_records()] == [_tag(n) for n in range(20)]
+    assert device.errors > 0
+
+
+def test_retry_delay_backs_off_up_to_max_delay():
+    policy = qwiic_rfid.RetryPolicy(base_delay=0.01, max_delay=0.05, jitter=0)
+
+    assert [policy.delay(attempt) for attempt in range(4)] == [0.01, 0.02, 0.04, 0.05]
+
+
+def test_drain_keeps_the_tags_read_before_a_bus_error():
+    device = _DropoutReader(absent=[3])
+    for n in range(5):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, retry=False)
+
+    assert [record.tag_id for record in reader.drain_records()] == [_tag(n) for n in range(3)]
+    assert isinstance(reader.last_error, OSError)
+    assert [record.tag_id for record in reader.drain_records()] == [_tag(3), _tag(4)]
+
+    # With nothing read before the error, the drain raises it
+    device.absent = {device.reads}
+    with pytest.raises(OSError):
+        reader.drain_records()
+
+
+def test_missing_i2c_driver_raises_enodev(monkeypatch):
+    monkeypatch.setitem(sys.modules, "qwiic_i2c", types.SimpleNamespace(getI2CDriver=lambda: None))
+    reader = qwiic_rfid.QwiicRFID(retry=False)
+
+    with pytest.raises(OSError) as raised:
+        reader.drain_records()
+    assert raised.value.errno == errno.ENODEV
+    assert not reader.is_connected()
+
+
+def test_drain_stops_at_the_first_blank_record():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(3):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device)
+
+    assert reader.drain() == 3
+    assert device.transactions == 4    # Three tags and the blank record after them
+
+    # available() counts the tags held locally without touching the bus
+    assert reader.available() == 3
+    assert reader.get_tag() == qwiic_rfid.TagRecord(_tag(0), 0).tag
+    assert reader.available() == 2
+    assert device.transactions == 4
+
+
+# A stand in for the time module whose monotonic clock moves on step_ns each
+# time it is read, and whose wall clock is a fixed offset from it
+def _stepped_time(start_ns, step_ns, wall_offset_ns):
+    clock = types.SimpleNamespace(**dict((name, getattr(time, name)) for name in dir(time)
+        if not name.startswith("_")))
+    now = [start_ns - step_ns]
+
+    def monotonic_ns():
+        now[0] += step_ns
+        return now[0]
+
+    clock.monotonic_ns = monotonic_ns
+    clock.time_ns = lambda: now[0] + wall_offset_ns
+    return clock
+
+
+def test_scan_time_is_the_receive_time_less_the_age(monkeypatch):
+    record = qwiic_rfid.TagRecord(_tag(1), 1500, received_ns=5000000000, error_ns=1200000)
+    assert record.scan_ns == 3500000000
+    assert record.age == 1.5
+
+    monkeypatch.setattr(qwiic_rfid, "time", _stepped_time(10 ** 10, 0, 1700000000 * 10 ** 9))
+    assert record.scan_time == 1700000000 + 3.5
+
+
+def test_reads_bound_the_scan_time_by_the_transaction(monkeypatch):
+    records = [qwiic_rfid._RECORD_STRUCT.pack(_tag(n), 250 + n) for n in range(2)]
+
+    class Transport(qwiic_rfid.RFIDTransport):
+        def readBlock(self, address, commandCode, nBytes):
+            return list(records.pop(0)) if records else [0] * nBytes
+
+    # Each read takes 4 ms between the clock readings either side of it
+    monkeypatch.setattr(qwiic_rfid, "time", _stepped_time(10 ** 9, 4000000, 0))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=Transport())
+
+    record = reader.read_tag_record()
+    assert (record.received_ns, record.error_ns) == (10 ** 9 + 2000000, 2000000 + 1000000)
+    assert record.scan_ns == 10 ** 9 + 2000000 - 250 * 1000000
+
+    drained, = reader.drain_records()
+    assert (drained.received_ns, drained.error_ns) == (10 ** 9 + 10000000, 3000000)
+    assert drained.scan_ns == drained.received_ns - 251 * 1000000
+
+
+def _scan(n, seconds, address=0x13):
+    return qwiic_rfid.TagRecord(_tag(n), 0, received_ns=int(seconds * 1e9), address=address)
+
+
+def test_dedupe_drops_repeats_until_the_window_passes():
+    dedupe = qwiic_rfid.TagDeduplicator(window=1.0)
+
+    assert dedupe.filter([_scan(1, 0), _scan(1, 0.5), _scan(2, 0.6)]) == [_scan(1, 0), _scan(2, 0.6)]
+
+    # A held badge keeps its window open from the last repeat. Once that has
+    # passed the tag is forgotten, along with tag 2
+    assert not dedupe.accept(_scan(1, 1.4))
+    assert dedupe.accept(_scan(1, 2.5))
+    assert dedupe.stats() == {"hits": 2, "drops": 2, "evictions": 0, "tags": 1}
+
+
+def test_dedupe_forgets_the_oldest_tag_beyond_max_tags():
+    dedupe = qwiic_rfid.TagDeduplicator(window=60.0, max_tags=2)
+
+    assert dedupe.filter([_scan(1, 0), _scan(2, 1), _scan(3, 2)]) == [_scan(1, 0), _scan(2, 1), _scan(3, 2)]
+    assert len(dedupe) == 2
+    assert dedupe.evictions == 1
+
+    # Tag 1 was forgotten, so it counts as new; tag 3 is still remembered
+    assert dedupe.accept(_scan(1, 3))
+    assert not dedupe.accept(_scan(3, 4))
+
+
+def test_dedupe_per_reader_keeps_the_same_tag_on_each_reader():
+    dedupe = qwiic_rfid.TagDeduplicator(window=60.0, per_reader=True)
+
+    assert dedupe.filter([_scan(1, 0, 0x13), _scan(1, 1, 0x14), _scan(1, 2, 0x13)]) == \
+        [_scan(1, 0, 0x13), _scan(1, 1, 0x14)]
+
+
+def test_metrics_histogram_and_blank_ratio():
+    metrics = qwiic_rfid.RFIDMetrics()
+    metrics.record_read(60000, False)
+    metrics.record_read(20000000, True)
+    metrics.record_write(1000)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["blank_ratio"] == 0.5
+    assert snapshot["read_latency_avg_ns"] == (60000 + 20000000) / 2
+    assert [bound for bound, count in snapshot["read_latency_buckets"].items() if count] == [100000, "inf"]
+    assert snapshot["write_latency_buckets"][50000] == 1
+
+
+def test_metrics_count_overflows_from_full_drains():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(20):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device, metrics=True)
+
+    reader.drain_records()
+    reader.drain_records()
+
+    snapshot = reader.metrics.snapshot()
+    assert (snapshot["drains"], snapshot["overflows"]) == (2, 1)
+    assert snapshot["drain_fill"][20] == 1 and snapshot["drain_fill"][0] == 1
+    assert (snapshot["reads"], snapshot["blank_reads"]) == (21, 1)
+    assert 'qwiic_rfid_overflows_total{address="0x13"} 1\n' in reader.metrics.to_prometheus()
+
+
+def test_metrics_export_escapes_labels_and_runs_hooks_outside_the_lock():
+    metrics = qwiic_rfid.RFIDMetrics(labels={"site": 'door "A"\\west\nwing'})
+    metrics.record_read(60000, False)
+
+    # A hook may read the metrics itself without deadlocking
+    metrics.add_hook(lambda m: [("qwiic_rfid_hook_reads", m.labels, m.snapshot()["reads"])])
+
+    text = metrics.to_prometheus()
+    assert 'qwiic_rfid_reads_total{site="door \\"A\\"\\\\west\\nwing"} 1\n' in text
+    assert 'qwiic_rfid_hook_reads{site="door \\"A\\"\\\\west\\nwing"} 1\n' in text
+    assert len(text.splitlines()) == len(list(metrics.samples()))
+
+
+def test_metrics_shared_between_threads_keep_every_count():
+    metrics = qwiic_rfid.RFIDMetrics()
+
+    def record():
+        for _ in range(2000):
+            metrics.record_read(60000, False)
+            metrics.record_decode(100)
+            metrics.record_error()
+
+    _run_together([record] * 4)
+
+    snapshot = metrics.snapshot()
+    assert (snapshot["reads"], snapshot["errors"]) == (8000, 8000)
+    assert metrics.decodes == 8000 and metrics.read_ns == 8000 * 60000
+    assert sum(metrics.read_latency) == 8000
+
+
+# Raw records with IDs that use every byte, including the top one
+_RAW_RECORDS = b"".join(qwiic_rfid._RECORD_STRUCT.pack(bytes([0xFF - n, 1, 2, 3, 4, n]), 1000 * n + 7)
+    for n in range(5))
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_decode_records_matches_decoding_one_at_a_time(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    expected = [qwiic_rfid._decode_record(_RAW_RECORDS, n * 10) for n in range(5)]
+
+    ids, ages = qwiic_rfid.decode_records(_RAW_RECORDS, use_numpy=use_numpy)
+    assert [int(tag_id) for tag_id in ids] == [record.tag_int for record in expected]
+    assert [int(age) for age in ages] == [record.age_ms for record in expected]
+
+    # count limits the records decoded, leaving the rest of the buffer alone
+    ids, ages = qwiic_rfid.decode_records(bytearray(_RAW_RECORDS) + bytes(10), 2, use_numpy=use_numpy)
+    assert [int(tag_id) for tag_id in ids] == [record.tag_int for record in expected[:2]]
+
+
+def test_drain_columns_match_drain_records():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(4):
+        device.scan(_tag(n))
+    seen = []
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device)
+    reader.add_sink(seen.extend)
+
+    ids, ages, received = reader.drain_columns(use_numpy=False)
+    assert list(ids) == [record.tag_int for record in seen] == [int.from_bytes(_tag(n), "big") for n in range(4)]
+    assert list(ages) == [record.age_ms for record in seen]
+    assert list(received) == [record.received_ns for record in seen]
+
+
+def _write_allow_list(path, text):
+    with open(str(path), "w") as tag_file:
+        tag_file.write(text)
+
+
+def test_allow_list_loads_csv_and_binary_files(tmp_path):
+    csv_path = tmp_path / "tags.csv"
+    _write_allow_list(csv_path, "tag,name\n# visitors\n0000123,front desk\n0x2A0001,badge\n")
+    allowed = qwiic_rfid.TagAllowList(str(csv_path))
+
+    assert len(allowed) == 2
+    assert allowed.is_allowed("0000123")
+    assert allowed.is_allowed(_tag(1)) and allowed.is_allowed("0x2a0001") and 0x2A0001 in allowed
+    assert allowed.is_allowed(qwiic_rfid.TagRecord(_tag(1), 0))
+    assert not allowed.is_allowed(_tag(2))
+    assert not allowed.is_allowed("0x") and not allowed.is_allowed("0xZZ")
+
+    bin_path = tmp_path / "tags.bin"
+    bin_path.write_bytes(_tag(5) + _tag(6))
+    allowed = qwiic_rfid.TagAllowList(str(bin_path))
+    assert sorted(allowed._tags) == [int.from_bytes(_tag(n), "big") for n in (5, 6)]
+    assert allowed.is_allowed(qwiic_rfid.TagRecord(_tag(6), 0))
+
+
+def test_allow_list_matches_records_by_id_not_tag_string(tmp_path):
+    path = tmp_path / "tags.csv"
+    _write_allow_list(path, "0000123\n")
+
+    # Both IDs give the tag string "0000123"
+    records = [qwiic_rfid.TagRecord(bytes([0, 0, 0, 0, 12, 3]), 0),
+        qwiic_rfid.TagRecord(bytes([0, 0, 0, 0, 1, 23]), 0)]
+    assert {record.tag for record in records} == {"0000123"}
+
+    allowed = qwiic_rfid.TagAllowList(str(path))
+    assert not any(allowed.is_allowed(record) for record in records)
+    assert not allowed.is_allowed(int.from_bytes(records[0].tag_id, "big"))
+
+    legacy = qwiic_rfid.TagAllowList(str(path), match_strings=True)
+    assert all(legacy.is_allowed(record) for record in records)
+
+
+def test_allow_list_raises_when_its_file_cannot_be_loaded(tmp_path):
+    with pytest.raises(OSError):
+        qwiic_rfid.TagAllowList(str(tmp_path / "missing.csv"))
+
+    corrupt = tmp_path / "tags.bin"
+    corrupt.write_bytes(_tag(1)[:4])
+    with pytest.raises(ValueError):
+        qwiic_rfid.TagAllowList(str(corrupt))
+
+    bad_row = tmp_path / "tags.csv"
+    _write_allow_list(bad_row, "0x2A0001\n0xZZ\n")
+    with pytest.raises(ValueError):
+        qwiic_rfid.TagAllowList(str(bad_row))
+
+
+def test_allow_list_reloads_when_its_file_changes(tmp_path):
+    path = tmp_path / "tags.csv"
+    _write_allow_list(path, "0x2A0001\n")
+    allowed = qwiic_rfid.TagAllowList(str(path))
+    allowed.start_watching(interval=0.01)
+    try:
+        _write_allow_list(path, "0x2A0002\n")
+        os.utime(str(path), ns=(allowed.loaded_mtime + 10 ** 9, allowed.loaded_mtime + 10 ** 9))
+        end = time.monotonic() + 2.0
+        while not allowed.is_allowed(_tag(2)) and time.monotonic() < end:
+            time.sleep(0.01)
+        assert allowed.is_allowed(_tag(2)) and not allowed.is_allowed(_tag(1))
+    finally:
+        allowed.stop_watching()
+
+    # A reload that fails keeps the list it had
+    _write_allow_list(path, "0xZZ\n")
+    assert not allowed.reload()
+    assert isinstance(allowed.last_error, ValueError)
+    assert allowed.is_allowed(_tag(2))
+
+
+# A driver like qwiic_i2c's, which doesn't declare max_burst_records, in
+# front of a reader that only fills the first record of a read. Whatever
+# follows is not blank.
+class _PlainDriver(qwiic_rfid.RFIDTransport):
+
+    def __init__(self, device):
+        self.device = device
+
+    def readBlock(self, address, commandCode, nBytes):
+        record = self.device.readBlock(address, commandCode, 10)
+        return record + [0xA5] * (nBytes - len(record))
+
+    def isDeviceConnected(self, devAddress):
+        return self.device.isDeviceConnected(devAddress)
+
+
+def test_burst_falls_back_to_single_reads_on_an_undeclared_transport():
+    device = qwiic_rfid.SimulatedRFIDReader()
+    for n in range(3):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=_PlainDriver(device), burst_records=3)
+
+    assert reader.begin()
+    assert reader.burst_records == 1
+    assert [record.tag_id for record in reader.drain_records()] == [_tag(n) for n in range(3)]
+
+
+def test_burst_drains_several_records_per_read_when_declared():
+    device = qwiic_rfid.SimulatedRFIDReader(max_burst_records=4)
+    for n in range(10):
+        device.scan(_tag(n))
+    reader = qwiic_rfid.QwiicRFID(i2c_driver=device)
+
+    assert reader.begin()
+    assert reader.burst_records == 4
+    assert [record.tag_id for record in reader.drain_records()] == [_tag(n) for n in range(10)]
+    assert device.transactions == 3
+
+    # A smaller request is kept, a larger one limited to what the transport allows
+    for wanted, used in ((2, 2), (8, 4)):
+        limited = qwiic_rfid.QwiicRFID(i2c_driver=device, burst_records=wanted)
+        limited.begin()
+        assert limited.burst_records == used
+
+
+def test_bus_loads_one_driver_for_all_its_readers(monkeypatch):
+    drivers = []
+
+    def get_driver():
+        drivers.append(qwiic_rfid.SimulatedI2CBus([qwiic_rfid.SimulatedRFIDReader(address=0x13),
+            qwiic_rfid.SimulatedRFIDReader(address=0x14)]))
+        return drivers[-1]
+
+    monkeypatch.setitem(sys.modules, "qwiic_i2c", types.SimpleNamespace(getI2CDriver=get_driver))
+    bus = qwiic_rfid.ReaderBus()
+    assert drivers == []    # Nothing is loaded until a reader needs it
+
+    first = bus.add_reader(address=0x13)
+    second = bus.add_reader(address=0x14)
+    assert first.is_connected() and second.is_connected()
+    assert len(drivers) == 1
+    assert first._i2c is second._i2c is drivers[0]
+
+
+def test_bus_polls_by_priority_then_backlog_then_wait():
+    bus = qwiic_rfid.ReaderBus(qwiic_rfid.SimulatedI2CBus())
+    idle = bus.add_reader(address=0x20)
+    waiting = bus.add_reader(address=0x21)
+    busy = bus.add_reader(address=0x22)
+    urgent = bus.add_reader(address=0x23, priority=1)
+
+    now_ns = time.monotonic_ns()
+    entries = dict((entry.reader.address, entry) for entry in bus._entries)
+    for address, rate, waited in ((0x20, 0.0, 1), (0x21, 0.0, 5), (0x22, 100.0, 1), (0x23, 0.0, 0)):
+        entries[address].rate = rate
+        entries[address].last_poll_ns = now_ns - waited * 1000000000
+
+    assert bus.poll_order() == [urgent, busy, waiting, idle]
@@ -0,0 +1,130 @@
+# Tests for the tag service and its framing.
+
+import inspect
+import socket
+import struct
+import time
+
+import pytest
+
+import qwiic_rfid
+from qwiic_rfid_server import _FRAME_HEADER, _FRAME_SUBSCRIBE, TagClient, TagServer
+
+
+@pytest.fixture
+def server():
+    server = TagServer(("127.0.0.1", 0)).start()
+    yield server
+    server.close()
+
+
+def _records(count, address):
+    return [qwiic_rfid.TagRecord((0x2A0000 + n).to_bytes(6, "big"), 0, time.monotonic_ns(), address)
+        for n in range(count)]
+
+
+# Waits until the server's clients hold exactly these subscriptions, None
+# meaning every reader, so records written next are filtered as expected
+def _subscribed(server, subscriptions):
+    return _wait_for(lambda: sorted(map(str, (client.addresses for client in server._clients.values()))) ==
+        sorted(map(str, (frozenset(addresses) if addresses is not None else None for addresses in subscriptions))))
+
+
+def _wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _closed_by_server(sock):
+    sock.settimeout(2.0)
+    try:
+        return sock.recv(1) == b""
+    except ConnectionResetError:
+        return True
+
+
+@pytest.mark.parametrize("length", [0, 1 + 257, 0xFFFFFFFF])
+def test_server_drops_clients_sending_bad_frame_lengths(server, length):
+    sock = socket.create_connection(server.address)
+    try:
+        assert _wait_for(lambda: server.clients == 1)
+        sock.sendall(struct.pack(">IB", length, _FRAME_SUBSCRIBE) + b"\x13" * 16)
+        assert _closed_by_server(sock)
+        assert _wait_for(lambda: server.clients == 0)
+        assert server.clients_dropped == 1
+    finally:
+        sock.close()
+
+
+def test_server_listens_on_loopback_by_default():
+    host, _ = inspect.signature(TagServer).parameters["listen"].default
+    assert host == "127.0.0.1"
+
+
+def test_server_replaces_only_a_stale_socket_file(tmp_path):
+    path = str(tmp_path / "tags.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    TagServer(path).close()
+
+    other = tmp_path / "tags.db"
+    other.write_text("keep me")
+    with pytest.raises(FileExistsError):
+        TagServer(str(other))
+    assert other.read_text() == "keep me"
+
+
+def test_server_accepts_a_subscribe_to_every_address(server):
+    sock = socket.create_connection(server.address)
+    try:
+        body = bytes(range(256))
+        sock.sendall(_FRAME_HEADER.pack(1 + len(body), _FRAME_SUBSCRIBE) + body)
+        assert _wait_for(lambda: server.clients == 1 and
+            next(iter(server._clients.values())).addresses == frozenset(body))
+    finally:
+        sock.close()
+
+
+def test_client_receives_every_record_in_order(server):
+    with TagClient(server.address, timeout=2.0) as client:
+        assert _subscribed(server, [None])
+        records = _records(3, 0x13) + _records(2, 0x14)
+        server.write_records(records)
+
+        received = client.read()
+        assert [(address, tag_id) for _, address, tag_id in received] == \
+            [(record.address, record.tag_id) for record in records]
+        assert all(abs(timestamp - time.time_ns()) < 5e9 for timestamp, _, _ in received)
+
+
+def test_server_splits_drains_into_frames_of_max_batch():
+    with TagServer(("127.0.0.1", 0), max_batch=4) as server:
+        with TagClient(server.address, timeout=2.0) as client:
+            assert _subscribed(server, [None])
+            server.write_records(_records(10, 0x13))
+
+            assert [len(client.read()) for _ in range(3)] == [4, 4, 2]
+            assert server.records_sent == 10
+
+
+def test_clients_receive_only_the_readers_they_subscribe_to(server):
+    with TagClient(server.address, addresses=[0x13], timeout=2.0) as first, \
+            TagClient(server.address, addresses=[0x14, 0x15], timeout=2.0) as second:
+        assert _subscribed(server, [[0x13], [0x14, 0x15]])
+        server.write_records(_records(2, 0x13) + _records(3, 0x14) + _records(1, 0x16))
+
+        assert [address for _, address, _ in first.read()] == [0x13] * 2
+        assert [address for _, address, _ in second.read()] == [0x14] * 3
+
+        # Subscribing again to every reader takes effect for later drains
+        second.subscribe()
+        assert _subscribed(server, [[0x13], None])
+        server.write_records(_records(1, 0x16))
+        assert [address for _, address, _ in second.read()] == [0x16]
+        assert server.records_sent == 2 + 3 + 1